@@ -5,10 +5,15 @@ Mucho más rápido que spaCy para corpus grandes
 """
 
 import re
-from pathlib import Path
 from collections import Counter, defaultdict
 import json
 
+from cargador_corpus import abrir_corpus, guardar_codificaciones
+from duplicados_corpus import detectar_duplicados
+from manifiesto_corpus import NOMBRE_MANIFIESTO, ManifiestoCorpus
+from normalizacion_corpus import texto_normalizado
+from repeticiones_corpus import detectar_repeticiones
+
 # Lista de adjetivos comunes en español (simplificado)
 ADJETIVOS_PATTERN = r'\b([a-záéíóúñ]+[ao]s?|clásic[ao]s?|modern[ao]s?|contemporáne[ao]s?|nacional|española?|francés|francesa|alemán|alemana|italiano|italiana|ruso|rusa|inglés|inglesa|popular|populares|sinfónic[ao]s?|religiosa?s?|teatral|dramátic[ao]s?|vocal|instrumental|orquestal|ligera?s?|nueva?s?|antigua?s?|actual|tradicional|folklóric[ao]s?|bailable|selecta?s?|fina?s?|buena?s?|gran|grande|pequeña?s?)\b'
 
@@ -34,38 +39,45 @@ def extraer_adjetivos_musica(texto):
     return adjetivos
 
 def procesar_carpeta(ruta, nombre_publicacion):
-    """Procesa todos los archivos .txt de una carpeta"""
-    carpeta = Path(ruta)
-    archivos = list(carpeta.rglob("*.txt"))
+    """Procesa todos los archivos .txt de una carpeta, paquete .corpus o archivo comprimido"""
+    corpus = abrir_corpus(ruta)
+    manifiesto = ManifiestoCorpus(corpus.ruta_auxiliar(NOMBRE_MANIFIESTO))
+    n_archivos = corpus.contar()
+
+    print(f"\nProcesando {nombre_publicacion}: {n_archivos} archivos...")
 
-    print(f"\nProcesando {nombre_publicacion}: {len(archivos)} archivos...")
+    # Reescaneos y páginas casi idénticas: se cuentan una sola vez
+    duplicados = detectar_duplicados(corpus, manifiesto=manifiesto)
+    # Parrillas, anuncios y cabeceras repetidos ("música variada"): fuera antes de contar
+    repeticiones = detectar_repeticiones(corpus, manifiesto=manifiesto)
 
     resultados = []
     todos_adjetivos = Counter()
     temporal_data = defaultdict(lambda: Counter())
 
-    for i, archivo in enumerate(archivos, 1):
+    for i, archivo in enumerate(corpus.documentos(), 1):
         if i % 100 == 0:
-            print(f"  Procesados {i}/{len(archivos)} archivos...")
+            print(f"  Procesados {i}/{n_archivos} archivos...")
+
+        if archivo.clave in duplicados:
+            continue
 
+        # Texto normalizado en caché: si el manifiesto conoce la huella, no se relee el archivo
+        entrada = manifiesto.entrada_vigente(archivo)
         try:
-            texto = archivo.read_text(encoding='utf-8')
-        except:
-            try:
-                texto = archivo.read_text(encoding='latin-1')
-            except:
-                continue
+            texto = texto_normalizado(archivo, entrada and entrada['huella']).texto
+        except OSError:
+            continue
 
-        # Extraer año del nombre del archivo o contenido
-        years = re.findall(r'(19\d{2}|20\d{2})', archivo.stem + texto[:500])
-        year = int(years[0]) if years else None
+        # Año del nombre del archivo o del encabezado, guardado en el manifiesto
+        year = manifiesto.metadatos(archivo, texto)['anio']
 
         # Extraer adjetivos
-        adjetivos = extraer_adjetivos_musica(texto)
+        adjetivos = extraer_adjetivos_musica(repeticiones.limpiar(texto, archivo.publicacion))
 
         if adjetivos:
             resultados.append({
-                'archivo': archivo.name,
+                'archivo': archivo.nombre,
                 'year': year,
                 'adjetivos': adjetivos,
                 'freq': Counter(adjetivos)
@@ -76,12 +88,15 @@ def procesar_carpeta(ruta, nombre_publicacion):
             if year:
                 temporal_data[year].update(adjetivos)
 
+    manifiesto.guardar()
+    guardar_codificaciones()
     print(f"✅ {nombre_publicacion}: {len(resultados)} archivos con datos, {sum(todos_adjetivos.values())} adjetivos totales")
 
     return {
         'nombre': nombre_publicacion,
         'archivos_procesados': len(resultados),
-        'archivos_totales': len(archivos),
+        'archivos_totales': n_archivos,
+        'duplicados_omitidos': len(duplicados),
         'adjetivos_totales': dict(todos_adjetivos),
         'top30': todos_adjetivos.most_common(30),
         'temporal': {year: dict(counter) for year, counter in temporal_data.items()},
@@ -1,42 +1,52 @@
 #!/usr/bin/env python3
 # analiza_musica_v3_fixed.py
 
-"""Analiza adjetivaciones asociadas a la palabra 'música' en archivos .txt (acepta carpetas)
-y genera un archivo HTML interactivo (resultados_musica.html) que puedes abrir directamente en el navegador.
+"""Analiza adjetivaciones asociadas a la palabra 'música' en archivos .txt (acepta carpetas,
+paquetes .corpus generados con paquete_corpus.py y archivos .zip/.tar.gz/.tar.zst) y genera un archivo HTML interactivo (resultados_musica.html) que puedes abrir directamente en el navegador.
 
 Uso:
-    python3 analiza_musica_v3_fixed.py ruta_a_archivo_o_carpeta [otra_ruta ...]
+    python3 analiza_musica_v3_fixed.py ruta_a_archivo_o_carpeta [otra_ruta ...] [--procesos N] [--lote N]
 
 Requisitos:
     pip install spacy pandas plotly
     python -m spacy download es_core_news_md
 """
 
+import argparse
 import sys
 import re
+import itertools
 from pathlib import Path
 from collections import Counter
 import json
 
-import pandas as pd
-import plotly.graph_objects as go
-import plotly.io as pio
+from cache_analisis import LOTE_DOCUMENTOS, PROCESOS
+from calidad_ocr import FiltroCalidad
+from cargador_corpus import (DocumentoArchivo, DocumentoCorpus, abrir_corpus,
+                             es_fuente_corpus, guardar_codificaciones)
+from fragmentos_documento import agrupar_fragmentos, es_propio
+from manifiesto_corpus import NOMBRE_MANIFIESTO, ManifiestoCorpus
+from metadatos_corpus import extraer_metadatos
+from normalizacion_corpus import texto_normalizado
+from prefiltro_objetivo import PrefiltroObjetivo
+from recursos import analisis_spacy, pandas, plotly
+from repeticiones_corpus import detectar_repeticiones
 
-try:
-    import spacy
-    nlp = spacy.load("es_core_news_md")
-except Exception as e:
-    print("⚠️ Error: asegúrate de tener spaCy y el modelo español instalados:")
-    print("   pip install spacy pandas plotly")
-    print("   python -m spacy download es_core_news_md")
-    raise
+# Hijos y núcleo de "música": hace falta el parser, no las entidades.
+# El modelo se carga al analizar el primer texto (recursos.py)
+PERFIL_SPACY = "dependencias"
 
 
 def extraer_adjetivos_asociados(texto):
-    doc = nlp(texto)
+    return [adjetivo for doc in analisis_spacy(PERFIL_SPACY).fragmentos(texto)
+            for adjetivo in adjetivos_de_doc(doc)]
+
+
+def adjetivos_de_doc(doc):
     adjs = []
     for token in doc:
-        if token.lemma_.lower() == "música":
+        # En un fragmento de un documento largo, solo las menciones de su zona propia
+        if token.lemma_.lower() == "música" and es_propio(token):
             for hijo in token.children:
                 if hijo.pos_ == "ADJ" or hijo.dep_ in ("amod", "acomp"):
                     adjs.append(hijo.text.lower())
@@ -52,44 +62,68 @@ def extraer_adjetivos_asociados(texto):
     return [c for c in cleaned if c]
 
 
-def procesar_archivo(path):
-    path = Path(path)
-    nombre_periodico = path.stem
-    try:
-        texto = path.read_text(encoding="utf-8")
-    except Exception:
-        texto = path.read_text(encoding="latin-1")
+def procesar_archivo(documento, repeticiones=None, calidad=None, prefiltro=None, manifiesto=None):
+    texto, resultado = preparar_archivo(documento, repeticiones, calidad, prefiltro, manifiesto)
+    resultado["Adjetivos"] = extraer_adjetivos_asociados(texto) if texto else []
+    return resultado
 
-    years = re.findall(r"(19\d{2}|20\d{2})", texto)
-    dates = re.findall(r"(\d{1,2}[\/\-]\d{1,2}[\/\-](?:19|20)\d{2})", texto)
 
-    if years:
-        rango_tiempo = f"{min(years)} - {max(years)}"
-    elif dates:
-        rango_tiempo = f"{min(dates)} - {max(dates)}"
-    else:
-        rango_tiempo = "No disponible"
+def preparar_archivo(documento, repeticiones=None, calidad=None, prefiltro=None, manifiesto=None):
+    """Texto limpio que hay que analizar y resultado sin adjetivos todavía"""
+    if not isinstance(documento, DocumentoCorpus):
+        documento = DocumentoArchivo(documento)
+    nombre_periodico = Path(documento.nombre).stem
+    # Texto ya normalizado (tildes compuestas, palabras partidas unidas), en caché por contenido
+    texto = texto_normalizado(documento).texto
 
-    adjetivos = extraer_adjetivos_asociados(texto)
-    return {
-        "ruta": str(path),
+    # Fecha del nombre del archivo o, si no la trae, del encabezado (sin recorrer el texto),
+    # guardada en el manifiesto del corpus para las ejecuciones siguientes
+    if manifiesto is not None:
+        metadatos = manifiesto.metadatos(documento, texto)
+    else:
+        metadatos = extraer_metadatos(documento.nombre, texto, documento.publicacion)
+    if metadatos['fecha']:
+        fecha = metadatos['fecha']
+    elif metadatos['anio']:
+        fecha = str(metadatos['anio'])
+    else:
+        fecha = "No disponible"
+
+    if repeticiones is not None:
+        # Sin parrillas, anuncios ni cabeceras repetidas: menos texto para spaCy
+        texto = repeticiones.limpiar(texto, documento.publicacion)
+    if calidad is not None:
+        # Documentos o párrafos ilegibles (ruido de OCR) no pasan por spaCy
+        texto = calidad.filtrar(texto)
+    if texto and prefiltro is not None:
+        # Solo los párrafos con "música" y su contexto pasan por spaCy
+        texto = prefiltro.seleccionar(texto)
+    return texto or "", {
+        "ruta": str(documento),
         "Periódico": nombre_periodico,
-        "Rango temporal": rango_tiempo,
-        "Adjetivos": adjetivos
+        "Fecha": fecha,
+        "Adjetivos": []
     }
 
 
 def obtener_txt_de_ruta(ruta):
+    """Ternas (documento, detector de líneas repetidas del corpus o None, manifiesto o None)"""
     ruta_path = Path(ruta)
     if ruta_path.is_file() and ruta_path.suffix.lower() == ".txt":
-        return [ruta_path]
-    elif ruta_path.is_dir():
-        return list(ruta_path.rglob("*.txt"))
+        return [(DocumentoArchivo(ruta_path), None, None)]
+    elif es_fuente_corpus(ruta_path):
+        corpus = abrir_corpus(ruta_path)
+        manifiesto = ManifiestoCorpus(corpus.ruta_auxiliar(NOMBRE_MANIFIESTO))
+        repeticiones = detectar_repeticiones(corpus, manifiesto=manifiesto)
+        return ((documento, repeticiones, manifiesto) for documento in corpus.documentos())
     else:
         return []
 
 
 def generar_html(resultados, output_path="resultados_musica.html"):
+    pd = pandas()
+    go = plotly('graph_objects')
+    pio = plotly('io')
     rows = []
     total_adjs = []
     per_periodico_counts = {}
@@ -99,7 +133,7 @@ def generar_html(resultados, output_path="resultados_musica.html"):
         rows.append({
             "Periódico": r["Periódico"],
             "Archivo": Path(r["ruta"]).name,
-            "Rango temporal": r["Rango temporal"],
+            "Fecha": r["Fecha"],
             "Adjetivos (lista)": ", ".join(sorted(set(adjs))) if adjs else ""
         })
         total_adjs.extend(adjs)
@@ -173,21 +207,52 @@ def main():
         print("Uso: python3 analiza_musica_v3_fixed.py ruta_a_archivo_o_carpeta [otra_ruta ...]")
         sys.exit(1)
 
-    rutas = sys.argv[1:]
-    archivos = []
-    for r in rutas:
-        archivos.extend(obtener_txt_de_ruta(r))
-    if not archivos:
+    parser = argparse.ArgumentParser(description="Adjetivos asociados a 'música'")
+    parser.add_argument('rutas', nargs='+', help="Archivos .txt, carpetas, paquetes .corpus o comprimidos")
+    parser.add_argument('--procesos', type=int, default=PROCESOS,
+                        help="Procesos de análisis spaCy (n_process; -1 = todos los núcleos)")
+    parser.add_argument('--lote', type=int, default=LOTE_DOCUMENTOS,
+                        help="Documentos por lote de nlp.pipe (batch_size)")
+    argumentos = parser.parse_args()
+
+    # Los documentos se consumen en flujo: no se acumulan sus textos en memoria
+    archivos = itertools.chain.from_iterable(obtener_txt_de_ruta(r) for r in argumentos.rutas)
+    # Antes de cargar el modelo: una ruta mal escrita o una carpeta vacía no debe esperar a spaCy
+    primero = next(archivos, None)
+    if primero is None:
         print("❌ No se encontraron archivos .txt en las rutas proporcionadas.")
         sys.exit(1)
+    archivos = itertools.chain([primero], archivos)
 
     resultados = []
-    for archivo in archivos:
-        print(f"Analizando {archivo}...")
-        try:
-            resultados.append(procesar_archivo(archivo))
-        except Exception as e:
-            print(f"⚠️ Error procesando {archivo}: {e}")
+    manifiestos = []
+    calidad = FiltroCalidad()
+    prefiltro = PrefiltroObjetivo({'música'})
+
+    def preparados():
+        for archivo, repeticiones, manifiesto in archivos:
+            if manifiesto is not None and all(m is not manifiesto for m in manifiestos):
+                manifiestos.append(manifiesto)
+            print(f"Analizando {archivo}...")
+            try:
+                yield preparar_archivo(archivo, repeticiones, calidad, prefiltro, manifiesto)
+            except Exception as e:
+                print(f"⚠️ Error procesando {archivo}: {e}")
+
+    # Los textos se analizan por lotes (nlp.pipe) y vuelven en el mismo orden;
+    # los muy largos, en varios fragmentos (fragmentos_documento.py)
+    analisis = analisis_spacy(PERFIL_SPACY)
+    analizados = analisis.pipe(preparados(), batch_size=argumentos.lote,
+                               n_process=argumentos.procesos)
+    for resultado, docs in agrupar_fragmentos(analizados):
+        resultado["Adjetivos"] = [adjetivo for doc in docs for adjetivo in adjetivos_de_doc(doc)]
+        resultados.append(resultado)
+    for manifiesto in manifiestos:
+        manifiesto.guardar()
+    guardar_codificaciones()
+    print(f"🗑 Calidad OCR: {calidad.resumen()}")
+    print(f"🎯 Prefiltro: {prefiltro.resumen()}")
+    print(f"💾 Caché de análisis: {analisis.resumen()}")
 
     out = generar_html(resultados)
     print(f"\n✅ He creado: {out} — ábrelo en tu navegador.")
@@ -28,13 +28,30 @@ Autor: María Palacios Nieto
 Fecha: Noviembre 2024
 """
 
-import spacy
+import argparse
 from collections import Counter, defaultdict
 import json
 import csv
 from pathlib import Path
 from typing import Dict, List, Tuple, Set
 import re
+import itertools
+
+from cache_analisis import LOTE_DOCUMENTOS, PROCESOS
+from cache_extraccion import MODOS_CACHE, crear_cache_extraccion
+from calidad_ocr import CONTADORES_DESCARTE, FiltroCalidad
+from cargador_corpus import abrir_corpus, precargar_documentos
+from columnas_doc import ColumnasDoc
+from contextos_corpus import VERSION_OCURRENCIAS, ContextosCorpus, ocurrencia
+from duplicados_corpus import detectar_duplicados
+from fragmentos_documento import es_ultimo_fragmento, tokens_propios
+from indice_negacion import IndiceNegacion
+from manifiesto_corpus import CorpusIncremental, firma_configuracion
+from pool_analisis import RECICLAR_DOCUMENTOS, PoolAnalisis
+from prefiltro_objetivo import PrefiltroObjetivo
+from recursos import analisis_spacy
+from repeticiones_corpus import detectar_repeticiones
+from tabla_lemas import TablaLemas
 
 # ============================================================================
 # CONFIGURACIÓN
@@ -42,6 +59,8 @@ import re
 
 WINDOW_SIZE = 7  # Ventana expandida para capturar predicaciones distantes
 MIN_FREQ = 2
+DOCUMENTOS_ANTICIPADOS = 8  # Documentos leídos en segundo plano mientras spaCy analiza
+PERFIL_SPACY = "dependencias"  # Parser sí (niveles 1-3), entidades no (perfiles_spacy.py)
 
 # Términos musicales que reciben valoraciones (además de "música")
 TERMINOS_MUSICALES = {
@@ -139,6 +158,19 @@ ATENUADORES = {
 
 NEGACIONES = {'no', 'nunca', 'jamás', 'tampoco', 'ni', 'sin', 'nada'}
 
+# Nivel 4: peso de una valoración según el modificador ("muy brillante", "algo monótono").
+# Se comparan lemas de un token: "un poco" cuenta por "poco"; "más o menos" no se detecta
+PESO_INTENSIFICADOR = 1.5
+PESO_ATENUADOR = 0.5
+MODIFICADORES = INTENSIFICADORES | ATENUADORES
+
+# Tokens anteriores al adjetivo en que se busca una negación, por nivel
+DISTANCIA_NEGACION = {1: 3, 2: 3, 3: 3}
+
+# Verbos copulativos/predicativos del nivel 3 ("El concierto resultó sublime")
+VERBOS_PREDICATIVOS = {'ser', 'estar', 'resultar', 'parecer', 'mostrarse',
+                       'revelarse', 'demostrarse', 'considerarse'}
+
 # ============================================================================
 # CLASE PRINCIPAL
 # ============================================================================
@@ -148,29 +180,60 @@ class AnalizadorValoracionesMejorado:
     Analizador multinivel de valoraciones en crítica musical
     """
 
-    def __init__(self, ventana=7):
+    # Acumuladores que se guardan por documento para el re-análisis incremental
+    CAMPOS_ACUMULADOS = (
+        'valoraciones_nivel1', 'valoraciones_nivel2', 'valoraciones_nivel3',
+        'valoraciones_nivel4',
+        'positivas_total', 'negativas_total', 'neutras_total',
+        'positivas_ponderadas', 'negativas_ponderadas',
+        'contextos_positivos', 'contextos_negativos',
+        'total_documentos', 'menciones_musica', 'menciones_terminos_relacionados',
+        'stats_por_publicacion'
+    )
+
+    def __init__(self, ventana=7, columnar=True, distancias_negacion=None,
+                 negacion_por_dependencias=True):
         self.ventana = ventana
-
-        # Cargar modelo spaCy
-        print("Cargando modelo spaCy (es_core_news_md)...")
-        try:
-            self.nlp = spacy.load("es_core_news_md")
-        except OSError:
-            print("ERROR: Modelo no encontrado. Instala con:")
-            print("  python -m spacy download es_core_news_md")
-            raise
-
+        # Negación: ventana por nivel y arcos advmod/neg (indice_negacion.py)
+        self.distancias_negacion = dict(distancias_negacion or DISTANCIA_NEGACION)
+        self.negacion_por_dependencias = negacion_por_dependencias
+        # Extracción sobre columnas NumPy (columnas_doc.py); False: recorrido por tokens
+        self.columnar = columnar
+        # Resultados por oración ya extraídos (cache_extraccion.py), desde procesar_corpus()
+        self.extraccion = None
+        # Descartes del filtro de calidad OCR de todo el corpus (calidad_ocr.py), desde procesar_corpus()
+        self.descartes_calidad = None
+        # Polaridad por lema, para todos los documentos (tabla_lemas.py)
+        self._polaridades = TablaLemas(self.polaridad_lexico, VALORACIONES_POSITIVAS,
+                                       VALORACIONES_NEGATIVAS)
+        self._reiniciar_acumuladores()
+
+    @property
+    def analisis(self):
+        """Análisis spaCy con caché en disco; el modelo se carga al analizar el primer documento"""
+        return analisis_spacy(PERFIL_SPACY)
+
+    @property
+    def nlp(self):
+        return self.analisis.nlp
+
+    def _reiniciar_acumuladores(self):
         # Contadores por nivel de análisis
         self.valoraciones_nivel1 = Counter()  # Sobre "música" directa
         self.valoraciones_nivel2 = Counter()  # Sobre términos relacionados
         self.valoraciones_nivel3 = Counter()  # Predicativas distantes
+        self.valoraciones_nivel4 = Counter()  # Polaridad contextual (negadas o ponderadas)
 
         # Polaridades
         self.positivas_total = Counter()
         self.negativas_total = Counter()
         self.neutras_total = Counter()
 
-        # Contextos para análisis cualitativo
+        # Polaridades ponderadas por intensificadores y atenuadores (nivel 4)
+        self.positivas_ponderadas = Counter()
+        self.negativas_ponderadas = Counter()
+
+        # Ocurrencias para análisis cualitativo (el texto, en contextos_corpus.py)
         self.contextos_positivos = []
         self.contextos_negativos = []
 
@@ -183,11 +246,28 @@ class AnalizadorValoracionesMejorado:
         self.stats_por_publicacion = defaultdict(lambda: {
             'positivas': Counter(),
             'negativas': Counter(),
+            'positivas_ponderadas': 0.0,
+            'negativas_ponderadas': 0.0,
             'total_menciones': 0
         })
 
+    def firma_configuracion(self) -> str:
+        """Identifica ventana y léxicos: si cambian, se invalida el re-análisis incremental"""
+        return firma_configuracion(
+            type(self).__name__, self.ventana, TERMINOS_MUSICALES,
+            VALORACIONES_POSITIVAS, VALORACIONES_NEGATIVAS, NEGACIONES, VERBOS_PREDICATIVOS,
+            self.distancias_negacion, self.negacion_por_dependencias,
+            INTENSIFICADORES, ATENUADORES, PESO_INTENSIFICADOR, PESO_ATENUADOR,
+            VERSION_OCURRENCIAS
+        )
+
     def clasificar_polaridad(self, adjetivo_lema: str) -> str:
-        """Clasifica polaridad de un adjetivo"""
+        """Clasifica polaridad de un adjetivo (los léxicos se consultan una vez por lema)"""
+        return self._polaridades.lema(adjetivo_lema)
+
+    @staticmethod
+    def polaridad_lexico(adjetivo_lema: str) -> str:
+        """Polaridad de un lema según los léxicos evaluativos"""
         if adjetivo_lema in VALORACIONES_POSITIVAS:
             return 'positiva'
         elif adjetivo_lema in VALORACIONES_NEGATIVAS:
@@ -195,8 +275,79 @@ class AnalizadorValoracionesMejorado:
         else:
             return 'neutra'
 
+    @staticmethod
+    def invertir_si_negado(polaridad: str, negado: bool) -> str:
+        """Una valoración negada cambia de polaridad ("no es buena")"""
+        if negado and polaridad == 'positiva':
+            return 'negativa'
+        elif negado and polaridad == 'negativa':
+            return 'positiva'
+        return polaridad
+
+    @staticmethod
+    def peso_contextual(modificadores: List[str], negado: bool) -> float:
+        """
+        NIVEL 4: peso de una valoración según los lemas que la modifican
+
+        Un intensificador negado atenúa ("no muy brillante" vale menos que "brillante")
+        """
+        peso = 1.0
+        for lema in modificadores:
+            if lema in INTENSIFICADORES:
+                peso *= PESO_INTENSIFICADOR
+            elif lema in ATENUADORES:
+                peso *= PESO_ATENUADOR
+        if negado and peso > 1:
+            peso = 1 / peso
+        return peso
+
+    @staticmethod
+    def modificadores(token, doc) -> List[str]:
+        """Lemas de los advmod del adjetivo y del token anterior (posibles modificadores)"""
+        posiciones = {hijo.i for hijo in token.children if hijo.dep_ == "advmod"}
+        if token.i > 0:
+            posiciones.add(token.i - 1)
+        return [doc[k].lemma_.lower() for k in sorted(posiciones)]
+
+    @staticmethod
+    def _modificadores_columnas(j, columnas, moduladores, advmod) -> List[str]:
+        """modificadores() sobre columnas: solo se buscan lemas en la máscara de moduladores"""
+        posiciones = {k for k in columnas.hijos(j) if moduladores[k] and advmod[k]}
+        if j > 0 and moduladores[j - 1]:
+            posiciones.add(j - 1)
+        return [columnas.lema(k) for k in sorted(posiciones)]
+
+    def _registrar(self, valoraciones: list, valoracion: dict, contador: Counter, publicacion: str):
+        """Añade una valoración y la suma a su nivel, a su polaridad y a su publicación"""
+        valoraciones.append(valoracion)
+        lema = valoracion['adjetivo']
+        peso = valoracion['peso']
+        contador[lema] += 1
+
+        if valoracion['polaridad'] == 'positiva':
+            self.positivas_total[lema] += 1
+            self.positivas_ponderadas[lema] += peso
+            self.stats_por_publicacion[publicacion]['positivas'][lema] += 1
+            self.stats_por_publicacion[publicacion]['positivas_ponderadas'] += peso
+            self.contextos_positivos.append(valoracion['ocurrencia'])
+        elif valoracion['polaridad'] == 'negativa':
+            self.negativas_total[lema] += 1
+            self.negativas_ponderadas[lema] += peso
+            self.stats_por_publicacion[publicacion]['negativas'][lema] += 1
+            self.stats_por_publicacion[publicacion]['negativas_ponderadas'] += peso
+            self.contextos_negativos.append(valoracion['ocurrencia'])
+
+        # Nivel 4: valoraciones evaluativas cuya polaridad modula el contexto
+        if valoracion['polaridad'] != 'neutra' and (valoracion['negado'] or peso != 1):
+            self.valoraciones_nivel4[lema] += 1
+
     def detectar_negacion_cercana(self, token, doc, distancia=3):
-        """Detecta si hay negación en proximidad del token"""
+        """
+        Detecta si hay negación en proximidad del token
+
+        Recorrido de referencia: los niveles usan IndiceNegacion, que da el mismo
+        resultado en la ventana (comprobación en indice_negacion.py)
+        """
         start = max(0, token.i - distancia)
         end = min(len(doc), token.i + 1)
 
@@ -205,7 +356,7 @@ class AnalizadorValoracionesMejorado:
                 return True
         return False
 
-    def extraer_valoraciones_nivel1(self, token_musica, doc, publicacion=""):
+    def extraer_valoraciones_nivel1(self, token_musica, doc, negacion):
         """
         NIVEL 1: Adjetivos directamente asociados a "música"
         (Método original del artículo)
@@ -216,37 +367,24 @@ class AnalizadorValoracionesMejorado:
         for child in token_musica.children:
             if child.pos_ == "ADJ" or child.dep_ in ("amod", "acomp"):
                 lema = child.lemma_.lower()
-                polaridad = self.clasificar_polaridad(lema)
+                polaridad = self._polaridades.token(child)
 
                 # Detectar negación
-                negado = self.detectar_negacion_cercana(child, doc)
-                if negado and polaridad == 'positiva':
-                    polaridad = 'negativa'
-                elif negado and polaridad == 'negativa':
-                    polaridad = 'positiva'
+                negado = negacion.negado(child.i, self.distancias_negacion[1])
+                polaridad = self.invertir_si_negado(polaridad, negado)
 
                 valoraciones.append({
                     'adjetivo': lema,
                     'polaridad': polaridad,
                     'nivel': 1,
                     'negado': negado,
-                    'contexto': doc[max(0, token_musica.i-15):min(len(doc), token_musica.i+15)].text
+                    'peso': self.peso_contextual(self.modificadores(child, doc), negado),
+                    'ocurrencia': ocurrencia(doc, token_musica.i - 15, token_musica.i + 15)
                 })
 
-                self.valoraciones_nivel1[lema] += 1
-
-                if polaridad == 'positiva':
-                    self.positivas_total[lema] += 1
-                    self.stats_por_publicacion[publicacion]['positivas'][lema] += 1
-                    self.contextos_positivos.append(valoraciones[-1]['contexto'])
-                elif polaridad == 'negativa':
-                    self.negativas_total[lema] += 1
-                    self.stats_por_publicacion[publicacion]['negativas'][lema] += 1
-                    self.contextos_negativos.append(valoraciones[-1]['contexto'])
-
         return valoraciones
 
-    def extraer_valoraciones_nivel2(self, doc, publicacion=""):
+    def extraer_valoraciones_nivel2(self, token, doc, negacion):
         """
         NIVEL 2: Adjetivos sobre términos musicales relacionados
         (interpretación, concierto, ejecución, etc.)
@@ -255,166 +393,362 @@ class AnalizadorValoracionesMejorado:
         """
         valoraciones = []
 
-        for token in doc:
-            if token.lemma_.lower() in TERMINOS_MUSICALES:
-                self.menciones_terminos_relacionados += 1
-
-                # Buscar adjetivos asociados
-                for child in token.children:
-                    if child.pos_ == "ADJ" or child.dep_ in ("amod", "acomp"):
-                        lema = child.lemma_.lower()
-                        polaridad = self.clasificar_polaridad(lema)
-
-                        # Solo contar si es evaluativo
-                        if polaridad in ['positiva', 'negativa']:
-                            negado = self.detectar_negacion_cercana(child, doc)
-                            if negado and polaridad == 'positiva':
-                                polaridad = 'negativa'
-                            elif negado and polaridad == 'negativa':
-                                polaridad = 'positiva'
-
-                            valoraciones.append({
-                                'adjetivo': lema,
-                                'polaridad': polaridad,
-                                'nivel': 2,
-                                'termino_asociado': token.lemma_.lower(),
-                                'negado': negado,
-                                'contexto': doc[max(0, token.i-15):min(len(doc), token.i+15)].text
-                            })
-
-                            self.valoraciones_nivel2[lema] += 1
-
-                            if polaridad == 'positiva':
-                                self.positivas_total[lema] += 1
-                                self.stats_por_publicacion[publicacion]['positivas'][lema] += 1
-                                self.contextos_positivos.append(valoraciones[-1]['contexto'])
-                            elif polaridad == 'negativa':
-                                self.negativas_total[lema] += 1
-                                self.stats_por_publicacion[publicacion]['negativas'][lema] += 1
-                                self.contextos_negativos.append(valoraciones[-1]['contexto'])
+        # Buscar adjetivos asociados
+        for child in token.children:
+            if child.pos_ == "ADJ" or child.dep_ in ("amod", "acomp"):
+                polaridad = self._polaridades.token(child)
+
+                # Solo contar si es evaluativo
+                if polaridad in ['positiva', 'negativa']:
+                    lema = child.lemma_.lower()
+                    negado = negacion.negado(child.i, self.distancias_negacion[2])
+                    polaridad = self.invertir_si_negado(polaridad, negado)
+
+                    valoraciones.append({
+                        'adjetivo': lema,
+                        'polaridad': polaridad,
+                        'nivel': 2,
+                        'termino_asociado': token.lemma_.lower(),
+                        'negado': negado,
+                        'peso': self.peso_contextual(self.modificadores(child, doc), negado),
+                        'ocurrencia': ocurrencia(doc, token.i - 15, token.i + 15)
+                    })
 
         return valoraciones
 
-    def extraer_valoraciones_nivel3(self, doc, publicacion=""):
+    def extraer_valoraciones_nivel3(self, token, doc, negacion):
         """
         NIVEL 3: Construcciones predicativas distantes
         "El concierto resultó sublime"
         "La interpretación fue magistral"
+
+        `token` es un verbo copulativo/predicativo (VERBOS_PREDICATIVOS)
         """
         valoraciones = []
 
-        # Buscar verbos copulativos/predicativos
-        verbos_predicativos = {'ser', 'estar', 'resultar', 'parecer', 'mostrarse',
-                               'revelarse', 'demostrarse', 'considerarse'}
-
-        for token in doc:
-            if token.lemma_.lower() in verbos_predicativos:
-                # Buscar sujeto nominal musical
-                sujeto = None
-                for child in token.children:
-                    if child.dep_ in ("nsubj", "nsubjpass"):
-                        if (child.lemma_.lower() == "música" or
-                            child.lemma_.lower() in TERMINOS_MUSICALES):
-                            sujeto = child
-                            break
-
-                if sujeto:
-                    # Buscar adjetivo predicativo
-                    for child in token.children:
-                        if child.dep_ in ("acomp", "attr") and child.pos_ == "ADJ":
-                            lema = child.lemma_.lower()
-                            polaridad = self.clasificar_polaridad(lema)
-
-                            if polaridad in ['positiva', 'negativa']:
-                                negado = self.detectar_negacion_cercana(child, doc)
-                                if negado and polaridad == 'positiva':
-                                    polaridad = 'negativa'
-                                elif negado and polaridad == 'negativa':
-                                    polaridad = 'positiva'
-
-                                valoraciones.append({
-                                    'adjetivo': lema,
-                                    'polaridad': polaridad,
-                                    'nivel': 3,
-                                    'verbo': token.lemma_.lower(),
-                                    'sujeto': sujeto.lemma_.lower(),
-                                    'negado': negado,
-                                    'contexto': doc[max(0, sujeto.i-10):min(len(doc), child.i+10)].text
-                                })
-
-                                self.valoraciones_nivel3[lema] += 1
-
-                                if polaridad == 'positiva':
-                                    self.positivas_total[lema] += 1
-                                    self.stats_por_publicacion[publicacion]['positivas'][lema] += 1
-                                    self.contextos_positivos.append(valoraciones[-1]['contexto'])
-                                elif polaridad == 'negativa':
-                                    self.negativas_total[lema] += 1
-                                    self.stats_por_publicacion[publicacion]['negativas'][lema] += 1
-                                    self.contextos_negativos.append(valoraciones[-1]['contexto'])
+        # Buscar sujeto nominal musical
+        sujeto = None
+        for child in token.children:
+            if child.dep_ in ("nsubj", "nsubjpass"):
+                if (child.lemma_.lower() == "música" or
+                    child.lemma_.lower() in TERMINOS_MUSICALES):
+                    sujeto = child
+                    break
+
+        if sujeto:
+            # Buscar adjetivo predicativo
+            for child in token.children:
+                if child.dep_ in ("acomp", "attr") and child.pos_ == "ADJ":
+                    polaridad = self._polaridades.token(child)
+
+                    if polaridad in ['positiva', 'negativa']:
+                        lema = child.lemma_.lower()
+                        # La negación también puede depender del verbo ("no resultó sublime")
+                        negado = negacion.negado(child.i, self.distancias_negacion[3], (token.i,))
+                        polaridad = self.invertir_si_negado(polaridad, negado)
+
+                        valoraciones.append({
+                            'adjetivo': lema,
+                            'polaridad': polaridad,
+                            'nivel': 3,
+                            'verbo': token.lemma_.lower(),
+                            'sujeto': sujeto.lemma_.lower(),
+                            'negado': negado,
+                            'peso': self.peso_contextual(self.modificadores(child, doc), negado),
+                            'ocurrencia': ocurrencia(doc, sujeto.i - 10, child.i + 10)
+                        })
 
         return valoraciones
 
-    def procesar_documento(self, texto: str, nombre_archivo: str = "", publicacion: str = ""):
-        """Procesa un documento completo con análisis multinivel"""
-        doc = self.nlp(texto)
-
-        todas_valoraciones = []
+    def extraer_valoraciones_tokens(self, doc, publicacion=""):
+        """
+        Los tres niveles en un solo recorrido de los tokens (zona propia del Doc)
 
-        # Contar menciones de "música"
-        for token in doc:
-            if token.lemma_.lower() == "música":
+        Cada token se envía a todos los niveles que le corresponden ("música"
+        también es un término musical, por ejemplo). Las valoraciones se
+        registran al final por niveles, en el mismo orden que si cada nivel
+        recorriera el Doc por separado.
+        """
+        por_nivel = ([], [], [])
+        negacion = IndiceNegacion(doc, NEGACIONES, self.negacion_por_dependencias)
+        for token in tokens_propios(doc):
+            lema = token.lemma_.lower()
+            if lema == "música":
                 self.menciones_musica += 1
                 self.stats_por_publicacion[publicacion]['total_menciones'] += 1
+                por_nivel[0].extend(self.extraer_valoraciones_nivel1(token, doc, negacion))
+            if lema in TERMINOS_MUSICALES:
+                self.menciones_terminos_relacionados += 1
+                por_nivel[1].extend(self.extraer_valoraciones_nivel2(token, doc, negacion))
+            if lema in VERBOS_PREDICATIVOS:
+                por_nivel[2].extend(self.extraer_valoraciones_nivel3(token, doc, negacion))
 
-                # Nivel 1: adjetivos directos sobre "música"
-                vals_n1 = self.extraer_valoraciones_nivel1(token, doc, publicacion)
-                todas_valoraciones.extend(vals_n1)
+        valoraciones = []
+        contadores = (self.valoraciones_nivel1, self.valoraciones_nivel2, self.valoraciones_nivel3)
+        for valoraciones_nivel, contador in zip(por_nivel, contadores):
+            for valoracion in valoraciones_nivel:
+                self._registrar(valoraciones, valoracion, contador, publicacion)
+        return valoraciones
 
-        # Nivel 2: adjetivos sobre términos relacionados
-        vals_n2 = self.extraer_valoraciones_nivel2(doc, publicacion)
-        todas_valoraciones.extend(vals_n2)
+    # ------------------------------------------------------------------------
+    # Los mismos niveles sobre las columnas del Doc (columnas_doc.py)
+    # ------------------------------------------------------------------------
 
-        # Nivel 3: construcciones predicativas
-        vals_n3 = self.extraer_valoraciones_nivel3(doc, publicacion)
-        todas_valoraciones.extend(vals_n3)
+    def extraer_valoraciones_nivel1_columnas(self, i, columnas, negacion, adjetivales,
+                                             moduladores, publicacion=""):
+        """NIVEL 1 sobre columnas: i es la posición de "música" """
+        valoraciones = []
+        doc = columnas.doc
+        advmod = columnas.dependencia("advmod")
 
-        self.total_documentos += 1
+        for j in columnas.hijos(i):
+            if adjetivales[j]:
+                lema = columnas.lema(j)
+                negado = negacion.negado(j, self.distancias_negacion[1])
+                polaridad = self.invertir_si_negado(self.clasificar_polaridad(lema), negado)
 
-        return todas_valoraciones
+                modificadores = self._modificadores_columnas(j, columnas, moduladores, advmod)
 
-    def procesar_corpus(self, directorio_base: str):
-        """Procesa todo el corpus organizando por publicación"""
-        base_path = Path(directorio_base)
+                self._registrar(valoraciones, {
+                    'adjetivo': lema,
+                    'polaridad': polaridad,
+                    'nivel': 1,
+                    'negado': negado,
+                    'peso': self.peso_contextual(modificadores, negado),
+                    'ocurrencia': ocurrencia(doc, i - 15, i + 15)
+                }, self.valoraciones_nivel1, publicacion)
 
-        publicaciones = {
-            'EL SOL': base_path / 'EL SOL',
-            'ONDAS': base_path / 'ONDAS',
-            'ESPAÑA': base_path / 'ESPAÑA'
-        }
+        return valoraciones
+
+    def extraer_valoraciones_nivel2_columnas(self, columnas, negacion, adjetivales, moduladores,
+                                             publicacion=""):
+        """NIVEL 2 sobre columnas"""
+        valoraciones = []
+        doc = columnas.doc
+        advmod = columnas.dependencia("advmod")
+        terminos = columnas.lemas(TERMINOS_MUSICALES) & columnas.propios
+
+        for i in columnas.indices(terminos):
+            self.menciones_terminos_relacionados += 1
 
-        for nombre_pub, ruta_pub in publicaciones.items():
-            if not ruta_pub.exists():
-                print(f"⚠️  {ruta_pub} no existe, saltando...")
+            for j in columnas.hijos(i):
+                if not adjetivales[j]:
+                    continue
+                lema = columnas.lema(j)
+                polaridad = self.clasificar_polaridad(lema)
+
+                # Solo contar si es evaluativo
+                if polaridad in ['positiva', 'negativa']:
+                    negado = negacion.negado(j, self.distancias_negacion[2])
+                    polaridad = self.invertir_si_negado(polaridad, negado)
+                    modificadores = self._modificadores_columnas(j, columnas, moduladores, advmod)
+
+                    self._registrar(valoraciones, {
+                        'adjetivo': lema,
+                        'polaridad': polaridad,
+                        'nivel': 2,
+                        'termino_asociado': columnas.lema(i),
+                        'negado': negado,
+                        'peso': self.peso_contextual(modificadores, negado),
+                        'ocurrencia': ocurrencia(doc, i - 15, i + 15)
+                    }, self.valoraciones_nivel2, publicacion)
+
+        return valoraciones
+
+    def extraer_valoraciones_nivel3_columnas(self, columnas, negacion, moduladores, publicacion=""):
+        """NIVEL 3 sobre columnas"""
+        valoraciones = []
+        doc = columnas.doc
+        advmod = columnas.dependencia("advmod")
+        verbos = columnas.lemas(VERBOS_PREDICATIVOS) & columnas.propios
+        sujetos = (columnas.dependencia("nsubj", "nsubjpass") &
+                   columnas.lemas(TERMINOS_MUSICALES | {"música"}))
+        predicativos = columnas.dependencia("acomp", "attr") & columnas.categoria("ADJ")
+
+        for i in columnas.indices(verbos):
+            hijos = columnas.hijos(i)
+            # Primer sujeto nominal musical
+            sujeto = next((j for j in hijos if sujetos[j]), None)
+            if sujeto is None:
                 continue
 
-            archivos = list(ruta_pub.glob("*.txt"))
+            for j in hijos:
+                if not predicativos[j]:
+                    continue
+                lema = columnas.lema(j)
+                polaridad = self.clasificar_polaridad(lema)
+
+                if polaridad in ['positiva', 'negativa']:
+                    negado = negacion.negado(j, self.distancias_negacion[3], (i,))
+                    polaridad = self.invertir_si_negado(polaridad, negado)
+                    modificadores = self._modificadores_columnas(j, columnas, moduladores, advmod)
+
+                    self._registrar(valoraciones, {
+                        'adjetivo': lema,
+                        'polaridad': polaridad,
+                        'nivel': 3,
+                        'verbo': columnas.lema(i),
+                        'sujeto': columnas.lema(sujeto),
+                        'negado': negado,
+                        'peso': self.peso_contextual(modificadores, negado),
+                        'ocurrencia': ocurrencia(doc, sujeto - 10, j + 10)
+                    }, self.valoraciones_nivel3, publicacion)
+
+        return valoraciones
+
+    def procesar_documento(self, texto: str, nombre_archivo: str = "", publicacion: str = ""):
+        """Procesa un documento completo con análisis multinivel"""
+        return [valoracion for doc in self.analisis.fragmentos(texto)
+                for valoracion in self.procesar_doc(doc, nombre_archivo, publicacion)]
+
+    def procesar_doc(self, doc, nombre_archivo: str = "", publicacion: str = "", columnas=None):
+        """
+        Análisis multinivel de un documento ya analizado por spaCy
+
+        Si el Doc es un fragmento de un documento largo, solo se cuentan las
+        menciones y predicaciones de su zona propia (fragmentos_documento.py).
+        Con self.columnar, los niveles se extraen sobre las columnas del Doc
+        (columnas_doc.py) con los mismos resultados; `columnas` son las ya
+        construidas para el Doc o una de sus zonas (cache_extraccion.py).
+        """
+        todas_valoraciones = []
+        self._polaridades.comprobar()
+
+        if self.columnar:
+            # Máscaras comunes a los niveles, calculadas una vez por Doc (y por todas sus zonas)
+            if columnas is None:
+                columnas = ColumnasDoc(doc)
+            negacion, adjetivales, moduladores = columnas.memo(type(self).__name__, lambda: (
+                IndiceNegacion.de_columnas(columnas, columnas.lemas(NEGACIONES),
+                                           self.negacion_por_dependencias),
+                columnas.categoria("ADJ") | columnas.dependencia("amod", "acomp"),
+                columnas.lemas(MODIFICADORES)
+            ))
+
+            for i in columnas.indices(columnas.lemas({"música"}) & columnas.propios):
+                self.menciones_musica += 1
+                self.stats_por_publicacion[publicacion]['total_menciones'] += 1
+                todas_valoraciones.extend(self.extraer_valoraciones_nivel1_columnas(
+                    i, columnas, negacion, adjetivales, moduladores, publicacion))
+
+            todas_valoraciones.extend(self.extraer_valoraciones_nivel2_columnas(
+                columnas, negacion, adjetivales, moduladores, publicacion))
+            todas_valoraciones.extend(
+                self.extraer_valoraciones_nivel3_columnas(columnas, negacion, moduladores, publicacion))
+        else:
+            # Niveles 1 (adjetivos sobre "música"), 2 (sobre términos relacionados)
+            # y 3 (construcciones predicativas) en un solo recorrido
+            todas_valoraciones.extend(self.extraer_valoraciones_tokens(doc, publicacion))
+
+        if es_ultimo_fragmento(doc):
+            self.total_documentos += 1
+
+        return todas_valoraciones
+
+    def procesar_corpus(self, directorio_base: str, incremental: bool = True,
+                        anticipacion: int = DOCUMENTOS_ANTICIPADOS,
+                        omitir_duplicados: bool = True, quitar_repeticiones: bool = True,
+                        filtrar_calidad: bool = True, prefiltrar: bool = True,
+                        procesos: int = PROCESOS, lote: int = LOTE_DOCUMENTOS,
+                        reciclar: int = RECICLAR_DOCUMENTOS, cache_extraccion: str = 'no'):
+        """
+        Procesa todo el corpus organizando por publicación
+
+        `directorio_base` puede ser la carpeta del corpus o un paquete .corpus.
+        Con incremental=True solo se analizan los archivos nuevos o modificados
+        desde la ejecución anterior; el resto reutiliza su resultado guardado.
+        Los siguientes `anticipacion` documentos se leen en un hilo aparte
+        mientras spaCy analiza el actual (0 para desactivarlo).
+        Con omitir_duplicados=True los reescaneos y páginas casi idénticas
+        (duplicados_corpus.py) no se analizan ni se cuentan, y con
+        quitar_repeticiones=True se eliminan antes del análisis las líneas
+        repetidas en muchos números (repeticiones_corpus.py). Con filtrar_calidad=True
+        los documentos y párrafos ilegibles no se analizan (calidad_ocr.py), y con
+        prefiltrar=True solo se analizan los párrafos que mencionan "música" o un
+        término musical, con su contexto (prefiltro_objetivo.py).
+        Con procesos > 1, los documentos pendientes se reparten entre procesos que
+        comparten el modelo cargado una vez (pool_analisis.py) y que se renuevan
+        cada `reciclar` documentos; con uno, pasan por nlp.pipe en lotes de
+        `lote` documentos. Con cache_extraccion 'disco' o 'memoria', las oraciones
+        ya vistas no se analizan y se suma lo que se extrajo de ellas
+        (cache_extraccion.py); con 'no' (por defecto), se analiza todo.
+        """
+        corpus = abrir_corpus(directorio_base)
+        corpus_incremental = CorpusIncremental(corpus, self, self.firma_configuracion(),
+                                               activo=incremental)
+        publicaciones = ['EL SOL', 'ONDAS', 'ESPAÑA']
+
+        def recorrido():
+            return itertools.chain.from_iterable(corpus.documentos(p, recursivo=False)
+                                                 for p in publicaciones if corpus.contiene(p))
+
+        if omitir_duplicados:
+            corpus_incremental.duplicados = detectar_duplicados(
+                corpus, recorrido(), manifiesto=corpus_incremental.manifiesto
+            )
+        if quitar_repeticiones:
+            corpus_incremental.repeticiones = detectar_repeticiones(
+                corpus, recorrido(), manifiesto=corpus_incremental.manifiesto
+            )
+        if filtrar_calidad:
+            corpus_incremental.calidad = FiltroCalidad()
+        if prefiltrar:
+            # Solo los párrafos con "música" o un término musical (y su contexto) van a spaCy
+            corpus_incremental.prefiltro = PrefiltroObjetivo({'música'} | TERMINOS_MUSICALES)
+        self.extraccion = crear_cache_extraccion(self, {'música'} | TERMINOS_MUSICALES,
+                                                 cache_extraccion)
+        # Con varios procesos, el modelo y los léxicos se cargan aquí y los comparten todos (fork)
+        pool = PoolAnalisis(self, procesos, lote, reciclar)
+        if pool.activo:
+            # Los procesos se crean con fork: mejor sin hilos de lectura en marcha
+            anticipacion = 0
+
+        for nombre_pub in publicaciones:
+            if not corpus.contiene(nombre_pub):
+                print(f"⚠️  {nombre_pub} no existe en {directorio_base}, saltando...")
+                continue
+
+            n_archivos = corpus.contar(nombre_pub, recursivo=False)
             print(f"\n{'='*70}")
-            print(f"Procesando: {nombre_pub} ({len(archivos)} archivos)")
+            print(f"Procesando: {nombre_pub} ({n_archivos} archivos)")
             print(f"{'='*70}")
 
-            for i, archivo in enumerate(archivos, 1):
+            documentos = precargar_documentos(
+                corpus.documentos(nombre_pub, recursivo=False), anticipacion,
+                corpus_incremental.requiere_lectura
+            )
+            inicio = corpus_incremental.vistos
+            avisados = 0
+            pendientes = corpus_incremental.pendientes(documentos)
+            analizados = pool.recorrer(pendientes, lambda archivo: (archivo.nombre, nombre_pub))
+            for archivo, procesar in analizados:
                 try:
-                    texto = archivo.read_text(encoding='utf-8', errors='ignore')
-                    self.procesar_documento(texto, archivo.name, nombre_pub)
-
-                    if i % 50 == 0:
-                        print(f"  ✓ {i}/{len(archivos)} archivos procesados...")
-
+                    corpus_incremental.completar(archivo, procesar)
                 except Exception as e:
-                    print(f"  ✗ Error en {archivo.name}: {e}")
-
-            print(f"  ✓ {nombre_pub} completado: {len(archivos)} archivos")
+                    print(f"  ✗ Error en {archivo.nombre}: {e}")
+
+                i = corpus_incremental.vistos - inicio
+                if i // 50 > avisados:
+                    avisados = i // 50
+                    print(f"  ✓ {i}/{n_archivos} archivos procesados...")
+
+            print(f"  ✓ {nombre_pub} completado: {n_archivos} archivos")
+
+        pool.cerrar()
+        corpus_incremental.guardar()
+        if filtrar_calidad:
+            self.descartes_calidad = {clave: corpus_incremental.descartes_calidad[clave]
+                                      for clave in CONTADORES_DESCARTE}
+        print(f"  💾 Caché de análisis: {self.analisis.resumen()}")
+        if self.extraccion is not None:
+            self.extraccion.cerrar()
+            print(f"  ♻ Caché de extracción: {self.extraccion.resumen()}")
+
+    @staticmethod
+    def ejemplos_contextos(contextos: ContextosCorpus, ocurrencias: list, maximo: int = 20) -> List[str]:
+        """Texto de las primeras `maximo` ocurrencias recuperables (las demás cuentan en contextos.perdidos)"""
+        textos = (contextos.texto(o) for o in ocurrencias)
+        return list(itertools.islice((texto for texto in textos if texto is not None), maximo))
 
     def generar_informe_completo(self, salida_json: str, salida_csv: str):
         """Genera informe completo comparativo"""
@@ -422,6 +756,11 @@ class AnalizadorValoracionesMejorado:
         total_valoraciones = sum(self.positivas_total.values()) + sum(self.negativas_total.values())
         total_positivas = sum(self.positivas_total.values())
         total_negativas = sum(self.negativas_total.values())
+        # Nivel 4: cada valoración cuenta según sus intensificadores y atenuadores
+        ponderadas_positivas = round(sum(self.positivas_ponderadas.values()), 2)
+        ponderadas_negativas = round(sum(self.negativas_ponderadas.values()), 2)
+        # Solo los ejemplos del informe se convierten en texto, desde la caché de análisis
+        contextos = ContextosCorpus(self.analisis)
 
         # Datos JSON
         resultados = {
@@ -432,9 +771,13 @@ class AnalizadorValoracionesMejorado:
                 'total_valoraciones_encontradas': total_valoraciones,
                 'valoraciones_positivas': total_positivas,
                 'valoraciones_negativas': total_negativas,
+                'valoraciones_positivas_ponderadas': ponderadas_positivas,
+                'valoraciones_negativas_ponderadas': ponderadas_negativas,
                 'porcentaje_positivas': round(100 * total_positivas / total_valoraciones, 2) if total_valoraciones > 0 else 0,
                 'porcentaje_negativas': round(100 * total_negativas / total_valoraciones, 2) if total_valoraciones > 0 else 0,
             },
+            # Documentos y párrafos ilegibles que no se analizaron (None: filtro desactivado)
+            'calidad_ocr': self.descartes_calidad,
             'comparacion_con_articulo': {
                 'articulo_positivas_porcentaje': 3.9,
                 'articulo_negativas_porcentaje': 0.4,
@@ -446,7 +789,8 @@ class AnalizadorValoracionesMejorado:
             'por_nivel_analisis': {
                 'nivel_1_musica_directa': len(self.valoraciones_nivel1),
                 'nivel_2_terminos_relacionados': len(self.valoraciones_nivel2),
-                'nivel_3_predicativas_distantes': len(self.valoraciones_nivel3)
+                'nivel_3_predicativas_distantes': len(self.valoraciones_nivel3),
+                'nivel_4_polaridad_contextual': len(self.valoraciones_nivel4)
             },
             'top_50_positivas': dict(self.positivas_total.most_common(50)),
             'top_50_negativas': dict(self.negativas_total.most_common(50)),
@@ -454,14 +798,20 @@ class AnalizadorValoracionesMejorado:
                 pub: {
                     'positivas_total': sum(data['positivas'].values()),
                     'negativas_total': sum(data['negativas'].values()),
+                    'positivas_ponderadas': round(data['positivas_ponderadas'], 2),
+                    'negativas_ponderadas': round(data['negativas_ponderadas'], 2),
                     'top_10_positivas': dict(data['positivas'].most_common(10)),
                     'top_10_negativas': dict(data['negativas'].most_common(10))
                 }
                 for pub, data in self.stats_por_publicacion.items()
             },
-            'ejemplos_contextos_positivos': self.contextos_positivos[:20],
-            'ejemplos_contextos_negativos': self.contextos_negativos[:20]
+            'ejemplos_contextos_positivos': self.ejemplos_contextos(contextos, self.contextos_positivos),
+            'ejemplos_contextos_negativos': self.ejemplos_contextos(contextos, self.contextos_negativos),
+            # Ejemplos saltados porque su Doc ya no está en la caché de análisis
+            'contextos_perdidos': contextos.perdidos
         }
+        if contextos.perdidos:
+            print(f"  ⚠️  {contextos.perdidos} contextos sin Doc en la caché de análisis (vaciada o borrada)")
 
         # Guardar JSON
         with open(salida_json, 'w', encoding='utf-8') as f:
@@ -476,29 +826,35 @@ class AnalizadorValoracionesMejorado:
                 'Adjetivo',
                 'Polaridad',
                 'Frecuencia_Total',
+                'Frecuencia_Ponderada',
                 'Nivel_1',
                 'Nivel_2',
                 'Nivel_3',
+                'Nivel_4',
                 'Porcentaje_del_Total'
             ])
 
             # Positivas
             for adj, freq in self.positivas_total.most_common():
+                ponderada = round(self.positivas_ponderadas.get(adj, 0), 2)
                 n1 = self.valoraciones_nivel1.get(adj, 0)
                 n2 = self.valoraciones_nivel2.get(adj, 0)
                 n3 = self.valoraciones_nivel3.get(adj, 0)
+                n4 = self.valoraciones_nivel4.get(adj, 0)
                 pct = round(100 * freq / total_valoraciones, 2) if total_valoraciones > 0 else 0
 
-                writer.writerow([adj, 'POSITIVA', freq, n1, n2, n3, pct])
+                writer.writerow([adj, 'POSITIVA', freq, ponderada, n1, n2, n3, n4, pct])
 
             # Negativas
             for adj, freq in self.negativas_total.most_common():
+                ponderada = round(self.negativas_ponderadas.get(adj, 0), 2)
                 n1 = self.valoraciones_nivel1.get(adj, 0)
                 n2 = self.valoraciones_nivel2.get(adj, 0)
                 n3 = self.valoraciones_nivel3.get(adj, 0)
+                n4 = self.valoraciones_nivel4.get(adj, 0)
                 pct = round(100 * freq / total_valoraciones, 2) if total_valoraciones > 0 else 0
 
-                writer.writerow([adj, 'NEGATIVA', freq, n1, n2, n3, pct])
+                writer.writerow([adj, 'NEGATIVA', freq, ponderada, n1, n2, n3, n4, pct])
 
         print(f"✓ CSV comparativo guardado: {salida_csv}")
 
@@ -522,6 +878,7 @@ class AnalizadorValoracionesMejorado:
         print(f"\n✅ VALORACIONES POSITIVAS")
         print("-" * 80)
         print(f"  Total:      {res['valoraciones_positivas']:,}")
+        print(f"  Ponderado:  {res['valoraciones_positivas_ponderadas']:,.1f}")
         print(f"  Porcentaje: {res['porcentaje_positivas']:.1f}%")
         print(f"\n  Top 10:")
         for adj, freq in list(self.positivas_total.most_common(10)):
@@ -530,6 +887,7 @@ class AnalizadorValoracionesMejorado:
         print(f"\n❌ VALORACIONES NEGATIVAS")
         print("-" * 80)
         print(f"  Total:      {res['valoraciones_negativas']:,}")
+        print(f"  Ponderado:  {res['valoraciones_negativas_ponderadas']:,.1f}")
         print(f"  Porcentaje: {res['porcentaje_negativas']:.1f}%")
         print(f"\n  Top 10:")
         for adj, freq in list(self.negativas_total.most_common(10)):
@@ -555,13 +913,14 @@ class AnalizadorValoracionesMejorado:
         print(f"  Nivel 1 (música directa):         {niveles['nivel_1_musica_directa']:,}")
         print(f"  Nivel 2 (términos relacionados):  {niveles['nivel_2_terminos_relacionados']:,}")
         print(f"  Nivel 3 (predicativas distantes): {niveles['nivel_3_predicativas_distantes']:,}")
+        print(f"  Nivel 4 (polaridad contextual):   {niveles['nivel_4_polaridad_contextual']:,}")
 
         print(f"\n📰 POR PUBLICACIÓN")
         print("-" * 80)
         for pub, data in resultados['por_publicacion'].items():
             print(f"\n  {pub}:")
-            print(f"    Positivas: {data['positivas_total']:,}")
-            print(f"    Negativas: {data['negativas_total']:,}")
+            print(f"    Positivas: {data['positivas_total']:,} (ponderado {data['positivas_ponderadas']:,.1f})")
+            print(f"    Negativas: {data['negativas_total']:,} (ponderado {data['negativas_ponderadas']:,.1f})")
 
         print("\n" + "="*80 + "\n")
 
@@ -570,6 +929,23 @@ class AnalizadorValoracionesMejorado:
 # FUNCIÓN PRINCIPAL
 # ============================================================================
 
+def leer_argumentos(corpus_por_defecto: str):
+    """Corpus, procesos y tamaño de lote desde la línea de órdenes"""
+    parser = argparse.ArgumentParser(description="Valoraciones en crítica musical")
+    parser.add_argument('corpus', nargs='?', default=corpus_por_defecto,
+                        help="Corpus: carpeta, paquete .corpus o archivo comprimido")
+    parser.add_argument('--procesos', type=int, default=PROCESOS,
+                        help="Procesos de análisis con el modelo compartido (-1 = todos los núcleos)")
+    parser.add_argument('--lote', type=int, default=LOTE_DOCUMENTOS,
+                        help="Documentos por lote de nlp.pipe (batch_size)")
+    parser.add_argument('--reciclar', type=int, default=RECICLAR_DOCUMENTOS,
+                        help="Documentos que analiza cada proceso antes de renovarlo")
+    parser.add_argument('--cache-extraccion', choices=MODOS_CACHE, default='no',
+                        help="Reutilizar lo extraído de las oraciones repetidas: en disco, solo en memoria "
+                             "o no (por defecto; cache_extraccion.py --comprobar)")
+    return parser.parse_args()
+
+
 def main():
     """Ejecuta el análisis completo"""
 
@@ -583,6 +959,9 @@ def main():
     SALIDA_JSON = "/Users/maria/Desktop/Campos_Música Resonancias/resultados_valoraciones_mejorado.json"
     SALIDA_CSV = "/Users/maria/Desktop/Campos_Música Resonancias/valoraciones_detalladas.csv"
 
+    argumentos = leer_argumentos(CORPUS_DIR)
+    CORPUS_DIR = argumentos.corpus
+
     # Verificar que existe el directorio
     if not Path(CORPUS_DIR).exists():
         print(f"\n❌ ERROR: No se encuentra el directorio {CORPUS_DIR}")
@@ -598,7 +977,9 @@ def main():
 
     # Procesar corpus
     try:
-        analizador.procesar_corpus(CORPUS_DIR)
+        analizador.procesar_corpus(CORPUS_DIR, procesos=argumentos.procesos,
+                                   lote=argumentos.lote, reciclar=argumentos.reciclar,
+                                   cache_extraccion=argumentos.cache_extraccion)
     except Exception as e:
         print(f"\n❌ Error durante el procesamiento: {e}")
         import traceback
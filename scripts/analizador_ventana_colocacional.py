@@ -9,21 +9,37 @@ Autor: María Palacios Nieto - Universidad de Salamanca
 Fecha: Noviembre 2024
 """
 
-import spacy
+import argparse
 from collections import Counter, defaultdict
 import json
 import csv
-from pathlib import Path
 from typing import Dict, List, Tuple, Set
 import re
+import itertools
+
+from cache_analisis import LOTE_DOCUMENTOS, PROCESOS
+from cache_extraccion import MODOS_CACHE, crear_cache_extraccion
+from calidad_ocr import CONTADORES_DESCARTE, FiltroCalidad
+from cargador_corpus import abrir_corpus
+from contextos_corpus import VERSION_OCURRENCIAS, ocurrencia
+from columnas_doc import ColumnasDoc
+from duplicados_corpus import detectar_duplicados
+from fragmentos_documento import es_ultimo_fragmento, tokens_propios
+from manifiesto_corpus import CorpusIncremental, firma_configuracion
+from perfiles_spacy import PERFILES
+from pool_analisis import RECICLAR_DOCUMENTOS, PoolAnalisis
+from prefiltro_objetivo import PrefiltroObjetivo
+from recursos import analisis_spacy
+from repeticiones_corpus import detectar_repeticiones
+from tabla_lemas import TablaLemas
 
 # Configuración
 WINDOW_SIZE = 5  # Ventana de ±5 palabras (ajustable a 3)
 MIN_FREQ = 3  # Frecuencia mínima para considerar un adjetivo
 
-# Cargar modelo de spaCy (asegúrate de tener instalado: python -m spacy download es_core_news_md)
-print("Cargando modelo de spaCy...")
-nlp = spacy.load("es_core_news_md")
+# Perfil del modelo spaCy (perfiles_spacy.py): "dependencias" para los dos métodos;
+# con "ventana" no se carga el parser y solo se cuentan los adjetivos por proximidad
+PERFIL_SPACY = "dependencias"
 
 # Listas de exclusión (sustantivos que pueden aparecer como falsos positivos)
 EXCLUSIONES = {
@@ -48,29 +64,65 @@ class AnalizadorVentanaColocacional:
     3. Filtrado por POS-tagging (solo adjetivos reales)
     """
 
-    def __init__(self, ventana=5):
+    # Acumuladores que se guardan por documento para el re-análisis incremental
+    CAMPOS_ACUMULADOS = (
+        'adjetivos_dependencia', 'adjetivos_ventana', 'contextos',
+        'relaciones_sintacticas', 'total_menciones_musica', 'docs_procesados'
+    )
+
+    def __init__(self, ventana=5, perfil=PERFIL_SPACY, columnar=True):
         self.ventana = ventana
+        self.perfil = perfil
+        # Extracción sobre columnas NumPy (columnas_doc.py); False: recorrido por tokens
+        self.columnar = columnar
+        # Resultados por oración ya extraídos (cache_extraccion.py), desde procesar_corpus()
+        self.extraccion = None
+        # Descartes del filtro de calidad OCR de todo el corpus (calidad_ocr.py), desde procesar_corpus()
+        self.descartes_calidad = None
+        # Adjetivos válidos por lema, para todos los documentos (tabla_lemas.py)
+        self._validos = TablaLemas(self.es_lema_valido, EXCLUSIONES)
+        self._reiniciar_acumuladores()
+
+    @property
+    def analisis(self):
+        """
+        Análisis spaCy guardados en disco y compartidos con los demás analizadores
+
+        El modelo se carga al analizar el primer documento, no al crear el analizador.
+        """
+        return analisis_spacy(self.perfil)
+
+    def _reiniciar_acumuladores(self):
         self.adjetivos_dependencia = Counter()  # Adjetivos por dependencia sintáctica
         self.adjetivos_ventana = Counter()      # Adjetivos por proximidad
-        self.contextos = defaultdict(list)      # Contextos completos para análisis cualitativo
+        self.contextos = defaultdict(list)      # Ocurrencias por adjetivo (contextos_corpus.py)
         self.relaciones_sintacticas = defaultdict(list)
 
         # Estadísticas
         self.total_menciones_musica = 0
         self.docs_procesados = 0
 
+    def firma_configuracion(self) -> str:
+        """Identifica la configuración: si cambia, se invalida el re-análisis incremental"""
+        return firma_configuracion(type(self).__name__, self.ventana, EXCLUSIONES, self.perfil,
+                                   VERSION_OCURRENCIAS)
+
     def es_adjetivo_valido(self, token) -> bool:
         """
         Verifica si un token es un adjetivo válido
         - Debe ser POS=ADJ
         - No estar en lista de exclusiones
         - Tener al menos 3 caracteres
+
+        El lema se comprueba una sola vez (tabla por lema)
         """
         if token.pos_ != "ADJ":
             return False
+        return self._validos.token(token)
 
-        lema = token.lemma_.lower()
-
+    @staticmethod
+    def es_lema_valido(lema: str) -> bool:
+        """Lema de adjetivo admisible: fuera de las exclusiones, 3 letras o más, sin cifras ni símbolos"""
         if lema in EXCLUSIONES:
             return False
 
@@ -93,8 +145,14 @@ class AnalizadorVentanaColocacional:
         - nsubj/nsubjpass: sujeto nominal ("La música es sublime")
         - acomp: complemento adjetival ("la música resultó magnífica")
         - xcomp: complemento predicativo ("consideran la música excelente")
+
+        Con el perfil "ventana" no hay análisis de dependencias y no se extrae nada.
         """
         adjetivos_encontrados = []
+        if not doc.has_annotation("DEP"):
+            return adjetivos_encontrados
+        # Tramo del contexto, común a todos los adjetivos de esta mención
+        contexto = ocurrencia(doc, token_musica.i - 10, token_musica.i + 10)
 
         # 1. Modificadores adjetivales directos (amod)
         for child in token_musica.children:
@@ -103,7 +161,7 @@ class AnalizadorVentanaColocacional:
                     'lema': child.lemma_.lower(),
                     'relacion': 'amod',
                     'texto': child.text,
-                    'contexto': doc[max(0, token_musica.i-10):min(len(doc), token_musica.i+10)].text
+                    'ocurrencia': contexto
                 })
 
                 # Buscar adjetivos coordinados ("española y moderna")
@@ -113,7 +171,7 @@ class AnalizadorVentanaColocacional:
                             'lema': conj_child.lemma_.lower(),
                             'relacion': 'conj',
                             'texto': conj_child.text,
-                            'contexto': doc[max(0, token_musica.i-10):min(len(doc), token_musica.i+10)].text
+                            'ocurrencia': contexto
                         })
 
         # 2. Construcciones predicativas ("La música es española")
@@ -125,7 +183,7 @@ class AnalizadorVentanaColocacional:
                         'lema': child.lemma_.lower(),
                         'relacion': child.dep_,
                         'texto': child.text,
-                        'contexto': doc[max(0, token_musica.i-10):min(len(doc), token_musica.i+10)].text
+                        'ocurrencia': contexto
                     })
 
         # 3. Música como objeto ("consideran la música excelente")
@@ -137,7 +195,7 @@ class AnalizadorVentanaColocacional:
                         'lema': child.lemma_.lower(),
                         'relacion': 'xcomp',
                         'texto': child.text,
-                        'contexto': doc[max(0, token_musica.i-10):min(len(doc), token_musica.i+10)].text
+                        'ocurrencia': contexto
                     })
 
         return adjetivos_encontrados
@@ -147,6 +205,7 @@ class AnalizadorVentanaColocacional:
         Extrae adjetivos en ventana de ±N palabras, filtrando por POS
         """
         adjetivos_encontrados = []
+        contexto = ocurrencia(doc, token_musica.i - 10, token_musica.i + 10)
 
         start = max(0, token_musica.i - self.ventana)
         end = min(len(doc), token_musica.i + self.ventana + 1)
@@ -164,85 +223,200 @@ class AnalizadorVentanaColocacional:
                     'lema': token.lemma_.lower(),
                     'distancia': distancia,
                     'texto': token.text,
-                    'contexto': doc[max(0, token_musica.i-10):min(len(doc), token_musica.i+10)].text
+                    'ocurrencia': contexto
                 })
 
         return adjetivos_encontrados
 
+    def extraer_adjetivos_dependencia_columnas(self, i, columnas, validos):
+        """extraer_adjetivos_dependencia() sobre las columnas del Doc (validos: adjetivos válidos)"""
+        adjetivos_encontrados = []
+        doc = columnas.doc
+        if not doc.has_annotation("DEP"):
+            return adjetivos_encontrados
+        contexto = ocurrencia(doc, i - 10, i + 10)
+
+        # 1. Modificadores adjetivales directos (amod) y sus coordinados (conj)
+        amod = columnas.dependencia("amod")
+        conj = columnas.dependencia("conj")
+        for j in columnas.hijos(i):
+            if amod[j] and validos[j]:
+                adjetivos_encontrados.append({'lema': columnas.lema(j), 'relacion': 'amod',
+                                              'texto': doc[j].text, 'ocurrencia': contexto})
+                for k in columnas.hijos(j):
+                    if conj[k] and validos[k]:
+                        adjetivos_encontrados.append({'lema': columnas.lema(k), 'relacion': 'conj',
+                                                      'texto': doc[k].text, 'ocurrencia': contexto})
+
+        # 2. Construcciones predicativas y 3. música como objeto
+        if columnas.dependencia("nsubj", "nsubjpass")[i]:
+            relaciones = columnas.dependencia("acomp", "attr")
+        elif columnas.dependencia("dobj", "obj")[i]:
+            relaciones = columnas.dependencia("xcomp")
+        else:
+            return adjetivos_encontrados
+        for j in columnas.hijos(int(columnas.cabeza[i])):
+            if relaciones[j] and validos[j]:
+                adjetivos_encontrados.append({'lema': columnas.lema(j), 'relacion': doc[j].dep_,
+                                              'texto': doc[j].text, 'ocurrencia': contexto})
+
+        return adjetivos_encontrados
+
+    def extraer_adjetivos_ventana_columnas(self, i, columnas, validos):
+        """extraer_adjetivos_ventana() sobre las columnas del Doc (validos: adjetivos válidos)"""
+        doc = columnas.doc
+        contexto = ocurrencia(doc, i - 10, i + 10)
+        start = max(0, i - self.ventana)
+        end = min(len(doc), i + self.ventana + 1)
+        return [{'lema': columnas.lema(j), 'distancia': abs(j - i),
+                 'texto': doc[j].text, 'ocurrencia': contexto}
+                for j in columnas.indices(validos[start:end], start) if j != i]
+
     def procesar_documento(self, texto: str, nombre_archivo: str = ""):
         """
         Procesa un documento completo
         """
-        doc = nlp(texto)
+        return sum(self.procesar_doc(doc, nombre_archivo)
+                   for doc in self.analisis.fragmentos(texto))
+
+    def procesar_doc(self, doc, nombre_archivo: str = "", columnas=None):
+        """
+        Procesa un documento ya analizado por spaCy
+
+        Con self.columnar, `columnas` son las ya construidas para el Doc o una de
+        sus zonas (cache_extraccion.py); si no se dan, se construyen.
+        """
+        self._validos.comprobar()
+        # Menciones de "música/músicas" (en un documento fragmentado, solo las de la
+        # zona propia del fragmento) y adjetivos por dependencia y por ventana
+        if self.columnar:
+            if columnas is None:
+                columnas = ColumnasDoc(doc)
+            validos = columnas.memo(type(self).__name__, lambda: (
+                columnas.categoria("ADJ") & columnas.por_lema(self._validos.lema)))
+            musica = columnas.lemas({"música"}) & columnas.propios
+            extracciones = ((self.extraer_adjetivos_dependencia_columnas(i, columnas, validos),
+                             self.extraer_adjetivos_ventana_columnas(i, columnas, validos))
+                            for i in columnas.indices(musica))
+        else:
+            extracciones = ((self.extraer_adjetivos_dependencia(token, doc),
+                             self.extraer_adjetivos_ventana(token, doc))
+                            for token in tokens_propios(doc)
+                            if token.lemma_.lower() == "música")
 
-        # Buscar todas las menciones de "música/músicas"
         menciones = 0
-        for token in doc:
-            if token.lemma_.lower() == "música":
-                menciones += 1
-                self.total_menciones_musica += 1
-
-                # Extraer adjetivos por dependencia sintáctica
-                adj_dep = self.extraer_adjetivos_dependencia(token, doc)
-                for adj in adj_dep:
-                    self.adjetivos_dependencia[adj['lema']] += 1
-                    self.relaciones_sintacticas[adj['relacion']].append({
-                        'adjetivo': adj['lema'],
-                        'archivo': nombre_archivo,
-                        'contexto': adj['contexto']
-                    })
+        for adj_dep, adj_vent in extracciones:
+            menciones += 1
+            self.total_menciones_musica += 1
+
+            # Extraer adjetivos por dependencia sintáctica
+            for adj in adj_dep:
+                self.adjetivos_dependencia[adj['lema']] += 1
+                self.relaciones_sintacticas[adj['relacion']].append({
+                    'adjetivo': adj['lema'],
+                    'archivo': nombre_archivo,
+                    'ocurrencia': adj['ocurrencia']
+                })
 
-                # Extraer adjetivos por ventana colocacional
-                adj_vent = self.extraer_adjetivos_ventana(token, doc)
-                for adj in adj_vent:
-                    self.adjetivos_ventana[adj['lema']] += 1
-                    self.contextos[adj['lema']].append({
-                        'archivo': nombre_archivo,
-                        'contexto': adj['contexto'],
-                        'distancia': adj['distancia']
-                    })
+            # Extraer adjetivos por ventana colocacional
+            for adj in adj_vent:
+                self.adjetivos_ventana[adj['lema']] += 1
+                self.contextos[adj['lema']].append({
+                    'archivo': nombre_archivo,
+                    'ocurrencia': adj['ocurrencia'],
+                    'distancia': adj['distancia']
+                })
 
-        self.docs_procesados += 1
+        if es_ultimo_fragmento(doc):
+            self.docs_procesados += 1
         return menciones
 
-    def procesar_corpus(self, directorio_corpus: str, subcorpus: str = ""):
+    def procesar_corpus(self, directorio_corpus: str, subcorpus: str = "", incremental: bool = True,
+                        omitir_duplicados: bool = True, quitar_repeticiones: bool = True,
+                        filtrar_calidad: bool = True, prefiltrar: bool = True,
+                        procesos: int = PROCESOS, lote: int = LOTE_DOCUMENTOS,
+                        reciclar: int = RECICLAR_DOCUMENTOS, cache_extraccion: str = 'no'):
         """
-        Procesa todos los archivos .txt de un directorio
+        Procesa todos los archivos .txt de un directorio (o de un paquete .corpus)
 
         Args:
-            directorio_corpus: Ruta base del corpus
+            directorio_corpus: Ruta base del corpus o paquete generado con paquete_corpus.py
             subcorpus: "EL SOL", "ONDAS", "ESPAÑA" o "" para todos
+            incremental: reutilizar los resultados de los archivos que no han cambiado
+            omitir_duplicados: no analizar reescaneos ni páginas casi idénticas
+            quitar_repeticiones: eliminar parrillas, anuncios y cabeceras repetidas
+            filtrar_calidad: no analizar documentos ni párrafos ilegibles (ruido de OCR)
+            prefiltrar: analizar solo los párrafos con "música" y su contexto
+            procesos: procesos de análisis que comparten el modelo (pool_analisis.py)
+            lote: documentos por lote de nlp.pipe (batch_size) con un solo proceso
+            reciclar: documentos que analiza cada proceso antes de renovarlo
+            cache_extraccion: reutilizar lo extraído de las oraciones ya vistas
+                ('disco', 'memoria' o 'no', por defecto; cache_extraccion.py)
         """
-        base_path = Path(directorio_corpus)
+        corpus = abrir_corpus(directorio_corpus)
+        corpus_incremental = CorpusIncremental(corpus, self, self.firma_configuracion(),
+                                               activo=incremental)
 
         if subcorpus:
-            rutas = [base_path / subcorpus]
+            publicaciones = [subcorpus]
         else:
-            rutas = [base_path / "EL SOL", base_path / "ONDAS", base_path / "ESPAÑA"]
-
-        archivos_procesados = 0
-
-        for ruta in rutas:
-            if not ruta.exists():
-                print(f"Advertencia: {ruta} no existe")
+            publicaciones = ["EL SOL", "ONDAS", "ESPAÑA"]
+
+        def recorrido():
+            return itertools.chain.from_iterable(corpus.documentos(p, recursivo=False)
+                                                 for p in publicaciones if corpus.contiene(p))
+
+        if omitir_duplicados:
+            corpus_incremental.duplicados = detectar_duplicados(
+                corpus, recorrido(), manifiesto=corpus_incremental.manifiesto
+            )
+        if quitar_repeticiones:
+            corpus_incremental.repeticiones = detectar_repeticiones(
+                corpus, recorrido(), manifiesto=corpus_incremental.manifiesto
+            )
+        if filtrar_calidad:
+            corpus_incremental.calidad = FiltroCalidad()
+        if prefiltrar:
+            # Solo los párrafos con "música" (y su contexto) van a spaCy
+            corpus_incremental.prefiltro = PrefiltroObjetivo({'música'})
+        self.extraccion = crear_cache_extraccion(self, {'música'}, cache_extraccion)
+        # Con varios procesos, el modelo se carga aquí y lo comparten todos (fork)
+        pool = PoolAnalisis(self, procesos, lote, reciclar)
+
+        avisados = 0
+
+        for publicacion in publicaciones:
+            if not corpus.contiene(publicacion):
+                print(f"Advertencia: {publicacion} no existe en {directorio_corpus}")
                 continue
 
-            archivos = list(ruta.glob("*.txt"))
-            print(f"\nProcesando {len(archivos)} archivos de {ruta.name}...")
+            total = corpus.contar(publicacion, recursivo=False)
+            print(f"\nProcesando {total} archivos de {publicacion}...")
 
-            for archivo in archivos:
+            # Solo los textos pendientes se analizan, en orden
+            pendientes = corpus_incremental.pendientes(corpus.documentos(publicacion, recursivo=False))
+            analizados = pool.recorrer(pendientes,
+                                       lambda documento: (f"{publicacion}/{documento.nombre}",))
+            for documento, procesar in analizados:
                 try:
-                    with open(archivo, 'r', encoding='utf-8', errors='ignore') as f:
-                        texto = f.read()
-
-                    menciones = self.procesar_documento(texto, f"{ruta.name}/{archivo.name}")
-                    archivos_procesados += 1
-
-                    if archivos_procesados % 50 == 0:
-                        print(f"  Procesados {archivos_procesados} archivos...")
-
+                    corpus_incremental.completar(documento, procesar)
                 except Exception as e:
-                    print(f"Error procesando {archivo}: {e}")
+                    print(f"Error procesando {documento}: {e}")
+
+                if corpus_incremental.vistos // 50 > avisados:
+                    avisados = corpus_incremental.vistos // 50
+                    print(f"  Procesados {corpus_incremental.vistos} archivos...")
+
+        archivos_procesados = corpus_incremental.vistos
+        pool.cerrar()
+        corpus_incremental.guardar()
+        if filtrar_calidad:
+            self.descartes_calidad = {clave: corpus_incremental.descartes_calidad[clave]
+                                      for clave in CONTADORES_DESCARTE}
+        print(f"  💾 Caché de análisis: {self.analisis.resumen()}")
+        if self.extraccion is not None:
+            self.extraccion.cerrar()
+            print(f"  ♻ Caché de extracción: {self.extraccion.resumen()}")
 
         print(f"\n✓ Procesados {archivos_procesados} archivos")
         print(f"✓ {self.total_menciones_musica} menciones de 'música' encontradas")
@@ -260,6 +434,8 @@ class AnalizadorVentanaColocacional:
                 'adjetivos_unicos_ventana': len(self.adjetivos_ventana),
                 'ventana_size': self.ventana
             },
+            # Documentos y párrafos ilegibles que no se analizaron (None: filtro desactivado)
+            'calidad_ocr': self.descartes_calidad,
             'top_adjetivos_dependencia': dict(self.adjetivos_dependencia.most_common(100)),
             'top_adjetivos_ventana': dict(self.adjetivos_ventana.most_common(100)),
             'relaciones_sintacticas_stats': {
@@ -315,6 +491,27 @@ class AnalizadorVentanaColocacional:
         print("\n" + "="*70)
 
 
+def leer_argumentos(corpus_por_defecto: str):
+    """
+    Corpus, procesos y tamaño de lote desde la línea de órdenes
+    """
+    parser = argparse.ArgumentParser(description="Ventana colocacional expandida de 'música'")
+    parser.add_argument('corpus', nargs='?', default=corpus_por_defecto,
+                        help="Corpus: carpeta, paquete .corpus o archivo comprimido")
+    parser.add_argument('--procesos', type=int, default=PROCESOS,
+                        help="Procesos de análisis con el modelo compartido (-1 = todos los núcleos)")
+    parser.add_argument('--lote', type=int, default=LOTE_DOCUMENTOS,
+                        help="Documentos por lote de nlp.pipe (batch_size)")
+    parser.add_argument('--reciclar', type=int, default=RECICLAR_DOCUMENTOS,
+                        help="Documentos que analiza cada proceso antes de renovarlo")
+    parser.add_argument('--cache-extraccion', choices=MODOS_CACHE, default='no',
+                        help="Reutilizar lo extraído de las oraciones repetidas: en disco, solo en memoria "
+                             "o no (por defecto; cache_extraccion.py --comprobar)")
+    parser.add_argument('--perfil', choices=list(PERFILES), default=PERFIL_SPACY,
+                        help="Componentes spaCy: 'ventana' omite el análisis de dependencias")
+    return parser.parse_args()
+
+
 def main():
     """
     Función principal
@@ -329,11 +526,15 @@ def main():
     SALIDA_JSON = "/Users/maria/Desktop/Campos_Música/resultados_ventana_colocacional.json"
     SALIDA_CSV = "/Users/maria/Desktop/Campos_Música/comparacion_metodos_adjetivacion.csv"
 
+    argumentos = leer_argumentos(CORPUS_DIR)
+
     # Crear analizador
-    analizador = AnalizadorVentanaColocacional(ventana=WINDOW_SIZE)
+    analizador = AnalizadorVentanaColocacional(ventana=WINDOW_SIZE, perfil=argumentos.perfil)
 
     # Procesar corpus completo
-    analizador.procesar_corpus(CORPUS_DIR)
+    analizador.procesar_corpus(argumentos.corpus, procesos=argumentos.procesos,
+                               lote=argumentos.lote, reciclar=argumentos.reciclar,
+                               cache_extraccion=argumentos.cache_extraccion)
 
     # Generar informes
     analizador.generar_informe(SALIDA_JSON, SALIDA_CSV)
@@ -4,17 +4,33 @@
 Versión optimizada del analizador con barra de progreso
 """
 
-import spacy
+import argparse
 from collections import Counter, defaultdict
 import json
 import csv
-from pathlib import Path
 import re
+import itertools
 import sys
 
+from cache_analisis import LOTE_DOCUMENTOS, PROCESOS
+from cache_extraccion import MODOS_CACHE, crear_cache_extraccion
+from calidad_ocr import CONTADORES_DESCARTE, FiltroCalidad
+from cargador_corpus import abrir_corpus
+from contextos_corpus import VERSION_OCURRENCIAS, ocurrencia
+from duplicados_corpus import detectar_duplicados
+from fragmentos_documento import es_ultimo_fragmento, tokens_propios
+from manifiesto_corpus import CorpusIncremental, firma_configuracion
+from perfiles_spacy import PERFILES
+from pool_analisis import RECICLAR_DOCUMENTOS, PoolAnalisis
+from prefiltro_objetivo import PrefiltroObjetivo
+from recursos import analisis_spacy
+from repeticiones_corpus import detectar_repeticiones
+from tabla_lemas import TablaLemas
+
 # Configuración
 WINDOW_SIZE = 5
 MIN_FREQ = 3
+PERFIL_SPACY = "dependencias"   # "ventana": sin parser, solo adjetivos por proximidad
 
 EXCLUSIONES = {
     'cámara', 'palacio', 'teatro', 'conservatorio', 'salón', 'academia',
@@ -30,13 +46,30 @@ EXCLUSIONES = {
     'centro', 'instituto', 'universidad', 'ministerio', 'gobierno'
 }
 
-print("Cargando modelo de spaCy...", flush=True)
-nlp = spacy.load("es_core_news_md")
-print("✓ Modelo cargado", flush=True)
-
 class AnalizadorVentanaColocacional:
-    def __init__(self, ventana=5):
+    CAMPOS_ACUMULADOS = (
+        'adjetivos_dependencia', 'adjetivos_ventana', 'contextos',
+        'relaciones_sintacticas', 'total_menciones_musica', 'docs_procesados',
+        'stats_por_fuente'
+    )
+
+    def __init__(self, ventana=5, perfil=PERFIL_SPACY):
         self.ventana = ventana
+        self.perfil = perfil
+        # Resultados por oración ya extraídos (cache_extraccion.py), desde procesar_corpus()
+        self.extraccion = None
+        # Descartes del filtro de calidad OCR de todo el corpus (calidad_ocr.py), desde procesar_corpus()
+        self.descartes_calidad = None
+        # Adjetivos válidos por lema, para todos los documentos (tabla_lemas.py)
+        self._validos = TablaLemas(self.es_lema_valido, EXCLUSIONES)
+        self._reiniciar_acumuladores()
+
+    @property
+    def analisis(self):
+        # El modelo se carga al analizar el primer documento
+        return analisis_spacy(self.perfil)
+
+    def _reiniciar_acumuladores(self):
         self.adjetivos_dependencia = Counter()
         self.adjetivos_ventana = Counter()
         self.contextos = defaultdict(list)
@@ -51,10 +84,17 @@ class AnalizadorVentanaColocacional:
             'adjetivos_vent': Counter()
         })
 
+    def firma_configuracion(self) -> str:
+        return firma_configuracion(type(self).__name__, self.ventana, EXCLUSIONES, self.perfil,
+                                   VERSION_OCURRENCIAS)
+
     def es_adjetivo_valido(self, token) -> bool:
         if token.pos_ != "ADJ":
             return False
-        lema = token.lemma_.lower()
+        return self._validos.token(token)
+
+    @staticmethod
+    def es_lema_valido(lema: str) -> bool:
         if lema in EXCLUSIONES:
             return False
         if len(lema) < 3:
@@ -65,6 +105,11 @@ class AnalizadorVentanaColocacional:
 
     def extraer_adjetivos_dependencia(self, token_musica, doc):
         adjetivos_encontrados = []
+        if not doc.has_annotation("DEP"):
+            # Perfil "ventana": sin análisis de dependencias
+            return adjetivos_encontrados
+        # Tramo del contexto, común a todos los adjetivos de esta mención
+        contexto = ocurrencia(doc, token_musica.i - 10, token_musica.i + 10)
 
         # Modificadores directos
         for child in token_musica.children:
@@ -73,7 +118,7 @@ class AnalizadorVentanaColocacional:
                     'lema': child.lemma_.lower(),
                     'relacion': 'amod',
                     'texto': child.text,
-                    'contexto': doc[max(0, token_musica.i-10):min(len(doc), token_musica.i+10)].text
+                    'ocurrencia': contexto
                 })
 
                 # Coordinación
@@ -83,7 +128,7 @@ class AnalizadorVentanaColocacional:
                             'lema': conj_child.lemma_.lower(),
                             'relacion': 'conj',
                             'texto': conj_child.text,
-                            'contexto': doc[max(0, token_musica.i-10):min(len(doc), token_musica.i+10)].text
+                            'ocurrencia': contexto
                         })
 
         # Construcciones predicativas
@@ -95,7 +140,7 @@ class AnalizadorVentanaColocacional:
                         'lema': child.lemma_.lower(),
                         'relacion': child.dep_,
                         'texto': child.text,
-                        'contexto': doc[max(0, token_musica.i-10):min(len(doc), token_musica.i+10)].text
+                        'ocurrencia': contexto
                     })
 
         if token_musica.dep_ in ["dobj", "obj"]:
@@ -106,13 +151,14 @@ class AnalizadorVentanaColocacional:
                         'lema': child.lemma_.lower(),
                         'relacion': 'xcomp',
                         'texto': child.text,
-                        'contexto': doc[max(0, token_musica.i-10):min(len(doc), token_musica.i+10)].text
+                        'ocurrencia': contexto
                     })
 
         return adjetivos_encontrados
 
     def extraer_adjetivos_ventana(self, token_musica, doc):
         adjetivos_encontrados = []
+        contexto = ocurrencia(doc, token_musica.i - 10, token_musica.i + 10)
         start = max(0, token_musica.i - self.ventana)
         end = min(len(doc), token_musica.i + self.ventana + 1)
 
@@ -126,16 +172,21 @@ class AnalizadorVentanaColocacional:
                     'lema': token.lemma_.lower(),
                     'distancia': distancia,
                     'texto': token.text,
-                    'contexto': doc[max(0, token_musica.i-10):min(len(doc), token_musica.i+10)].text
+                    'ocurrencia': contexto
                 })
 
         return adjetivos_encontrados
 
     def procesar_documento(self, texto: str, nombre_archivo: str = "", fuente: str = ""):
-        doc = nlp(texto)
+        return sum(self.procesar_doc(doc, nombre_archivo, fuente)
+                   for doc in self.analisis.fragmentos(texto))
+
+    def procesar_doc(self, doc, nombre_archivo: str = "", fuente: str = ""):
+        self._validos.comprobar()
         menciones = 0
 
-        for token in doc:
+        # En un documento fragmentado, solo las menciones de la zona propia del fragmento
+        for token in tokens_propios(doc):
             if token.lemma_.lower() == "música":
                 menciones += 1
                 self.total_menciones_musica += 1
@@ -152,7 +203,7 @@ class AnalizadorVentanaColocacional:
                     self.relaciones_sintacticas[adj['relacion']].append({
                         'adjetivo': adj['lema'],
                         'archivo': nombre_archivo,
-                        'contexto': adj['contexto']
+                        'ocurrencia': adj['ocurrencia']
                     })
 
                 # Ventana
@@ -163,56 +214,90 @@ class AnalizadorVentanaColocacional:
                         self.stats_por_fuente[fuente]['adjetivos_vent'][adj['lema']] += 1
                     self.contextos[adj['lema']].append({
                         'archivo': nombre_archivo,
-                        'contexto': adj['contexto'],
+                        'ocurrencia': adj['ocurrencia'],
                         'distancia': adj['distancia']
                     })
 
-        self.docs_procesados += 1
+        if es_ultimo_fragmento(doc):
+            self.docs_procesados += 1
         return menciones
 
-    def procesar_corpus(self, directorio_corpus: str):
-        base_path = Path(directorio_corpus)
-        rutas = [
-            (base_path / "EL SOL", "EL SOL"),
-            (base_path / "ONDAS", "ONDAS"),
-            (base_path / "ESPAÑA", "ESPAÑA")
-        ]
+    def procesar_corpus(self, directorio_corpus: str, incremental: bool = True,
+                        omitir_duplicados: bool = True, quitar_repeticiones: bool = True,
+                        filtrar_calidad: bool = True, prefiltrar: bool = True,
+                        procesos: int = PROCESOS, lote: int = LOTE_DOCUMENTOS,
+                        reciclar: int = RECICLAR_DOCUMENTOS, cache_extraccion: str = 'no'):
+        corpus = abrir_corpus(directorio_corpus)
+        corpus_incremental = CorpusIncremental(corpus, self, self.firma_configuracion(),
+                                               activo=incremental)
 
-        total_archivos = 0
-        for ruta, _ in rutas:
-            if ruta.exists():
-                total_archivos += len(list(ruta.glob("*.txt")))
+        archivos_por_fuente = {}
+        for fuente in ["EL SOL", "ONDAS", "ESPAÑA"]:
+            if corpus.contiene(fuente):
+                archivos_por_fuente[fuente] = corpus.contar(fuente, recursivo=False)
+            else:
+                print(f"⚠ Advertencia: {fuente} no existe en {directorio_corpus}", flush=True)
+
+        total_archivos = sum(archivos_por_fuente.values())
+
+        def recorrido():
+            return itertools.chain.from_iterable(corpus.documentos(f, recursivo=False)
+                                                 for f in archivos_por_fuente)
+
+        if omitir_duplicados:
+            corpus_incremental.duplicados = detectar_duplicados(
+                corpus, recorrido(), manifiesto=corpus_incremental.manifiesto
+            )
+        if quitar_repeticiones:
+            corpus_incremental.repeticiones = detectar_repeticiones(
+                corpus, recorrido(), manifiesto=corpus_incremental.manifiesto
+            )
+        if filtrar_calidad:
+            corpus_incremental.calidad = FiltroCalidad()
+        if prefiltrar:
+            corpus_incremental.prefiltro = PrefiltroObjetivo({'música'})
+        self.extraccion = crear_cache_extraccion(self, {'música'}, cache_extraccion)
+        # Con varios procesos, el modelo se carga aquí y lo comparten todos (fork)
+        pool = PoolAnalisis(self, procesos, lote, reciclar)
 
         print(f"\n{'='*70}")
         print(f"Total de archivos a procesar: {total_archivos}")
         print(f"{'='*70}\n", flush=True)
 
-        archivos_procesados = 0
+        for fuente, n_archivos in archivos_por_fuente.items():
+            print(f"\n📁 Procesando {n_archivos} archivos de {fuente}...", flush=True)
+            inicio = corpus_incremental.vistos
+            avisados = 0
 
-        for ruta, fuente in rutas:
-            if not ruta.exists():
-                print(f"⚠ Advertencia: {ruta} no existe", flush=True)
-                continue
-
-            archivos = list(ruta.glob("*.txt"))
-            print(f"\n📁 Procesando {len(archivos)} archivos de {fuente}...", flush=True)
-
-            for i, archivo in enumerate(archivos, 1):
+            # Solo los textos pendientes se analizan, en orden
+            pendientes = corpus_incremental.pendientes(corpus.documentos(fuente, recursivo=False))
+            analizados = pool.recorrer(pendientes,
+                                       lambda archivo: (f"{fuente}/{archivo.nombre}", fuente))
+            for archivo, procesar in analizados:
                 try:
-                    with open(archivo, 'r', encoding='utf-8', errors='ignore') as f:
-                        texto = f.read()
+                    corpus_incremental.completar(archivo, procesar)
+                except Exception as e:
+                    print(f"  ✗ Error en {archivo.nombre}: {e}", flush=True)
 
-                    menciones = self.procesar_documento(texto, f"{fuente}/{archivo.name}", fuente)
-                    archivos_procesados += 1
+                i = corpus_incremental.vistos - inicio
+                if i // 50 > avisados:
+                    avisados = i // 50
+                    progreso = (corpus_incremental.vistos / total_archivos) * 100
+                    print(f"  ✓ {i}/{n_archivos} archivos de {fuente} procesados ({progreso:.1f}% total)", flush=True)
 
-                    if i % 50 == 0:
-                        progreso = (archivos_procesados / total_archivos) * 100
-                        print(f"  ✓ {i}/{len(archivos)} archivos de {fuente} procesados ({progreso:.1f}% total)", flush=True)
+            print(f"✓ {fuente} completado: {n_archivos} archivos procesados", flush=True)
 
-                except Exception as e:
-                    print(f"  ✗ Error en {archivo.name}: {e}", flush=True)
+        archivos_procesados = corpus_incremental.vistos
 
-            print(f"✓ {fuente} completado: {len(archivos)} archivos procesados", flush=True)
+        pool.cerrar()
+        corpus_incremental.guardar()
+        if filtrar_calidad:
+            self.descartes_calidad = {clave: corpus_incremental.descartes_calidad[clave]
+                                      for clave in CONTADORES_DESCARTE}
+        print(f"  💾 Caché de análisis: {self.analisis.resumen()}", flush=True)
+        if self.extraccion is not None:
+            self.extraccion.cerrar()
+            print(f"  ♻ Caché de extracción: {self.extraccion.resumen()}", flush=True)
 
         print(f"\n{'='*70}")
         print(f"✓ PROCESAMIENTO COMPLETADO")
@@ -231,6 +316,8 @@ class AnalizadorVentanaColocacional:
                 'adjetivos_unicos_ventana': len(self.adjetivos_ventana),
                 'ventana_size': self.ventana
             },
+            # Documentos y párrafos ilegibles que no se analizaron (None: filtro desactivado)
+            'calidad_ocr': self.descartes_calidad,
             'estadisticas_por_fuente': {
                 fuente: {
                     'menciones_musica': stats['menciones_musica'],
@@ -319,6 +406,24 @@ class AnalizadorVentanaColocacional:
         print(f"\n{'='*70}\n", flush=True)
 
 
+def leer_argumentos(corpus_por_defecto: str):
+    parser = argparse.ArgumentParser(description="Ventana colocacional de 'música'")
+    parser.add_argument('corpus', nargs='?', default=corpus_por_defecto,
+                        help="Corpus: carpeta, paquete .corpus o archivo comprimido")
+    parser.add_argument('--procesos', type=int, default=PROCESOS,
+                        help="Procesos de análisis con el modelo compartido (-1 = todos los núcleos)")
+    parser.add_argument('--lote', type=int, default=LOTE_DOCUMENTOS,
+                        help="Documentos por lote de nlp.pipe (batch_size)")
+    parser.add_argument('--reciclar', type=int, default=RECICLAR_DOCUMENTOS,
+                        help="Documentos que analiza cada proceso antes de renovarlo")
+    parser.add_argument('--cache-extraccion', choices=MODOS_CACHE, default='no',
+                        help="Reutilizar lo extraído de las oraciones repetidas: en disco, solo en memoria "
+                             "o no (por defecto; cache_extraccion.py --comprobar)")
+    parser.add_argument('--perfil', choices=list(PERFILES), default=PERFIL_SPACY,
+                        help="Componentes spaCy: 'ventana' omite el análisis de dependencias")
+    return parser.parse_args()
+
+
 def main():
     print(f"{'='*70}")
     print("ANALIZADOR DE VENTANA COLOCACIONAL EXPANDIDA")
@@ -329,8 +434,12 @@ def main():
     SALIDA_JSON = "/Users/maria/Desktop/Campos_Música/resultados_ventana_colocacional.json"
     SALIDA_CSV = "/Users/maria/Desktop/Campos_Música/comparacion_metodos_adjetivacion.csv"
 
-    analizador = AnalizadorVentanaColocacional(ventana=WINDOW_SIZE)
-    analizador.procesar_corpus(CORPUS_DIR)
+    argumentos = leer_argumentos(CORPUS_DIR)
+
+    analizador = AnalizadorVentanaColocacional(ventana=WINDOW_SIZE, perfil=argumentos.perfil)
+    analizador.procesar_corpus(argumentos.corpus, procesos=argumentos.procesos,
+                               lote=argumentos.lote, reciclar=argumentos.reciclar,
+                               cache_extraccion=argumentos.cache_extraccion)
     analizador.generar_informe(SALIDA_JSON, SALIDA_CSV)
 
     print("✅ ANÁLISIS COMPLETADO EXITOSAMENTE\n", flush=True)
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Caché persistente de análisis spaCy (DocBin), compartida por todos los analizadores
+
+analiza_musica, los dos analizadores de ventana colocacional y el de valoraciones
+analizan con es_core_news_md el mismo corpus: tres o cuatro pasadas completas
+sobre 2,5 millones de palabras. Cada Doc analizado se guarda serializado como
+DocBin, indexado por:
+- la huella del texto analizado
+- la versión de spaCy, el nombre y versión del modelo, los componentes activos
+  y la configuración del pipeline
+
+Con la misma combinación, cualquier analizador recupera el Doc sin volver a
+analizarlo: cambiar la ventana o editar un léxico cuesta segundos, no un análisis
+completo. Si cambia el modelo o su configuración, la clave cambia y la caché
+anterior simplemente deja de usarse.
+
+Ubicación: carpeta_cache('docbin')/<clave del modelo>/<huella[:2]>/<huella>.spacy
+
+Los analizadores recorren el corpus con CacheAnalisis.pipe(), que agrupa los textos
+pendientes en lotes de nlp.pipe y, si se pide, los reparte entre varios procesos.
+Los textos muy largos se analizan por fragmentos (fragmentos_documento.py), y cada
+fragmento tiene su entrada en la caché. Cada Doc entregado lleva su huella
+(contextos_corpus.py): las ocurrencias la guardan para recuperar su contexto.
+
+Proyecto: LexiMus - Universidad de Salamanca
+"""
+
+import json
+import os
+import time
+from collections import deque
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, Optional, Tuple
+
+from cargador_corpus import carpeta_cache, huella_contenido
+from contextos_corpus import identificar
+from fragmentos_documento import MAX_CARACTERES_FRAGMENTO, fragmentar, marcar
+
+LOTE_DOCUMENTOS = 32     # textos por lote de nlp.pipe (batch_size)
+PROCESOS = 1             # procesos de análisis (n_process); -1 = todos los núcleos
+MAX_SEGUIDOS_CACHE = 64  # fragmentos en caché seguidos tras los que se cierra el nlp.pipe en curso
+
+if TYPE_CHECKING:
+    from spacy.tokens import Doc
+
+# spaCy se importa al usarlo (recursos.py): importar este módulo no lo carga
+
+
+def clave_modelo(nlp) -> str:
+    """Identifica versión de spaCy, modelo, componentes y configuración del pipeline"""
+    import spacy
+
+    partes = [
+        spacy.__version__,
+        f"{nlp.meta.get('lang', '')}_{nlp.meta.get('name', '')}",
+        nlp.meta.get('version', ''),
+        ','.join(nlp.pipe_names),
+        nlp.config.to_str()
+    ]
+    return huella_contenido('\n'.join(partes).encode('utf-8'))
+
+
+class CacheAnalisis:
+    """
+    Análisis spaCy con caché en disco; se usa como nlp: doc = cache(texto)
+    """
+
+    def __init__(self, nlp, carpeta=None, activa: bool = True):
+        self.nlp = nlp
+        self.activa = activa
+        self.clave = clave_modelo(nlp)
+        # Textos más largos se analizan por fragmentos (nunca por encima de nlp.max_length)
+        self.max_caracteres = min(MAX_CARACTERES_FRAGMENTO, nlp.max_length)
+        self.carpeta = Path(carpeta) if carpeta else carpeta_cache('docbin') / self.clave
+        self.aciertos = 0
+        self.fallos = 0
+        # Rendimiento del análisis (solo documentos que pasan por spaCy)
+        self.palabras = 0
+        self.segundos = 0.0
+        if activa:
+            self._describir()
+
+    def _describir(self):
+        """Deja junto a la caché la descripción legible de su clave"""
+        ruta = self.carpeta / 'modelo.json'
+        if ruta.exists():
+            return
+        import spacy
+
+        try:
+            self.carpeta.mkdir(parents=True, exist_ok=True)
+            with open(ruta, 'w', encoding='utf-8') as f:
+                json.dump({'spacy': spacy.__version__,
+                           'modelo': f"{self.nlp.meta.get('lang', '')}_{self.nlp.meta.get('name', '')}",
+                           'version_modelo': self.nlp.meta.get('version', ''),
+                           'componentes': self.nlp.pipe_names}, f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            print(f"⚠️  Caché de análisis no disponible en {self.carpeta}: {e}")
+            self.activa = False
+
+    def _ruta(self, huella: str) -> Path:
+        return self.carpeta / huella[:2] / f"{huella}.spacy"
+
+    def cargar(self, huella: str) -> Optional['Doc']:
+        from spacy.tokens import DocBin
+
+        try:
+            with open(self._ruta(huella), 'rb') as f:
+                datos = f.read()
+        except OSError:
+            return None
+        try:
+            return next(DocBin().from_bytes(datos).get_docs(self.nlp.vocab))
+        except Exception:
+            # Archivo dañado o de otra versión de DocBin: se vuelve a analizar
+            return None
+
+    def guardar(self, huella: str, doc: 'Doc') -> bool:
+        from spacy.tokens import DocBin
+
+        ruta = self._ruta(huella)
+        try:
+            ruta.parent.mkdir(parents=True, exist_ok=True)
+            tmp = ruta.with_name(ruta.name + '.tmp')
+            with open(tmp, 'wb') as f:
+                f.write(DocBin(docs=[doc]).to_bytes())
+            os.replace(tmp, ruta)
+            return True
+        except OSError as e:
+            print(f"⚠️  No se pudo guardar el análisis en {ruta}: {e}")
+            return False
+
+    def _analizar(self, texto: str) -> 'Doc':
+        inicio = time.perf_counter()
+        doc = self.nlp(texto)
+        self.segundos += time.perf_counter() - inicio
+        self.palabras += len(doc)
+        return doc
+
+    def __call__(self, texto: str) -> 'Doc':
+        if not self.activa:
+            # Sin caché el Doc no se podrá recuperar: las ocurrencias guardan su texto
+            return identificar(self._analizar(texto), None)
+        huella = huella_contenido(texto.encode('utf-8'))
+        doc = self.cargar(huella)
+        if doc is not None:
+            self.aciertos += 1
+            return identificar(doc, huella)
+        self.fallos += 1
+        doc = self._analizar(texto)
+        return identificar(doc, huella if self.guardar(huella, doc) else None)
+
+    def pipe(self, tuplas: Iterable[Tuple[str, Any]], batch_size: int = LOTE_DOCUMENTOS,
+             n_process: int = PROCESOS) -> Iterator[Tuple['Doc', Any]]:
+        """
+        Equivale a nlp.pipe(tuplas, as_tuples=True): (texto, contexto) → (Doc, contexto)
+
+        El contexto (documento, nombre, publicación...) acompaña a cada texto y el
+        orden de salida es el de entrada. Un texto de más de max_caracteres
+        caracteres da varios Doc seguidos con el mismo contexto, uno por fragmento
+        (se reúnen con fragmentos_documento.agrupar_fragmentos).
+
+        La entrada se recorre en flujo: nlp.pipe (lotes de batch_size, n_process
+        procesos) recibe un generador perezoso con solo los fragmentos que no están
+        en caché, y los va pidiendo a medida que analiza, de modo que la lectura y
+        las etapas previas se solapan con el análisis. Los fragmentos en caché
+        esperan en una cola, en orden, a que salgan los Doc analizados que los
+        preceden. Si la entrada empieza por fragmentos en caché se entregan sin
+        abrir nlp.pipe, y una racha de MAX_SEGUIDOS_CACHE en caché cierra el
+        nlp.pipe en curso para que la cola no crezca sin límite.
+        """
+        fragmentos = ((fragmento, contexto) for texto, contexto in tuplas
+                      for fragmento in fragmentar(texto, self.max_caracteres))
+        while True:
+            # Fragmentos en caché al principio: se cargan sin pasar por nlp.pipe
+            primero = None
+            for fragmento, contexto in fragmentos:
+                huella = huella_contenido(fragmento.texto.encode('utf-8'))
+                if self._en_disco(huella):
+                    yield self._cargar_fragmento(fragmento, contexto, huella)
+                    continue
+                primero = fragmento, contexto, huella
+                break
+            if primero is None:
+                return
+
+            # (fragmento, contexto, huella, en caché), en orden de entrada
+            pendientes = deque([(*primero, False)])
+            lectura = [0.0]     # segundos de lectura y etapas previas dentro de nlp.pipe
+
+            def nuevos() -> Iterator[str]:
+                yield primero[0].texto
+                seguidos = 0
+                while True:
+                    inicio = time.perf_counter()
+                    siguiente = next(fragmentos, None)
+                    lectura[0] += time.perf_counter() - inicio
+                    if siguiente is None:
+                        return
+                    fragmento, contexto = siguiente
+                    huella = huella_contenido(fragmento.texto.encode('utf-8'))
+                    guardado = self._en_disco(huella)
+                    pendientes.append((fragmento, contexto, huella, guardado))
+                    if not guardado:
+                        seguidos = 0
+                        yield fragmento.texto
+                    else:
+                        seguidos += 1
+                        if seguidos >= MAX_SEGUIDOS_CACHE:
+                            return
+
+            analizados = iter(self.nlp.pipe(nuevos(), batch_size=batch_size, n_process=n_process))
+            while True:
+                inicio, leido = time.perf_counter(), lectura[0]
+                doc = next(analizados, None)
+                if doc is None:
+                    break
+                # Solo cuenta el análisis: la lectura ocurre dentro de nlp.pipe
+                self.segundos += time.perf_counter() - inicio - (lectura[0] - leido)
+                self.palabras += len(doc)
+                while pendientes[0][3]:
+                    yield self._cargar_fragmento(*pendientes.popleft()[:3])
+                fragmento, contexto, huella, _ = pendientes.popleft()
+                self.fallos += 1
+                yield self._guardar_fragmento(doc, fragmento, contexto, huella)
+            while pendientes:
+                yield self._cargar_fragmento(*pendientes.popleft()[:3])
+
+    def _en_disco(self, huella: str) -> bool:
+        return self.activa and self._ruta(huella).exists()
+
+    def _cargar_fragmento(self, fragmento, contexto, huella: str) -> Tuple['Doc', Any]:
+        """(Doc, contexto) de un fragmento en caché; si el archivo está dañado, se vuelve a analizar"""
+        doc = self.cargar(huella)
+        if doc is not None:
+            self.aciertos += 1
+            return marcar(identificar(doc, huella), fragmento), contexto
+        self.fallos += 1
+        return self._guardar_fragmento(self._analizar(fragmento.texto), fragmento, contexto, huella)
+
+    def _guardar_fragmento(self, doc: 'Doc', fragmento, contexto, huella: str) -> Tuple['Doc', Any]:
+        persistido = self.activa and self.guardar(huella, doc)
+        return marcar(identificar(doc, huella if persistido else None), fragmento), contexto
+
+    def fragmentos(self, texto: str) -> Iterator['Doc']:
+        """Doc de cada fragmento de un texto (uno solo si no supera max_caracteres)"""
+        for doc, _ in self.pipe([(texto, None)], n_process=1):
+            yield doc
+
+    def resumen(self) -> str:
+        total = self.aciertos + self.fallos
+        porcentaje = 100 * self.aciertos / total if total else 0.0
+        resumen = (f"{self.aciertos} textos recuperados, {self.fallos} analizados "
+                   f"({porcentaje:.1f}% de aciertos)")
+        if self.segundos:
+            resumen += (f"; perfil {self.nlp.meta.get('perfil', 'completo')}: "
+                        f"{self.palabras / self.segundos:,.0f} palabras/s")
+        return resumen
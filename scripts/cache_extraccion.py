@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Caché de extracción por oración: los pasajes repetidos no se vuelven a analizar
+
+Las parrillas de radio y las notas reproducidas se repiten literalmente entre
+números de ONDAS y entre días de El Sol (las que aparecen en menos de
+MIN_DOCUMENTOS documentos, o en otra publicación, no las elimina
+repeticiones_corpus.py). Cada analizador volvía a analizarlas con spaCy y a
+extraer de ellas los mismos adjetivos.
+
+Antes del análisis, el texto se divide en oraciones y cada oración con una
+forma de los lemas objetivo se busca en la caché del analizador por la huella
+de su texto normalizado y de los CONTEXTO_CARACTERES que la rodean (las
+ventanas y la negación leen las oraciones vecinas):
+- Si está, se suma el resultado guardado de la oración (sus menciones,
+  adjetivos y valoraciones) y la oración no se envía a spaCy, salvo que haga
+  falta como contexto de una oración que sí se analiza: entonces se analiza
+  también y se cuenta desde el análisis, no desde la caché
+- Si no está, se analiza con el resto del texto; tras procesar el documento, lo
+  que extrae el analizador de esa oración se guarda en la caché. Con los
+  analizadores por columnas, las columnas del Doc se construyen una vez y cada
+  oración se procesa sobre una zona de ellas (ColumnasDoc.zona)
+
+El resultado de una oración es un parcial como los del re-análisis incremental
+(manifiesto_corpus.py) en el que el archivo y la publicación se sustituyen por
+marcadores: al reutilizarlo se rellenan con los del documento que lo contiene.
+Los contextos guardados son los de la primera aparición de la oración.
+
+La caché vive en memoria (LRU de CAPACIDAD_MEMORIA oraciones) y, con
+modo='disco', también en carpeta_cache('extraccion')/<Analizador>-<firma>.sqlite,
+de modo que vale para las siguientes ejecuciones y la comparten los procesos de
+pool_analisis.py. La firma reúne la configuración del analizador y la clave del
+modelo spaCy. Está desactivada por defecto (--cache-extraccion no): se activa con
+'memoria' o 'disco' en los analizadores.
+
+Uso:
+    python3 cache_extraccion.py [--vaciar]   # cachés en disco y su tamaño
+    python3 cache_extraccion.py --comprobar CORPUS [--analizador valoraciones] [--documentos 50]
+        # mismos resultados con y sin caché sobre una muestra del corpus
+
+Proyecto: LexiMus - Universidad de Salamanca
+"""
+
+import argparse
+import itertools
+import json
+import os
+import re
+import sqlite3
+import sys
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from cargador_corpus import carpeta_cache, huella_contenido
+from columnas_doc import ColumnasDoc
+from fragmentos_documento import CLAVE_FRAGMENTO, comienzos_oracion
+from manifiesto_corpus import capturar_parcial, fusionar_parcial
+from prefiltro_objetivo import _sin_tildes, formas_superficie
+
+CAPACIDAD_MEMORIA = 20_000   # oraciones que se conservan en memoria
+CONTEXTO_CARACTERES = 300    # contexto a cada lado que forma parte de la clave de una oración
+MODOS_CACHE = ('disco', 'memoria', 'no')
+
+_MARCADOR = '\x00argumento{}'   # no aparece en ningún texto del corpus
+
+
+class Separacion(NamedTuple):
+    """Texto que hay que analizar y lo que ya se conoce del documento"""
+    texto: str
+    reutilizados: List[dict]                # parciales de las oraciones encontradas
+    nuevas: List[Tuple[str, int, int]]      # (clave, inicio, fin) en `texto` de las no encontradas
+
+
+def _instanciar(valor, reemplazos: dict):
+    """Sustituye los marcadores (claves y valores) por los argumentos del documento"""
+    if isinstance(valor, str):
+        return reemplazos.get(valor, valor)
+    if isinstance(valor, list):
+        return [_instanciar(v, reemplazos) for v in valor]
+    if isinstance(valor, dict):
+        return {reemplazos.get(k, k): _instanciar(v, reemplazos) for k, v in valor.items()}
+    return valor
+
+
+class CacheExtraccion:
+    """
+    Resultados por oración de un analizador, en memoria (LRU) y opcionalmente en disco
+
+    Estadísticas de la ejecución (en oraciones con lemas objetivo): aciertos_memoria,
+    aciertos_disco, fallos (enviadas a spaCy), contexto (encontradas pero analizadas
+    como contexto de otras) y guardadas.
+    """
+
+    CONTADORES = ('aciertos_memoria', 'aciertos_disco', 'fallos', 'contexto', 'guardadas')
+
+    def __init__(self, analizador, lemas: Iterable[str], disco: bool = True,
+                 capacidad: int = CAPACIDAD_MEMORIA):
+        self.analizador = analizador
+        self.disco = disco
+        self.capacidad = capacidad
+        formas = sorted(formas_superficie(lemas), key=len, reverse=True)
+        self.patron = re.compile(r'\b(?:' + '|'.join(map(re.escape, formas)) + r')\b')
+        self._memoria = OrderedDict()
+        self._ruta = None
+        self._conexion = None
+        self._pid = None
+        for contador in self.CONTADORES:
+            setattr(self, contador, 0)
+
+    # --- Almacenamiento -----------------------------------------------------
+
+    @property
+    def ruta(self) -> Path:
+        """Base de datos del analizador con su configuración y su modelo (carga el modelo)"""
+        if self._ruta is None:
+            firma = huella_contenido(f"{self.analizador.firma_configuracion()}|"
+                                     f"{self.analizador.analisis.clave}".encode('utf-8'))
+            self._ruta = carpeta_cache('extraccion') / f"{type(self.analizador).__name__}-{firma}.sqlite"
+        return self._ruta
+
+    def _base(self) -> Optional[sqlite3.Connection]:
+        """Conexión del proceso actual (los procesos creados con fork abren la suya)"""
+        if not self.disco:
+            return None
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            try:
+                self.ruta.parent.mkdir(parents=True, exist_ok=True)
+                self._conexion = sqlite3.connect(self.ruta, timeout=30)
+                self._conexion.execute('PRAGMA journal_mode=WAL')
+                self._conexion.execute('PRAGMA synchronous=NORMAL')
+                self._conexion.execute('CREATE TABLE IF NOT EXISTS oraciones '
+                                       '(clave TEXT PRIMARY KEY, parcial TEXT NOT NULL)')
+            except (OSError, sqlite3.Error) as e:
+                self._desactivar_disco(e)
+        return self._conexion
+
+    def _desactivar_disco(self, error: Exception):
+        print(f"⚠️  Caché de extracción en disco no disponible en {self._ruta}: {error}")
+        self.disco = False
+        self._conexion = None
+
+    def _recordar(self, clave: str, parcial: dict):
+        self._memoria[clave] = parcial
+        self._memoria.move_to_end(clave)
+        if len(self._memoria) > self.capacidad:
+            self._memoria.popitem(last=False)
+
+    def _buscar(self, clave: str) -> Optional[dict]:
+        parcial = self._memoria.get(clave)
+        if parcial is not None:
+            self._memoria.move_to_end(clave)
+            self.aciertos_memoria += 1
+            return parcial
+        base = self._base()
+        if base is not None:
+            try:
+                fila = base.execute('SELECT parcial FROM oraciones WHERE clave = ?', (clave,)).fetchone()
+            except sqlite3.Error as e:
+                self._desactivar_disco(e)
+                fila = None
+            if fila is not None:
+                parcial = json.loads(fila[0])
+                self._recordar(clave, parcial)
+                self.aciertos_disco += 1
+                return parcial
+        self.fallos += 1
+        return None
+
+    def _guardar(self, clave: str, parcial: dict):
+        self._recordar(clave, parcial)
+        self.guardadas += 1
+        base = self._base()
+        if base is not None:
+            try:
+                base.execute('INSERT OR REPLACE INTO oraciones VALUES (?, ?)',
+                             (clave, json.dumps(parcial, ensure_ascii=False)))
+            except sqlite3.Error as e:
+                self._desactivar_disco(e)
+
+    def _confirmar(self):
+        if self._conexion is not None and self._pid == os.getpid():
+            try:
+                self._conexion.commit()
+            except sqlite3.Error as e:
+                self._desactivar_disco(e)
+
+    # --- Uso desde los analizadores -----------------------------------------
+
+    @staticmethod
+    def _marcadores(argumentos: tuple) -> tuple:
+        """Argumentos de procesar_doc() con marcadores en lugar del archivo y la publicación"""
+        return tuple(_MARCADOR.format(i) if argumento else argumento
+                     for i, argumento in enumerate(argumentos))
+
+    def separar(self, texto: str, argumentos: tuple) -> Separacion:
+        """Quita del texto las oraciones ya conocidas y anota las que hay que guardar"""
+        # Los argumentos vacíos no se sustituyen: forman parte de la clave
+        prefijo = ''.join('1' if argumento else '0' for argumento in argumentos) + '|'
+        limites = [0] + comienzos_oracion(texto) + [len(texto)]
+        tramos = list(zip(limites, limites[1:]))
+
+        # Oraciones con lemas objetivo: clave (con su contexto) y resultado guardado
+        objetivo = {}
+        for k, (inicio, fin) in enumerate(tramos):
+            oracion = texto[inicio:fin]
+            if self.patron.search(_sin_tildes(oracion)):
+                partes_clave = (texto[max(0, inicio - CONTEXTO_CARACTERES):inicio], oracion,
+                                texto[fin:fin + CONTEXTO_CARACTERES])
+                clave = huella_contenido((prefijo + '\x01'.join(' '.join(parte.split())
+                                                                for parte in partes_clave)).encode('utf-8'))
+                objetivo[k] = (clave, self._buscar(clave))
+
+        # Una oración que se analiza necesita su contexto completo: las encontradas a
+        # menos de CONTEXTO_CARACTERES también se analizan (y a su vez necesitan el suyo)
+        analizadas = {k for k, (_, parcial) in objetivo.items() if parcial is None}
+        pendientes = list(analizadas)
+        while pendientes:
+            k = pendientes.pop()
+            inicio, fin = tramos[k]
+            for j in self._vecinas(tramos, k, inicio - CONTEXTO_CARACTERES, fin + CONTEXTO_CARACTERES):
+                if j in objetivo and j not in analizadas:
+                    analizadas.add(j)
+                    pendientes.append(j)
+                    self.contexto += 1
+
+        partes, reutilizados, nuevas = [], [], []
+        posicion = 0
+        for k, (inicio, fin) in enumerate(tramos):
+            oracion = texto[inicio:fin]
+            if k in objetivo:
+                clave, parcial = objetivo[k]
+                if k not in analizadas:
+                    reutilizados.append(parcial)
+                    continue
+                if parcial is None:
+                    nuevas.append((clave, posicion, posicion + len(oracion)))
+            partes.append(oracion)
+            posicion += len(oracion)
+
+        # Sin oraciones nuevas, el resto del texto solo serviría de contexto
+        restante = ''.join(partes) if nuevas or not reutilizados else ''
+        return Separacion(restante, reutilizados, nuevas)
+
+    @staticmethod
+    def _vecinas(tramos: List[Tuple[int, int]], k: int, desde: int, hasta: int) -> Iterator[int]:
+        """Índices de las oraciones, distintas de la k, que tocan los caracteres [desde, hasta)"""
+        j = k - 1
+        while j >= 0 and tramos[j][1] > desde:
+            yield j
+            j -= 1
+        j = k + 1
+        while j < len(tramos) and tramos[j][0] < hasta:
+            yield j
+            j += 1
+
+    def procesar(self, separacion: Separacion, docs: Iterable, argumentos: tuple):
+        """
+        procesar_doc() de los docs del texto restante, más los resultados reutilizados
+
+        Lo que extrae el analizador de cada oración nueva se guarda en la caché.
+        """
+        reemplazos = dict(zip(self._marcadores(argumentos), argumentos))
+        for parcial in separacion.reutilizados:
+            fusionar_parcial(self.analizador, _instanciar(parcial, reemplazos))
+        columnar = getattr(self.analizador, 'columnar', False)
+        for doc in docs:
+            # Una sola construcción de las columnas por Doc, para el documento y sus oraciones
+            columnas = ColumnasDoc(doc) if columnar else None
+            self._procesar_doc(doc, argumentos, columnas)
+            self._guardar_oraciones(doc, separacion.nuevas, argumentos, columnas)
+        self._confirmar()
+
+    def _procesar_doc(self, doc, argumentos: tuple, columnas: Optional[ColumnasDoc]):
+        if columnas is None:
+            self.analizador.procesar_doc(doc, *argumentos)
+        else:
+            self.analizador.procesar_doc(doc, *argumentos, columnas=columnas)
+
+    def procesar_texto(self, texto: str, argumentos: tuple):
+        """Separación, análisis (por fragmentos) y procesar() de un texto completo"""
+        separacion = self.separar(texto, argumentos)
+        self.procesar(separacion, self.analizador.analisis.fragmentos(separacion.texto), argumentos)
+
+    def _guardar_oraciones(self, doc, nuevas: List[Tuple[str, int, int]], argumentos: tuple,
+                           columnas: Optional[ColumnasDoc] = None):
+        """
+        Procesa el doc limitado a cada oración nueva (como si fuera la zona propia de
+        un fragmento) y guarda lo extraído, sin sumarlo al analizador
+
+        Con `columnas`, cada oración es una zona de las del Doc: solo se recorren sus
+        menciones, sin reconstruir columnas ni máscaras.
+        """
+        posicion = doc.user_data.get(CLAVE_FRAGMENTO)
+        inicio, propio_inicio, propio_fin, _ = posicion or (0, 0, len(doc.text), True)
+        marcadores = self._marcadores(argumentos)
+        try:
+            for clave, oracion_inicio, oracion_fin in nuevas:
+                desde, hasta = oracion_inicio - inicio, oracion_fin - inicio
+                if desde < propio_inicio or hasta > propio_fin:
+                    continue   # la oración es de otro fragmento
+                # Sin el último fragmento: la oración no cuenta como documento procesado
+                doc.user_data[CLAVE_FRAGMENTO] = (inicio, desde, hasta, False)
+                zona = None if columnas is None else columnas.zona(desde, hasta)
+                parcial = capturar_parcial(self.analizador,
+                                           lambda: self._procesar_doc(doc, marcadores, zona),
+                                           fusionar=False)
+                self._guardar(clave, {campo: valor for campo, valor in parcial.items() if valor})
+        finally:
+            if posicion is None:
+                doc.user_data.pop(CLAVE_FRAGMENTO, None)
+            else:
+                doc.user_data[CLAVE_FRAGMENTO] = posicion
+
+    def cerrar(self):
+        self._confirmar()
+        if self._conexion is not None and self._pid == os.getpid():
+            self._conexion.close()
+        self._conexion = None
+        self._pid = None
+
+    def resumen(self) -> str:
+        aciertos = self.aciertos_memoria + self.aciertos_disco
+        total = aciertos + self.fallos
+        porcentaje = 100 * aciertos / total if total else 0.0
+        return (f"{aciertos} oraciones encontradas ({self.aciertos_memoria} en memoria, "
+                f"{self.aciertos_disco} en disco; {self.contexto} analizadas como contexto), "
+                f"{self.fallos} nuevas ({porcentaje:.1f}% de aciertos); {self.guardadas} guardadas")
+
+
+def crear_cache_extraccion(analizador, lemas: Iterable[str], modo: str = 'no') -> Optional[CacheExtraccion]:
+    """Caché de extracción según el modo ('disco', 'memoria' o 'no')"""
+    if modo not in MODOS_CACHE:
+        raise ValueError(f"Modo de caché de extracción desconocido: {modo}")
+    if modo == 'no':
+        return None
+    return CacheExtraccion(analizador, lemas, disco=(modo == 'disco'))
+
+
+# ============================================================================
+# CACHÉS EN DISCO
+# ============================================================================
+
+def bases_en_disco() -> Iterator[Tuple[Path, int]]:
+    """(ruta, oraciones) de cada caché de extracción guardada"""
+    for ruta in sorted(carpeta_cache('extraccion').glob('*.sqlite')):
+        try:
+            with sqlite3.connect(ruta) as base:
+                oraciones, = base.execute('SELECT COUNT(*) FROM oraciones').fetchone()
+        except sqlite3.Error:
+            oraciones = 0
+        yield ruta, oraciones
+
+
+# ============================================================================
+# COMPROBACIÓN: CON Y SIN CACHÉ
+# ============================================================================
+
+ANALIZADORES = ('valoraciones', 'colocacional', 'rapido')
+
+
+def _analizador(nombre: str):
+    """(analizador, lemas objetivo, argumentos de procesar_doc() de cada documento)"""
+    if nombre == 'valoraciones':
+        from analizador_valoraciones_critica_mejorado import (TERMINOS_MUSICALES,
+                                                              AnalizadorValoracionesMejorado)
+        return (AnalizadorValoracionesMejorado(), {'música'} | TERMINOS_MUSICALES,
+                lambda documento: (documento.nombre, documento.publicacion))
+    if nombre == 'colocacional':
+        from analizador_ventana_colocacional import AnalizadorVentanaColocacional
+        return AnalizadorVentanaColocacional(), {'música'}, lambda documento: (documento.nombre,)
+    from analizador_ventana_rapido import AnalizadorVentanaColocacional
+    return (AnalizadorVentanaColocacional(), {'música'},
+            lambda documento: (documento.nombre, documento.publicacion))
+
+
+def _comparable(valor):
+    """
+    Parcial sin ocurrencias (las reutilizadas son las de la primera aparición), sin
+    orden en las listas y con los pesos redondeados (el orden de las sumas cambia)
+    """
+    if isinstance(valor, dict):
+        return {k: _comparable(v) for k, v in valor.items() if k != 'ocurrencia'}
+    if isinstance(valor, list):
+        return sorted((_comparable(v) for v in valor),
+                      key=lambda v: json.dumps(v, sort_keys=True, ensure_ascii=False))
+    if isinstance(valor, float):
+        return round(valor, 6)
+    return valor
+
+
+def comprobar(ruta_corpus: str, nombre: str, documentos: int) -> List[str]:
+    """Campos del analizador que difieren entre el análisis con caché (en memoria) y sin ella"""
+    from cargador_corpus import abrir_corpus
+    from normalizacion_corpus import texto_normalizado
+
+    textos = [(texto_normalizado(documento).texto, documento) for documento in
+              itertools.islice(abrir_corpus(ruta_corpus).documentos(), documentos)]
+
+    sin_cache, _, argumentos_de = _analizador(nombre)
+    referencia = capturar_parcial(sin_cache, lambda: [
+        sin_cache.procesar_documento(texto, *argumentos_de(documento)) for texto, documento in textos])
+
+    con_cache, lemas, _ = _analizador(nombre)
+    cache = CacheExtraccion(con_cache, lemas, disco=False)
+    resultado = capturar_parcial(con_cache, lambda: [
+        cache.procesar_texto(texto, argumentos_de(documento)) for texto, documento in textos])
+    print(f"  ♻ Con caché: {cache.resumen()}")
+
+    return [campo for campo in referencia
+            if _comparable(referencia[campo]) != _comparable(resultado.get(campo))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cachés de extracción por oración")
+    parser.add_argument('--vaciar', action='store_true', help="Eliminar las cachés en disco")
+    parser.add_argument('--comprobar', metavar='CORPUS',
+                        help="Comparar los resultados con y sin caché sobre una muestra del corpus")
+    parser.add_argument('--analizador', choices=ANALIZADORES, default='valoraciones',
+                        help="Analizador que se comprueba")
+    parser.add_argument('--documentos', type=int, default=50,
+                        help="Documentos de la muestra")
+    argumentos = parser.parse_args()
+
+    if argumentos.comprobar:
+        from cargador_corpus import es_fuente_corpus
+
+        if not es_fuente_corpus(argumentos.comprobar):
+            print(f"❌ ERROR: El corpus no existe: {argumentos.comprobar}")
+            sys.exit(1)
+        diferencias = comprobar(argumentos.comprobar, argumentos.analizador, argumentos.documentos)
+        if diferencias:
+            print(f"  ✗ Resultados distintos con caché en: {', '.join(diferencias)}")
+            sys.exit(1)
+        print(f"  ✓ Mismos resultados con y sin caché en {argumentos.documentos} documentos")
+        return
+
+    bases = list(bases_en_disco())
+    if not bases:
+        print(f"✓ No hay cachés de extracción en {carpeta_cache('extraccion')}")
+        return
+    for ruta, oraciones in bases:
+        print(f"  {ruta.name:<60} {oraciones:>9,} oraciones "
+              f"{ruta.stat().st_size / 2**20:>8,.1f} MB")
+        if argumentos.vaciar:
+            for archivo in ruta.parent.glob(ruta.name + '*'):   # con -wal y -shm
+                archivo.unlink()
+    if argumentos.vaciar:
+        print(f"✓ {len(bases)} cachés eliminadas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Control de calidad del OCR antes del análisis sintáctico
+
+Algunas transcripciones son casi todo ruido de OCR: spaCy tarda lo mismo en
+analizarlas y no devuelve nada útil. Antes de analizar se calcula, por documento
+y por párrafo, una puntuación barata:
+- cobertura: proporción de palabras reconocidas (palabras funcionales del español
+  y adjetivos validados de datos/LISTA_COMPLETA_ADJETIVOS_VALIDADOS_5607.txt)
+- densidad de símbolos: caracteres que no son letras, cifras ni puntuación habitual
+- longitud media de palabra: el ruido produce fragmentos muy cortos o muy largos
+
+Los documentos por debajo del umbral no se analizan, y de los demás se descartan
+los párrafos ilegibles. Los descartes aparecen en el resumen de cada ejecución.
+
+Uso:
+    python3 calidad_ocr.py CORPUS      # documentos peor puntuados
+
+Proyecto: LexiMus - Universidad de Salamanca
+"""
+
+import re
+import sys
+from pathlib import Path
+from typing import Dict, FrozenSet, Optional
+
+from cargador_corpus import abrir_corpus, es_fuente_corpus, huella_contenido
+
+RUTA_ADJETIVOS = (Path(__file__).resolve().parent.parent / 'datos' /
+                  'LISTA_COMPLETA_ADJETIVOS_VALIDADOS_5607.txt')
+
+UMBRAL_COBERTURA = 0.20        # mínimo de palabras reconocidas
+UMBRAL_SIMBOLOS = 0.08         # máximo de símbolos extraños por carácter
+LONGITUD_MEDIA = (2.5, 9.0)    # longitud media de palabra aceptable
+MIN_PALABRAS_PARRAFO = 20      # párrafos más cortos no se puntúan (se conservan)
+CONTADORES_DESCARTE = ('documentos_descartados', 'parrafos_descartados', 'palabras_descartadas')
+
+# Palabras más frecuentes del español: en un texto legible cubren en torno
+# a la mitad de las palabras, en el ruido de OCR casi ninguna
+PALABRAS_FUNCIONALES = frozenset("""
+a al algo algunas algunos ante antes aquel aquella aquellas aquellos aquí así aun aún
+bajo bien cada casi como cómo con contra cual cuales cuando cuanto de del desde
+donde dos durante e el él ella ellas ello ellos en entre era eran es esa esas ese
+eso esos esta está estaba estaban estas este esto estos fue fueron ha había habían
+han hasta hay he la las le les lo los más me mi mis mismo mucho muchos muy nada ni
+no nos nuestra nuestro o otra otras otro otros para pero poco por porque pues que
+qué quien quienes se sea ser si sí siempre sido sin sino sobre son su sus también
+tan tanto tiene tienen toda todas todo todos tras tres un una unas uno unos usted y
+ya yo hace hacer puede pueden será sería sr don doña señor señora día días año años
+vez veces parte obra obras música músico músicos concierto conciertos orquesta
+teatro programa autor arte canto piano público nuevo nueva gran grande primera
+primero madrid españa
+""".split())
+
+_PALABRA = re.compile(r'[^\W\d_]+')
+_SIMBOLO = re.compile(r'[^\w\s.,;:¡!¿?()«»"\'\-—–]')
+_PARRAFO = re.compile(r'\n[ \t]*\n')
+
+
+def cargar_lexico(ruta=RUTA_ADJETIVOS) -> FrozenSet[str]:
+    """Palabras funcionales más los adjetivos validados (si la lista está disponible)"""
+    adjetivos = set()
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            for linea in f:
+                m = re.match(r'\s*\d+\.\s+(\S+)', linea)
+                if m:
+                    adjetivos.add(m.group(1).lower())
+    except OSError:
+        print(f"⚠️  No se encuentra {ruta}; se usan solo las palabras funcionales")
+    return PALABRAS_FUNCIONALES | adjetivos
+
+
+def medir_calidad(texto: str, lexico: FrozenSet[str]) -> Dict[str, float]:
+    """Palabras, cobertura, densidad de símbolos y longitud media de un fragmento"""
+    palabras = _PALABRA.findall(texto.lower())
+    caracteres = sum(1 for c in texto if not c.isspace())
+    if not palabras or not caracteres:
+        return {'palabras': 0, 'cobertura': 0.0, 'simbolos': 1.0 if caracteres else 0.0,
+                'longitud_media': 0.0}
+    return {
+        'palabras': len(palabras),
+        'cobertura': sum(1 for p in palabras if p in lexico) / len(palabras),
+        'simbolos': len(_SIMBOLO.findall(texto)) / caracteres,
+        'longitud_media': sum(len(p) for p in palabras) / len(palabras)
+    }
+
+
+class FiltroCalidad:
+    """
+    Descarta documentos y párrafos ilegibles antes del análisis
+
+    Estadísticas de la ejecución: documentos_descartados, parrafos_descartados,
+    palabras_descartadas (palabras que no han pasado por spaCy).
+    """
+
+    def __init__(self, lexico: Optional[FrozenSet[str]] = None,
+                 umbral_cobertura: float = UMBRAL_COBERTURA,
+                 umbral_simbolos: float = UMBRAL_SIMBOLOS,
+                 longitud_media=LONGITUD_MEDIA):
+        self.lexico = lexico if lexico is not None else cargar_lexico()
+        self.umbral_cobertura = umbral_cobertura
+        self.umbral_simbolos = umbral_simbolos
+        self.longitud_media = longitud_media
+        # Cambia si cambian los umbrales o el léxico (invalida resultados guardados)
+        self.firma = huella_contenido(repr((umbral_cobertura, umbral_simbolos, tuple(longitud_media),
+                                            sorted(self.lexico))).encode('utf-8'))
+
+        self.documentos_descartados = 0
+        self.parrafos_descartados = 0
+        self.palabras_descartadas = 0
+
+    def contadores(self) -> Dict[str, int]:
+        """Descartes acumulados en la ejecución (para los informes JSON)"""
+        return {clave: getattr(self, clave) for clave in CONTADORES_DESCARTE}
+
+    def es_legible(self, metricas: Dict[str, float]) -> bool:
+        minima, maxima = self.longitud_media
+        return (metricas['cobertura'] >= self.umbral_cobertura
+                and metricas['simbolos'] <= self.umbral_simbolos
+                and minima <= metricas['longitud_media'] <= maxima)
+
+    def filtrar(self, texto: str) -> Optional[str]:
+        """
+        Texto sin los párrafos ilegibles, o None si lo que queda es ilegible
+        """
+        conservados = []
+        parrafos_descartados = 0
+        palabras_descartadas = 0
+        for parrafo in _PARRAFO.split(texto):
+            metricas = medir_calidad(parrafo, self.lexico)
+            if metricas['palabras'] >= MIN_PALABRAS_PARRAFO and not self.es_legible(metricas):
+                parrafos_descartados += 1
+                palabras_descartadas += metricas['palabras']
+                continue
+            conservados.append(parrafo)
+
+        restante = '\n\n'.join(conservados)
+        metricas = medir_calidad(restante, self.lexico)
+        if (parrafos_descartados or metricas['palabras']) and (
+                not metricas['palabras'] or not self.es_legible(metricas)):
+            self.documentos_descartados += 1
+            self.palabras_descartadas += palabras_descartadas + metricas['palabras']
+            return None
+
+        if not parrafos_descartados:
+            return texto
+        self.parrafos_descartados += parrafos_descartados
+        self.palabras_descartadas += palabras_descartadas
+        return restante
+
+    def resumen(self) -> str:
+        return (f"{self.documentos_descartados} documentos y {self.parrafos_descartados} "
+                f"párrafos ilegibles descartados ({self.palabras_descartadas:,} palabras sin analizar)")
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Uso: python3 calidad_ocr.py CORPUS")
+        sys.exit(1)
+
+    ruta = sys.argv[1]
+    if not es_fuente_corpus(ruta):
+        print(f"❌ ERROR: El corpus no existe: {ruta}")
+        sys.exit(1)
+
+    filtro = FiltroCalidad()
+    puntuaciones = []
+    for documento in abrir_corpus(ruta).documentos():
+        metricas = medir_calidad(documento.leer(), filtro.lexico)
+        puntuaciones.append((metricas['cobertura'], documento.clave, metricas,
+                             filtro.es_legible(metricas)))
+
+    puntuaciones.sort()
+    ilegibles = sum(1 for *_, legible in puntuaciones if not legible)
+    print(f"📄 {len(puntuaciones)} documentos, {ilegibles} por debajo del umbral")
+    print(f"{'Cobertura':>9}  {'Símbolos':>8}  {'Long.':>5}  Documento")
+    for cobertura, clave, metricas, legible in puntuaciones[:30]:
+        marca = ' ' if legible else '✗'
+        print(f"{cobertura:9.2f}  {metricas['simbolos']:8.3f}  {metricas['longitud_media']:5.1f}  "
+              f"{marca} {clave}")
+
+
+if __name__ == "__main__":
+    main()
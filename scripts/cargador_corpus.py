@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cargador común del corpus para todos los analizadores
+
+Cada archivo .txt se decodifica una sola vez con la codificación detectada:
+- Se prueba UTF-8 (con o sin BOM), después cp1252 y, como último recurso, latin-1
+- La codificación detectada se guarda en un archivo auxiliar (.codificaciones.json)
+  dentro de cada carpeta, junto con el tamaño y la fecha de modificación
+- En ejecuciones posteriores se decodifica directamente con la codificación guardada
+- El texto se decodifica desde los bytes mapeados en memoria (mmap), sin copias intermedias
+
+Así todos los scripts ven exactamente los mismos caracteres (sin errors='ignore',
+que eliminaba las tildes) y ningún archivo se lee ni decodifica dos veces.
+
+Los analizadores recorren el corpus mediante abrir_corpus(), que acepta
+indistintamente una carpeta de .txt, un paquete generado con paquete_corpus.py
+o un archivo comprimido (.zip, .tar.gz, .tar.zst...) leído en flujo.
+
+Proyecto: LexiMus - Universidad de Salamanca
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import queue
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+# Orden de prueba: UTF-8 es la codificación de las transcripciones actuales;
+# cp1252 y latin-1 cubren las exportaciones antiguas de Windows
+CODIFICACIONES = ('utf-8', 'cp1252', 'latin-1')
+NOMBRE_SIDECAR = '.codificaciones.json'
+VERSION_SIDECAR = 1
+
+BOM_UTF8 = b'\xef\xbb\xbf'
+
+
+def huella_contenido(datos) -> str:
+    """Huella (hash) del contenido en bytes, estable entre ejecuciones"""
+    return hashlib.blake2b(datos, digest_size=16).hexdigest()
+
+
+def detectar_codificacion(datos) -> Tuple[str, str]:
+    """
+    Detecta la codificación de un bloque de bytes y lo decodifica
+
+    Returns:
+        (codificacion, texto): la primera codificación que decodifica sin errores
+        y el texto resultante, para no decodificar dos veces
+    """
+    if bytes(datos[:3]) == BOM_UTF8:
+        try:
+            return 'utf-8-sig', str(datos, 'utf-8-sig')
+        except UnicodeDecodeError:
+            pass
+
+    for codificacion in CODIFICACIONES:
+        try:
+            return codificacion, str(datos, codificacion)
+        except UnicodeDecodeError:
+            continue
+
+    # latin-1 nunca falla, pero se deja por claridad
+    return 'latin-1', str(datos, 'latin-1')
+
+
+class CargadorCorpus:
+    """
+    Lector de archivos del corpus con caché de codificaciones por carpeta
+    """
+
+    def __init__(self, nombre_sidecar: str = NOMBRE_SIDECAR):
+        self.nombre_sidecar = nombre_sidecar
+        self._sidecars: Dict[Path, Dict[str, dict]] = {}
+        self._modificados = set()
+
+        # Estadísticas
+        self.archivos_leidos = 0
+        self.detecciones = 0
+
+    def _sidecar(self, carpeta: Path) -> Dict[str, dict]:
+        """Carga (una vez) el registro de codificaciones de una carpeta"""
+        if carpeta not in self._sidecars:
+            registro = {}
+            ruta_sidecar = carpeta / self.nombre_sidecar
+            if ruta_sidecar.exists():
+                try:
+                    with open(ruta_sidecar, 'r', encoding='utf-8') as f:
+                        datos = json.load(f)
+                    if datos.get('version') == VERSION_SIDECAR:
+                        registro = datos.get('archivos', {})
+                except (OSError, ValueError):
+                    registro = {}
+            self._sidecars[carpeta] = registro
+        return self._sidecars[carpeta]
+
+    def codificacion_guardada(self, ruta, stat: Optional[os.stat_result] = None) -> Optional[str]:
+        """Devuelve la codificación registrada si el archivo no ha cambiado"""
+        ruta = Path(ruta)
+        stat = stat or ruta.stat()
+        entrada = self._sidecar(ruta.parent).get(ruta.name)
+        if (entrada and entrada.get('tamano') == stat.st_size
+                and entrada.get('mtime_ns') == stat.st_mtime_ns):
+            return entrada['codificacion']
+        return None
+
+    def _registrar(self, ruta: Path, stat: os.stat_result, codificacion: str):
+        self._sidecar(ruta.parent)[ruta.name] = {
+            'codificacion': codificacion,
+            'tamano': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns
+        }
+        self._modificados.add(ruta.parent)
+
+    def decodificar(self, datos, ruta=None, stat: Optional[os.stat_result] = None) -> str:
+        """
+        Decodifica bytes ya leídos (o mapeados) usando la codificación registrada
+
+        Si no hay registro válido para `ruta`, detecta la codificación y la guarda.
+        """
+        codificacion = None
+        if ruta is not None:
+            codificacion = self.codificacion_guardada(ruta, stat)
+
+        if codificacion:
+            try:
+                return str(datos, codificacion)
+            except UnicodeDecodeError:
+                codificacion = None
+
+        codificacion, texto = detectar_codificacion(datos)
+        self.detecciones += 1
+        if ruta is not None:
+            ruta = Path(ruta)
+            self._registrar(ruta, stat or ruta.stat(), codificacion)
+        return texto
+
+    def leer(self, ruta) -> str:
+        """Lee un archivo completo como texto desde su mapeo en memoria"""
+        ruta = Path(ruta)
+        with open(ruta, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self.archivos_leidos += 1
+            if stat.st_size == 0:
+                return ''
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return self.decodificar(mm, ruta, stat)
+
+    def leer_con_huella(self, ruta, mapear: bool = True) -> Tuple[str, str]:
+        """
+        Lee un archivo y calcula la huella de su contenido sobre el mismo mapeo
+
+        Con mapear=False se usa read(): los fallos de página de un mmap se resuelven
+        con el GIL tomado, mientras que read() lo libera durante la espera de disco.
+        Es lo adecuado en los hilos de lectura anticipada.
+        """
+        ruta = Path(ruta)
+        with open(ruta, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self.archivos_leidos += 1
+            if stat.st_size == 0:
+                return '', huella_contenido(b'')
+            if not mapear:
+                datos = f.read()
+                return self.decodificar(datos, ruta, stat), huella_contenido(datos)
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return self.decodificar(mm, ruta, stat), huella_contenido(mm)
+
+    def guardar(self):
+        """Escribe los registros de codificación de las carpetas modificadas"""
+        for carpeta in list(self._modificados):
+            ruta_sidecar = carpeta / self.nombre_sidecar
+            datos = {'version': VERSION_SIDECAR, 'archivos': self._sidecars[carpeta]}
+            tmp = ruta_sidecar.with_name(ruta_sidecar.name + '.tmp')
+            try:
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump(datos, f, ensure_ascii=False, indent=1, sort_keys=True)
+                os.replace(tmp, ruta_sidecar)
+            except OSError as e:
+                print(f"⚠️  No se pudo guardar {ruta_sidecar}: {e}")
+                continue
+            self._modificados.discard(carpeta)
+
+
+# Instancia compartida: los scripts usan leer_texto() y guardar_codificaciones()
+cargador = CargadorCorpus()
+
+
+def leer_texto(ruta) -> str:
+    """Lee un archivo del corpus con la codificación detectada una sola vez"""
+    return cargador.leer(ruta)
+
+
+def guardar_codificaciones():
+    """Persiste las codificaciones detectadas en esta ejecución"""
+    cargador.guardar()
+
+
+def carpeta_cache(nombre: str) -> Path:
+    """
+    Carpeta de una caché indexada por huella del contenido
+
+    Al depender solo del contenido, estas cachés valen para cualquier copia del
+    corpus (carpeta, paquete o comprimido). Por defecto ~/.cache/leximus/<nombre>;
+    la raíz se cambia con la variable de entorno LEXIMUS_CACHE.
+    """
+    raiz = os.environ.get('LEXIMUS_CACHE') or Path.home() / '.cache' / 'leximus'
+    return Path(raiz) / nombre
+
+
+# ============================================================================
+# DOCUMENTOS Y FUENTES DEL CORPUS
+# ============================================================================
+
+class DocumentoCorpus:
+    """
+    Documento del corpus con lectura diferida del contenido
+
+    Atributos:
+        clave: ruta relativa a la raíz del corpus ("ONDAS/1925-03-01.txt")
+        publicacion: "EL SOL", "ONDAS", "ESPAÑA"...
+        tamano, mtime_ns: tamaño y fecha del archivo original
+        huella: huella del contenido original, si ya se conoce
+    """
+
+    huella: Optional[str] = None
+    _precarga = None
+
+    def __init__(self, clave: str, publicacion: str):
+        self.clave = clave
+        self.publicacion = publicacion
+
+    @property
+    def nombre(self) -> str:
+        return self.clave.rsplit('/', 1)[-1]
+
+    def leer(self) -> str:
+        precarga = self._tomar_precarga()
+        if precarga is not None:
+            return precarga[0]
+        return self._leer()
+
+    def leer_con_huella(self) -> Tuple[str, str]:
+        precarga = self._tomar_precarga()
+        if precarga is not None:
+            texto, self.huella = precarga
+        else:
+            texto, self.huella = self._leer_con_huella()
+        return texto, self.huella
+
+    def precargar(self):
+        """
+        Lee y decodifica el contenido por adelantado (hilo de lectura anticipada)
+
+        Los errores se guardan y se lanzan en el hilo que llame a leer(), para que
+        cada analizador los trate como siempre.
+        """
+        try:
+            self._precarga = self._leer_anticipado()
+        except Exception as e:
+            self._precarga = e
+
+    def _tomar_precarga(self) -> Optional[Tuple[str, str]]:
+        precarga, self._precarga = self._precarga, None
+        if isinstance(precarga, Exception):
+            raise precarga
+        return precarga
+
+    def _leer(self) -> str:
+        raise NotImplementedError
+
+    def _leer_con_huella(self) -> Tuple[str, str]:
+        raise NotImplementedError
+
+    def _leer_anticipado(self) -> Tuple[str, str]:
+        return self._leer_con_huella()
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.clave!r})"
+
+
+class DocumentoArchivo(DocumentoCorpus):
+    """Documento almacenado como archivo .txt suelto"""
+
+    def __init__(self, ruta, clave: Optional[str] = None, publicacion: str = ""):
+        self.ruta = Path(ruta)
+        super().__init__(clave or self.ruta.name, publicacion)
+        self._stat = None
+
+    def _stat_archivo(self) -> os.stat_result:
+        if self._stat is None:
+            self._stat = self.ruta.stat()
+        return self._stat
+
+    @property
+    def tamano(self) -> int:
+        return self._stat_archivo().st_size
+
+    @property
+    def mtime_ns(self) -> int:
+        return self._stat_archivo().st_mtime_ns
+
+    def _leer(self) -> str:
+        return cargador.leer(self.ruta)
+
+    def _leer_con_huella(self) -> Tuple[str, str]:
+        return cargador.leer_con_huella(self.ruta)
+
+    def _leer_anticipado(self) -> Tuple[str, str]:
+        return cargador.leer_con_huella(self.ruta, mapear=False)
+
+    def __str__(self):
+        return str(self.ruta)
+
+
+_FIN = object()
+
+
+def precargar_documentos(documentos: Iterable[DocumentoCorpus], anticipacion: int = 8,
+                         requiere_lectura: Optional[Callable[[DocumentoCorpus], bool]] = None
+                         ) -> Iterator[DocumentoCorpus]:
+    """
+    Lee y decodifica los siguientes documentos en un hilo mientras se analiza el actual
+
+    Productor/consumidor con una cola acotada a `anticipacion` documentos: la lectura
+    de disco (o de red) queda oculta tras el tiempo de análisis de spaCy.
+
+    Args:
+        documentos: iterable de documentos (se recorre en el hilo de lectura)
+        anticipacion: número máximo de documentos leídos por adelantado
+        requiere_lectura: si se indica, solo se precargan los documentos para los que
+            devuelve True (p. ej. los que el re-análisis incremental no puede reutilizar)
+    """
+    if anticipacion <= 0:
+        yield from documentos
+        return
+
+    cola: queue.Queue = queue.Queue(maxsize=anticipacion)
+    detener = threading.Event()
+
+    def poner(elemento) -> bool:
+        while not detener.is_set():
+            try:
+                cola.put(elemento, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def productor():
+        try:
+            for documento in documentos:
+                if requiere_lectura is None or requiere_lectura(documento):
+                    documento.precargar()
+                if not poner(documento):
+                    return
+            poner(_FIN)
+        except BaseException as e:
+            # Error al recorrer el corpus: se relanza en el hilo consumidor
+            poner(e)
+
+    hilo = threading.Thread(target=productor, name='lectura-anticipada', daemon=True)
+    hilo.start()
+    try:
+        while True:
+            elemento = cola.get()
+            if elemento is _FIN:
+                break
+            if isinstance(elemento, BaseException):
+                raise elemento
+            yield elemento
+    finally:
+        detener.set()
+        hilo.join()
+
+
+class CorpusDirectorio:
+    """
+    Corpus almacenado como carpeta de .txt (con subcarpetas por publicación)
+    """
+
+    def __init__(self, ruta):
+        self.ruta = Path(ruta)
+
+    @property
+    def nombre(self) -> str:
+        return self.ruta.name
+
+    def contiene(self, publicacion: str) -> bool:
+        return (self.ruta / publicacion).is_dir()
+
+    def contar(self, publicacion: Optional[str] = None, patron: str = "*.txt",
+               recursivo: bool = True) -> int:
+        carpeta = self.ruta / publicacion if publicacion else self.ruta
+        archivos = carpeta.rglob(patron) if recursivo else carpeta.glob(patron)
+        return sum(1 for _ in archivos)
+
+    def documentos(self, publicacion: Optional[str] = None, patron: str = "*.txt",
+                   recursivo: bool = True) -> Iterator[DocumentoCorpus]:
+        """
+        Recorre los documentos de la carpeta (o de una publicación)
+
+        Sin `publicacion`, la publicación de cada archivo es su primera subcarpeta
+        (o el nombre de la carpeta raíz si el archivo está directamente en ella).
+        """
+        carpeta = self.ruta / publicacion if publicacion else self.ruta
+        archivos = carpeta.rglob(patron) if recursivo else carpeta.glob(patron)
+        for archivo in archivos:
+            clave = archivo.relative_to(self.ruta).as_posix()
+            if publicacion:
+                pub = publicacion
+            else:
+                partes = clave.split('/')
+                pub = partes[0] if len(partes) > 1 else self.ruta.name
+            yield DocumentoArchivo(archivo, clave, pub)
+
+    def ruta_auxiliar(self, nombre: str) -> Path:
+        """Ubicación de los archivos auxiliares (manifiesto, resultados...)"""
+        return self.ruta / nombre
+
+
+def abrir_corpus(ruta):
+    """
+    Abre un corpus: carpeta de .txt, paquete de un solo archivo o archivo comprimido
+
+    Todos devuelven objetos con la misma interfaz
+    (documentos, contar, contiene, ruta_auxiliar).
+    Los documentos deben consumirse de uno en uno (sin list()) para que
+    la lectura de archivos comprimidos mantenga la memoria acotada.
+    """
+    from comprimido_corpus import CorpusComprimido, es_comprimido
+    from paquete_corpus import PaqueteCorpus, es_paquete
+
+    ruta = Path(ruta)
+    if ruta.is_file() and es_paquete(ruta):
+        return PaqueteCorpus(ruta)
+    if ruta.is_file() and es_comprimido(ruta):
+        return CorpusComprimido(ruta)
+    return CorpusDirectorio(ruta)
+
+
+def es_fuente_corpus(ruta) -> bool:
+    """True si la ruta es una carpeta, un paquete o un archivo comprimido de corpus"""
+    from comprimido_corpus import es_comprimido
+    from paquete_corpus import es_paquete
+
+    ruta = Path(ruta)
+    return ruta.is_dir() or (ruta.is_file() and (es_paquete(ruta) or es_comprimido(ruta)))
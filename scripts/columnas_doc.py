@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Vista por columnas de un Doc (Doc.to_array) para recorrer los tokens con NumPy
+
+Los extractores recorrían los objetos Token de Python y llamaban a
+token.lemma_.lower(), token.pos_ o re.match en cada token: miles de cadenas
+creadas por documento. ColumnasDoc construye una vez por Doc las columnas de lema,
+categoría, dependencia, núcleo y posición, y los lemas en minúsculas se resuelven
+una sola vez por lema distinto del documento (no por token):
+
+    columnas = ColumnasDoc(doc)
+    adjetivos = columnas.categoria('ADJ') & columnas.por_lema(es_lema_valido)
+    for i in columnas.indices(columnas.lemas({'música'}) & columnas.propios):
+        hijos = columnas.hijos(i)
+
+Las máscaras por lema y las que registran los analizadores con memo() se calculan
+una vez por Doc. zona() da las mismas columnas con la zona propia limitada a un
+tramo del texto: la caché de extracción (cache_extraccion.py) procesa así cada
+oración nueva sin reconstruir nada.
+
+Los analizadores de ventana colocacional y de valoraciones extraen sobre estas
+columnas; el recorrido por tokens se conserva como referencia. Comprobación de
+resultados y velocidad de ambos recorridos:
+
+    python3 columnas_doc.py CORPUS [--documentos 200]
+
+Proyecto: LexiMus - Universidad de Salamanca
+"""
+
+import argparse
+import copy
+import itertools
+import json
+import sys
+import time
+from typing import Any, Callable, Hashable, Iterable
+
+from fragmentos_documento import CLAVE_FRAGMENTO
+from recursos import numpy
+
+
+class ColumnasDoc:
+    """
+    Columnas de un Doc: lema, categoria, dependencia, cabeza (índice absoluto del
+    núcleo) e idx (posición del token en el texto del Doc)
+    """
+
+    def __init__(self, doc):
+        from spacy.attrs import DEP, HEAD, IDX, LEMMA, POS
+
+        np = numpy()
+        self.doc = doc
+        self.n = len(doc)
+        self._cadenas = doc.vocab.strings
+        self._mascaras = {}
+        self._memo = {}
+        datos = doc.to_array([LEMMA, POS, DEP, HEAD, IDX]).reshape(self.n, 5)   # uint64
+        self.categoria_ = datos[:, 1]
+        self.dependencia_ = datos[:, 2]
+        # HEAD es relativo y negativo para los núcleos a la izquierda
+        self.cabeza = np.arange(self.n, dtype=np.int64) + datos[:, 3].astype(np.int64)
+        self.idx = datos[:, 4].astype(np.int64)
+
+        # Lemas en minúsculas: una cadena por lema distinto, no por token
+        unicos, inverso = np.unique(datos[:, 0], return_inverse=True)
+        self._inverso = inverso.reshape(-1)
+        self.lemas_unicos = [self._cadenas[int(h)].lower() for h in unicos]
+
+        # Hijos de cada token: índices ordenados por núcleo (y por posición)
+        self._orden = np.argsort(self.cabeza, kind='stable')
+        self._cabezas_ordenadas = self.cabeza[self._orden]
+
+        posicion = doc.user_data.get(CLAVE_FRAGMENTO)
+        if posicion is None:
+            self.propios = np.ones(self.n, dtype=bool)
+        else:
+            self.propios = (self.idx >= posicion[1]) & (self.idx < posicion[2])
+
+    # --- Máscaras ---------------------------------------------------------
+
+    def por_lema(self, predicado: Callable[[str], bool]):
+        """Máscara de los tokens cuyo lema en minúsculas cumple `predicado`"""
+        np = numpy()
+        valores = np.fromiter((predicado(lema) for lema in self.lemas_unicos),
+                              dtype=bool, count=len(self.lemas_unicos))
+        return valores[self._inverso] if self.n else np.zeros(0, dtype=bool)
+
+    def lemas(self, conjunto: Iterable[str]):
+        """Máscara de los tokens cuyo lema en minúsculas está en `conjunto` (una vez por Doc)"""
+        clave = ('lemas', frozenset(conjunto))
+        if clave not in self._mascaras:
+            self._mascaras[clave] = self.por_lema(clave[1].__contains__)
+        return self._mascaras[clave]
+
+    def memo(self, clave: Hashable, calcular: Callable[[], Any]) -> Any:
+        """Resultado de calcular() guardado en estas columnas y compartido con sus zonas"""
+        if clave not in self._memo:
+            self._memo[clave] = calcular()
+        return self._memo[clave]
+
+    def zona(self, desde: int, hasta: int) -> 'ColumnasDoc':
+        """Las mismas columnas con la zona propia limitada a los caracteres [desde, hasta) del Doc"""
+        zona = copy.copy(self)
+        zona.propios = self.propios & (self.idx >= desde) & (self.idx < hasta)
+        return zona
+
+    def _etiquetas(self, columna: str, etiquetas: tuple):
+        clave = (columna, etiquetas)
+        if clave not in self._mascaras:
+            valores = [self._cadenas[e] for e in etiquetas]
+            self._mascaras[clave] = numpy().isin(getattr(self, columna), valores)
+        return self._mascaras[clave]
+
+    def categoria(self, *etiquetas: str):
+        """Máscara de los tokens con alguna de las categorías (ADJ, NOUN...)"""
+        return self._etiquetas('categoria_', etiquetas)
+
+    def dependencia(self, *etiquetas: str):
+        """Máscara de los tokens con alguna de las relaciones (amod, nsubj...)"""
+        return self._etiquetas('dependencia_', etiquetas)
+
+    # --- Acceso por índice ------------------------------------------------
+
+    @staticmethod
+    def indices(mascara, desplazamiento: int = 0) -> list:
+        """Índices (enteros de Python) de los tokens de la máscara, más `desplazamiento`"""
+        return (numpy().flatnonzero(mascara) + desplazamiento).tolist()
+
+    def lema(self, i: int) -> str:
+        return self.lemas_unicos[self._inverso[i]]
+
+    def hijos(self, i: int) -> list:
+        """Índices de los hijos del token i, en orden (como token.children)"""
+        np = numpy()
+        inicio = np.searchsorted(self._cabezas_ordenadas, i, side='left')
+        fin = np.searchsorted(self._cabezas_ordenadas, i, side='right')
+        return [j for j in self._orden[inicio:fin].tolist() if j != i]   # la raíz es su propio núcleo
+
+    def alguno(self, mascara, inicio: int, fin: int) -> bool:
+        """True si algún token de [inicio, fin) cumple la máscara (límites recortados al Doc)"""
+        return bool(mascara[max(0, inicio):min(self.n, fin)].any())
+
+
+# ============================================================================
+# COMPARACIÓN CON EL RECORRIDO POR TOKENS
+# ============================================================================
+
+def _medir(analizador, docs, columnar: bool):
+    """(segundos, parcial) de procesar_doc sobre todos los docs"""
+    from manifiesto_corpus import capturar_parcial
+
+    analizador.columnar = columnar
+    inicio = time.perf_counter()
+    parcial = capturar_parcial(analizador, lambda: [analizador.procesar_doc(doc) for doc in docs])
+    return time.perf_counter() - inicio, parcial
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extracción por columnas frente al recorrido por tokens")
+    parser.add_argument('corpus', help="Corpus: carpeta, paquete .corpus o archivo comprimido")
+    parser.add_argument('--documentos', type=int, default=200,
+                        help="Documentos del corpus que se comparan")
+    argumentos = parser.parse_args()
+
+    from cargador_corpus import abrir_corpus, es_fuente_corpus
+    from normalizacion_corpus import texto_normalizado
+
+    if not es_fuente_corpus(argumentos.corpus):
+        print(f"❌ ERROR: El corpus no existe: {argumentos.corpus}")
+        sys.exit(1)
+
+    from analizador_valoraciones_critica_mejorado import AnalizadorValoracionesMejorado
+    from analizador_ventana_colocacional import AnalizadorVentanaColocacional
+
+    analizadores = [AnalizadorVentanaColocacional(), AnalizadorValoracionesMejorado()]
+    documentos = itertools.islice(abrir_corpus(argumentos.corpus).documentos(), argumentos.documentos)
+    textos = [texto_normalizado(documento).texto for documento in documentos]
+    docs = [doc for texto in textos for doc in analizadores[0].analisis.fragmentos(texto)]
+    tokens = sum(len(doc) for doc in docs)
+
+    print(f"\n{'Analizador':<32} {'Tokens':>14} {'Columnas':>12} {'Iguales':>8}")
+    for analizador in analizadores:
+        segundos_tokens, parcial_tokens = _medir(analizador, docs, columnar=False)
+        segundos_columnas, parcial_columnas = _medir(analizador, docs, columnar=True)
+        iguales = (json.dumps(parcial_tokens, sort_keys=True, ensure_ascii=False) ==
+                   json.dumps(parcial_columnas, sort_keys=True, ensure_ascii=False))
+        print(f"{type(analizador).__name__:<32} {tokens / segundos_tokens:10,.0f} t/s "
+              f"{tokens / segundos_columnas:8,.0f} t/s {'✓' if iguales else '✗':>8}")
+    print(f"\n({len(docs)} docs, {tokens:,} tokens; análisis spaCy fuera de la medida)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lectura en flujo de corpus comprimidos (.zip, .tar.gz, .tar.bz2, .tar.xz, .tar.zst)
+
+Los carrels publicados y las copias de seguridad se distribuyen comprimidos.
+En lugar de descomprimirlos antes de cada ejecución, los documentos se leen
+directamente del archivo, en el orden en que están almacenados y sin escribir
+nada en disco:
+- .zip: se usa el directorio central y cada miembro se descomprime al leerlo
+- .tar.*: cada recorrido es una sola pasada en modo flujo ('r|'); cada miembro
+  se entrega en cuanto se ha descomprimido, con su contenido en memoria, y se
+  descarta cuando el consumidor pasa al siguiente. Las pasadas previas
+  (duplicados, repeticiones, manifiesto) vuelven a recorrer el archivo en flujo
+
+La memoria queda acotada al documento en curso (más los de la lectura
+anticipada), siempre que quien consume documentos() no los acumule en una lista.
+
+Para .zst hace falta el paquete opcional `zstandard` (pip install zstandard);
+un .zst suelto solo se admite si contiene un tar.
+
+Las claves son las mismas que con la carpeta descomprimida: si el archivo está
+dentro de una carpeta raíz ("CORPUS/ONDAS/1925-03-01.txt"), esta se omite
+("ONDAS/1925-03-01.txt"). La publicación de cada documento es la primera carpeta
+de su clave ("ONDAS", también para "ONDAS/1925/03-01.txt"), o el nombre del
+archivo comprimido si el documento está en la raíz, como en CorpusDirectorio.
+
+Proyecto: LexiMus - Universidad de Salamanca
+"""
+
+import fnmatch
+import tarfile
+import zipfile
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from cargador_corpus import DocumentoCorpus, cargador, huella_contenido
+
+EXTENSIONES_TAR = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+EXTENSIONES_ZST = ('.tar.zst', '.tzst', '.zst')
+EXTENSIONES_ZIP = ('.zip',)
+MAX_PENDIENTES_RAIZ = 64     # miembros de .tar que esperan a saber si hay carpeta raíz
+
+
+def es_comprimido(ruta) -> bool:
+    """True si la extensión corresponde a un formato comprimido soportado"""
+    nombre = Path(ruta).name.lower()
+    return nombre.endswith(EXTENSIONES_TAR + EXTENSIONES_ZST + EXTENSIONES_ZIP)
+
+
+def _nombre_base(ruta: Path) -> str:
+    """Nombre del archivo sin las extensiones de compresión"""
+    nombre = ruta.name
+    for extension in sorted(EXTENSIONES_TAR + EXTENSIONES_ZST + EXTENSIONES_ZIP,
+                            key=len, reverse=True):
+        if nombre.lower().endswith(extension):
+            return nombre[:-len(extension)]
+    return ruta.stem
+
+
+class DocumentoComprimido(DocumentoCorpus):
+    """
+    Miembro de un archivo comprimido
+
+    En los .zip el miembro se descomprime al llamar a leer(); en los .tar el
+    contenido llega ya descomprimido con la pasada en flujo (`datos`).
+    """
+
+    def __init__(self, corpus: 'CorpusComprimido', clave: str, publicacion: str,
+                 tamano: int, mtime_ns: int, miembro: str, datos: Optional[bytes] = None):
+        super().__init__(clave, publicacion)
+        self._corpus = corpus
+        self.tamano = tamano
+        self.mtime_ns = mtime_ns
+        self._miembro = miembro
+        self._datos = datos
+
+    def _bytes(self) -> bytes:
+        if self._datos is not None:
+            return self._datos
+        with self._corpus._abrir_zip().open(self._miembro) as f:
+            return f.read()
+
+    def _leer(self) -> str:
+        return cargador.decodificar(self._bytes())
+
+    def _leer_con_huella(self) -> Tuple[str, str]:
+        datos = self._bytes()
+        return cargador.decodificar(datos), huella_contenido(datos)
+
+    def __str__(self):
+        return f"{self._corpus.ruta}::{self.clave}"
+
+
+class CorpusComprimido:
+    """
+    Corpus dentro de un archivo comprimido; misma interfaz que CorpusDirectorio
+    """
+
+    def __init__(self, ruta):
+        self.ruta = Path(ruta)
+        self._es_zip = self.ruta.name.lower().endswith(EXTENSIONES_ZIP)
+        self._zip: Optional[zipfile.ZipFile] = None
+        # (clave, tamaño, mtime_ns) de todos los miembros, tras la primera pasada completa
+        self._listado: Optional[List[Tuple[str, int, int]]] = None
+
+    @property
+    def nombre(self) -> str:
+        return _nombre_base(self.ruta)
+
+    # ------------------------------------------------------------------
+    # Acceso al archivo
+    # ------------------------------------------------------------------
+
+    def _abrir_zip(self) -> zipfile.ZipFile:
+        if self._zip is None:
+            self._zip = zipfile.ZipFile(self.ruta)
+        return self._zip
+
+    def _abrir_tar_flujo(self):
+        """Devuelve (tarfile en modo flujo, objetos a cerrar)"""
+        nombre = self.ruta.name.lower()
+        archivo = open(self.ruta, 'rb')
+        cerrar = (archivo,)
+        try:
+            if nombre.endswith(EXTENSIONES_ZST):
+                try:
+                    import zstandard
+                except ImportError:
+                    raise ImportError("Para leer .zst instala el paquete opcional: pip install zstandard")
+                lector = zstandard.ZstdDecompressor().stream_reader(archivo)
+                cerrar = (lector, archivo)
+                return tarfile.open(fileobj=lector, mode='r|'), cerrar
+            return tarfile.open(fileobj=archivo, mode='r|*'), cerrar
+        except tarfile.ReadError:
+            for objeto in cerrar:
+                objeto.close()
+            if nombre.endswith('.zst') and not nombre.endswith(('.tar.zst', '.tzst')):
+                raise ValueError(f"{self.ruta} no contiene un tar: solo se admiten .zst de corpus empaquetados con tar")
+            raise ValueError(f"{self.ruta} no es un archivo tar válido")
+        except BaseException:
+            for objeto in cerrar:
+                objeto.close()
+            raise
+
+    def _miembros_zip(self) -> Iterator[Tuple[str, str, int, int, None]]:
+        """(clave, miembro, tamaño, mtime_ns, None) en orden de archivo, desde el directorio central"""
+        infos = [info for info in self._abrir_zip().infolist() if not info.is_dir()]
+        raiz = _carpeta_raiz([_sin_punto(info.filename) for info in infos], self.nombre)
+        for info in infos:
+            mtime = datetime(*info.date_time).timestamp()
+            yield (_sin_raiz(_sin_punto(info.filename), raiz), info.filename,
+                   info.file_size, int(mtime * 1e9), None)
+
+    def _miembros_tar(self, leer: Callable[[str], bool]) -> Iterator[Tuple[str, str, int, int, Optional[bytes]]]:
+        """
+        (clave, miembro, tamaño, mtime_ns, datos) en una sola pasada en flujo
+
+        Solo se guarda el contenido de los miembros con leer(clave) (los demás, y
+        todos en los conteos, tienen datos None): la pasada descomprime igualmente,
+        pero no retiene nada. Mientras no se sabe si hay carpeta raíz
+        (_decidir_raiz), los miembros esperan en memoria, como mucho
+        MAX_PENDIENTES_RAIZ; después se entregan según se descomprimen.
+        """
+        tar, cerrar = self._abrir_tar_flujo()
+        primera = raiz = None
+        pendientes = []     # (nombre, miembro, tamaño, mtime_ns, datos) sin clave decidida
+        try:
+            for miembro in tar:
+                nombre = _sin_punto(miembro.name).rstrip('/')
+                if not nombre or not (miembro.isfile() or miembro.isdir()):
+                    continue
+                if raiz is None:
+                    primera = primera or nombre.split('/')[0]
+                    raiz = _decidir_raiz(nombre, miembro.isdir(), primera, self.nombre)
+                    if raiz is None and len(pendientes) >= MAX_PENDIENTES_RAIZ:
+                        raiz = ""
+                if not miembro.isfile():
+                    continue
+                if raiz is None:
+                    # Se lee si hace falta con o sin carpeta raíz; se descarta al decidir
+                    sin_primera = nombre[len(primera) + 1:]
+                    datos = None
+                    if leer(nombre) or (sin_primera and leer(sin_primera)):
+                        f = tar.extractfile(miembro)
+                        datos = f.read() if f is not None else b''
+                    pendientes.append((nombre, miembro.name, miembro.size, int(miembro.mtime * 1e9), datos))
+                    continue
+                yield from self._entregar(pendientes, raiz, leer)
+                pendientes = []
+                clave = _sin_raiz(nombre, raiz)
+                datos = None
+                if leer(clave):
+                    f = tar.extractfile(miembro)
+                    datos = f.read() if f is not None else b''
+                yield clave, miembro.name, miembro.size, int(miembro.mtime * 1e9), datos
+            yield from self._entregar(pendientes, raiz or "", leer)
+        finally:
+            tar.close()
+            for objeto in cerrar:
+                objeto.close()
+
+    @staticmethod
+    def _entregar(pendientes: list, raiz: str, leer: Callable[[str], bool]
+                  ) -> Iterator[Tuple[str, str, int, int, Optional[bytes]]]:
+        """Miembros que esperaban la carpeta raíz, ya con su clave"""
+        for nombre, miembro, tamano, mtime_ns, datos in pendientes:
+            clave = _sin_raiz(nombre, raiz)
+            yield clave, miembro, tamano, mtime_ns, datos if leer(clave) else None
+
+    def _miembros(self, leer: Callable[[str], bool]) -> Iterator[Tuple[str, str, int, int, Optional[bytes]]]:
+        """Miembros en orden de archivo; al completar una pasada se guarda el listado"""
+        listado = []
+        miembros = self._miembros_zip() if self._es_zip else self._miembros_tar(leer)
+        for clave, miembro, tamano, mtime_ns, datos in miembros:
+            listado.append((clave, tamano, mtime_ns))
+            yield clave, miembro, tamano, mtime_ns, datos
+        self._listado = listado
+
+    def _claves(self) -> List[Tuple[str, int, int]]:
+        """(clave, tamaño, mtime_ns) de todos los miembros; si no se conocen, una pasada sin leer"""
+        if self._listado is None:
+            for _ in self._miembros(lambda clave: False):
+                pass
+        return self._listado
+
+    def _publicacion(self, clave: str) -> str:
+        """Primera carpeta de la clave, como en CorpusDirectorio"""
+        partes = clave.split('/')
+        return partes[0] if len(partes) > 1 else self.nombre
+
+    def _seleccionado(self, clave: str, publicacion: Optional[str], patron: str,
+                      recursivo: bool) -> bool:
+        """Mismo criterio que glob/rglob en la carpeta de la publicación (o en la raíz)"""
+        if not fnmatch.fnmatch(PurePosixPath(clave).name, patron):
+            return False
+        profundidad = clave.count('/')
+        if publicacion is None:
+            return recursivo or profundidad == 0
+        if not clave.startswith(publicacion + '/'):
+            return False
+        return recursivo or profundidad == 1
+
+    # ------------------------------------------------------------------
+    # Interfaz común de corpus
+    # ------------------------------------------------------------------
+
+    def contiene(self, publicacion: str) -> bool:
+        return any(clave.startswith(publicacion + '/') for clave, _, _ in self._claves())
+
+    def contar(self, publicacion: Optional[str] = None, patron: str = "*.txt",
+               recursivo: bool = True) -> int:
+        return sum(1 for clave, _, _ in self._claves()
+                   if self._seleccionado(clave, publicacion, patron, recursivo))
+
+    def documentos(self, publicacion: Optional[str] = None, patron: str = "*.txt",
+                   recursivo: bool = True) -> Iterator[DocumentoCorpus]:
+        """
+        Documentos en orden de archivo, en una sola pasada
+
+        Sin `publicacion`, la publicación de cada documento es su primera carpeta
+        (o el nombre del archivo si está en la raíz).
+        """
+        def seleccionado(clave: str) -> bool:
+            return self._seleccionado(clave, publicacion, patron, recursivo)
+
+        for clave, miembro, tamano, mtime_ns, datos in self._miembros(seleccionado):
+            if seleccionado(clave):
+                yield DocumentoComprimido(self, clave, publicacion or self._publicacion(clave),
+                                          tamano, mtime_ns, miembro, datos)
+
+    def ruta_auxiliar(self, nombre: str) -> Path:
+        return self.ruta.with_name(self.ruta.name + nombre)
+
+    def cerrar(self):
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+
+
+def _sin_punto(nombre: str) -> str:
+    """Nombre del miembro sin el "./" inicial de los tar creados desde la carpeta"""
+    return nombre[2:] if nombre.startswith('./') else nombre
+
+
+def _sin_raiz(nombre: str, raiz: str) -> str:
+    return nombre[len(raiz):] if raiz and nombre.startswith(raiz) else nombre
+
+
+def _carpeta_raiz(nombres: List[str], nombre_archivo: str) -> str:
+    """
+    Prefijo "CARPETA/" que envuelve todo el archivo, o "" si no lo hay
+
+    Solo se omite si contiene subcarpetas (CORPUS/ONDAS/...) o se llama como el
+    archivo (ONDAS.tar.gz con ONDAS/...): un archivo con una sola publicación
+    (ONDAS/...) conserva su carpeta, como en la forma de directorio.
+    """
+    partes = [nombre.split('/') for nombre in nombres]
+    if not partes or any(len(p) < 2 for p in partes):
+        return ""
+    primera = partes[0][0]
+    if any(p[0] != primera for p in partes):
+        return ""
+    if primera == nombre_archivo or any(len(p) > 2 for p in partes):
+        return primera + '/'
+    return ""
+
+
+def _decidir_raiz(nombre: str, es_carpeta: bool, primera: str, nombre_archivo: str) -> Optional[str]:
+    """
+    Carpeta raíz en flujo, con el criterio de _carpeta_raiz: "CARPETA/", "" o None si aún no se sabe
+
+    `primera` es la primera carpeta del primer miembro. Se sabe que no hay carpeta
+    raíz en cuanto aparece un archivo fuera de ella, y que la hay si se llama como
+    el archivo o en cuanto aparece algo dos niveles por debajo (CORPUS/ONDAS/...).
+    Si el archivo termina sin decidirlo (una sola publicación, ONDAS/...), no la hay.
+    """
+    partes = nombre.split('/')
+    if partes[0] != primera or (len(partes) == 1 and not es_carpeta):
+        return ""
+    if primera == nombre_archivo or len(partes) > 2 or (es_carpeta and len(partes) == 2):
+        return primera + '/'
+    return None
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Contextos de las ocurrencias, guardados como posiciones y no como texto
+
+Los analizadores guardaban, por cada adjetivo encontrado, el texto de los ±10
+tokens alrededor de "música" (doc[i-10:i+10].text): hasta cuatro copias de la
+misma cadena por mención, en memoria durante todo el corpus y en los resultados
+incrementales, aunque los informes no las escriben.
+
+Una ocurrencia es ahora [documento, inicio, fin]: documento es la huella del
+texto analizado (como entero) e inicio y fin delimitan el tramo de tokens de su
+Doc. CacheAnalisis guarda cada Doc con esa huella, de modo que el texto se
+recupera solo cuando un informe o la vista KWIC lo pide:
+
+    contextos = ContextosCorpus(analizador.analisis)
+    contextos.texto(ocurrencia)
+
+Si el Doc no se ha guardado (caché de análisis desactivada o sin escritura), la
+ocurrencia conserva además su texto: [documento, inicio, fin, texto]. Si la caché
+se ha vaciado después, el Doc ya no se puede recuperar: el contexto es None y
+ContextosCorpus.perdidos lo cuenta, para que los informes lo declaren.
+
+Vista KWIC de un adjetivo en la ventana de "música", desde los resultados
+guardados del re-análisis incremental de la ventana colocacional:
+
+    python3 contextos_corpus.py CORPUS LEMA [--maximo 20]
+
+Proyecto: LexiMus - Universidad de Salamanca
+"""
+
+import argparse
+import sys
+from collections import OrderedDict
+from typing import Optional
+
+CLAVE_DOCUMENTO = 'documento'   # clave en doc.user_data: huella del texto analizado
+VERSION_OCURRENCIAS = 2         # en la firma de los analizadores: los resultados con texto no se reutilizan
+CAPACIDAD_DOCS = 64             # Doc recuperados que se conservan en memoria
+ANCHO_KWIC = 50                 # caracteres a cada lado de la palabra en la vista KWIC
+
+
+def identificar(doc, huella: Optional[str]):
+    """Guarda en el Doc la huella con que está en la caché, o None si no se guardó (no se serializa)"""
+    doc.user_data[CLAVE_DOCUMENTO] = None if huella is None else int(huella, 16)
+    return doc
+
+
+def ocurrencia(doc, inicio: int, fin: int) -> list:
+    """
+    [documento, inicio, fin] del tramo doc[inicio:fin], con los límites recortados al Doc
+
+    Si el Doc no está en la caché de análisis, se añade el texto del tramo: sin él,
+    el contexto no se podría recuperar.
+    """
+    documento = doc.user_data.get(CLAVE_DOCUMENTO)
+    inicio, fin = max(0, inicio), min(len(doc), fin)
+    if documento is None:
+        return [None, inicio, fin, doc[inicio:fin].text]
+    return [documento, inicio, fin]
+
+
+class ContextosCorpus:
+    """Texto de las ocurrencias, desde los Doc guardados en la caché de análisis"""
+
+    def __init__(self, analisis, capacidad: int = CAPACIDAD_DOCS):
+        self.analisis = analisis
+        self.capacidad = capacidad
+        self._docs = OrderedDict()
+        self.perdidos = 0           # ocurrencias pedidas cuyo Doc ya no está en la caché
+
+    def doc(self, documento: Optional[int]):
+        if documento is None:
+            return None
+        if documento in self._docs:
+            self._docs.move_to_end(documento)
+            return self._docs[documento]
+        doc = self.analisis.cargar(f"{documento:032x}")
+        self._docs[documento] = doc
+        if len(self._docs) > self.capacidad:
+            self._docs.popitem(last=False)
+        return doc
+
+    def _doc_ocurrencia(self, ocurrencia: list):
+        doc = self.doc(ocurrencia[0])
+        if doc is None:
+            self.perdidos += 1
+        return doc
+
+    def texto(self, ocurrencia: list) -> Optional[str]:
+        """Texto del tramo, o None si su Doc ya no está en la caché"""
+        if len(ocurrencia) > 3:
+            return ocurrencia[3]
+        _, inicio, fin = ocurrencia
+        doc = self._doc_ocurrencia(ocurrencia)
+        return None if doc is None else doc[inicio:fin].text
+
+    def kwic(self, ocurrencia: list, lema: str, ancho: int = ANCHO_KWIC) -> Optional[str]:
+        """Línea KWIC del tramo centrada en la primera palabra con el lema"""
+        if len(ocurrencia) > 3:
+            # Sin Doc no se sabe dónde está el lema: se muestra el tramo entero
+            return ocurrencia[3]
+        _, inicio, fin = ocurrencia
+        doc = self._doc_ocurrencia(ocurrencia)
+        if doc is None:
+            return None
+        nodo = next((token for token in doc[inicio:fin] if token.lemma_.lower() == lema), None)
+        if nodo is None:
+            return doc[inicio:fin].text
+        izquierda = doc[inicio:nodo.i].text[-ancho:]
+        derecha = doc[nodo.i + 1:fin].text[:ancho]
+        return f"{izquierda:>{ancho}} [{nodo.text}] {derecha}"
+
+
+# ============================================================================
+# VISTA KWIC
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Contextos de un adjetivo en la ventana de 'música' (KWIC)")
+    parser.add_argument('corpus', help="Corpus: carpeta, paquete .corpus o archivo comprimido")
+    parser.add_argument('lema', help="Lema del adjetivo (en minúsculas)")
+    parser.add_argument('--maximo', type=int, default=20, help="Contextos que se muestran")
+    parser.add_argument('--perfil', default="dependencias",
+                        help="Perfil spaCy con que se analizó el corpus (perfiles_spacy.py)")
+    argumentos = parser.parse_args()
+
+    from analizador_ventana_colocacional import AnalizadorVentanaColocacional
+    from cargador_corpus import abrir_corpus, es_fuente_corpus
+    from manifiesto_corpus import CARPETA_RESULTADOS, _leer_json
+
+    if not es_fuente_corpus(argumentos.corpus):
+        print(f"❌ ERROR: El corpus no existe: {argumentos.corpus}")
+        sys.exit(1)
+
+    analizador = AnalizadorVentanaColocacional(perfil=argumentos.perfil)
+    ruta = abrir_corpus(argumentos.corpus).ruta_auxiliar(CARPETA_RESULTADOS) / f"{type(analizador).__name__}.json"
+    datos = _leer_json(ruta)
+    # Resultados de otra configuración (o con los contextos como texto): no valen
+    documentos = datos.get('documentos', {}) if datos.get('firma') == analizador.firma_configuracion() else {}
+    if not documentos:
+        print(f"❌ ERROR: No hay resultados vigentes en {ruta}: ejecuta antes el analizador")
+        sys.exit(1)
+
+    contextos = ContextosCorpus(analizador.analisis)
+    mostrados = 0
+    casos = (caso for resultado in documentos.values()
+             for caso in resultado['parcial'].get('contextos', {}).get(argumentos.lema, []))
+    for caso in casos:
+        linea = contextos.kwic(caso['ocurrencia'], argumentos.lema)
+        if linea is None:
+            continue
+        print(f"{caso['archivo'][-30:]:>30}  {linea}")
+        mostrados += 1
+        if mostrados >= argumentos.maximo:
+            break
+    if contextos.perdidos:
+        print(f"⚠️  {contextos.perdidos} contextos sin Doc en la caché de análisis "
+              f"(vaciada o borrada): vuelve a ejecutar el analizador para recuperarlos")
+
+
+if __name__ == "__main__":
+    main()
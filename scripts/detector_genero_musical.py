@@ -22,6 +22,10 @@ import sys
 from collections import Counter, defaultdict
 from datetime import datetime
 
+from cargador_corpus import (DocumentoArchivo, DocumentoCorpus, abrir_corpus,
+                             es_fuente_corpus, guardar_codificaciones)
+from normalizacion_corpus import texto_normalizado
+
 class DetectorGeneroMusical:
     def __init__(self, base_directory):
         """
@@ -268,12 +272,17 @@ class DetectorGeneroMusical:
         """
         Analiza un archivo de texto completo
 
+        Args:
+            filepath: ruta a un .txt o DocumentoCorpus (carpeta o paquete)
+
         Returns:
             dict: Resultados completos del análisis
         """
+        documento = filepath
+        if not isinstance(documento, DocumentoCorpus):
+            documento = DocumentoArchivo(filepath)
         try:
-            with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-                contenido = f.read()
+            contenido = texto_normalizado(documento).texto
 
             # Conteo de palabras
             palabras = len(contenido.split())
@@ -299,8 +308,8 @@ class DetectorGeneroMusical:
 
             # Resultados
             resultado = {
-                'archivo': os.path.basename(filepath),
-                'ruta': filepath,
+                'archivo': documento.nombre,
+                'ruta': str(documento),
                 'palabras': palabras,
                 'detecciones': {
                     'nombres': {
@@ -333,7 +342,7 @@ class DetectorGeneroMusical:
             return resultado
 
         except Exception as e:
-            print(f"❌ Error analizando {filepath}: {e}")
+            print(f"❌ Error analizando {documento}: {e}")
             return None
 
     def analizar_directorio(self, directorio=None):
@@ -341,20 +350,18 @@ class DetectorGeneroMusical:
         Analiza todos los archivos TXT en un directorio
 
         Args:
-            directorio (str): Ruta al directorio (usa base_directory si None)
+            directorio (str): Ruta al directorio, paquete .corpus o archivo comprimido
+                (usa base_directory si None)
         """
         if directorio is None:
             directorio = self.base_directory
 
         print(f"📂 Analizando directorio: {directorio}")
 
-        archivos_txt = []
-        for root, dirs, files in os.walk(directorio):
-            for file in files:
-                if file.endswith('.txt'):
-                    archivos_txt.append(os.path.join(root, file))
+        corpus = abrir_corpus(directorio)
+        n_archivos = corpus.contar()
 
-        print(f"📄 Encontrados {len(archivos_txt)} archivos TXT")
+        print(f"📄 Encontrados {n_archivos} archivos TXT")
 
         # Analizar cada archivo
         resultados_archivos = []
@@ -362,8 +369,8 @@ class DetectorGeneroMusical:
         total_fem = 0
         total_palabras = 0
 
-        for i, filepath in enumerate(archivos_txt, 1):
-            print(f"⚙️  Procesando {i}/{len(archivos_txt)}: {os.path.basename(filepath)}")
+        for i, filepath in enumerate(corpus.documentos(), 1):
+            print(f"⚙️  Procesando {i}/{n_archivos}: {filepath.nombre}")
 
             resultado = self.analizar_archivo(filepath)
             if resultado:
@@ -372,6 +379,8 @@ class DetectorGeneroMusical:
                 total_fem += resultado['totales']['menciones_femeninas']
                 total_palabras += resultado['palabras']
 
+        guardar_codificaciones()
+
         # Consolidar resultados
         self.resultados = {
             'metadata': {
@@ -1047,8 +1056,8 @@ def main():
         print(f"❌ ERROR: El directorio no existe: {directorio_base}")
         sys.exit(1)
 
-    if not os.path.isdir(directorio_base):
-        print(f"❌ ERROR: La ruta no es un directorio: {directorio_base}")
+    if not es_fuente_corpus(directorio_base):
+        print(f"❌ ERROR: La ruta no es un directorio, paquete .corpus ni archivo comprimido: {directorio_base}")
         sys.exit(1)
 
     print("🎵 DETECTOR AUTOMÁTICO DE GÉNERO EN PERSONAS MUSICALES")
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Detección de documentos casi duplicados (MinHash + LSH)
+
+Las transcripciones de ONDAS y las exportaciones de El Sol incluyen reescaneos
+y páginas solapadas del mismo número. Sin esta etapa se analizan y se cuentan
+dos veces, lo que infla las frecuencias de los informes.
+
+Procedimiento:
+1. Cada documento se reduce a sus shingles (secuencias de TAMANO_SHINGLE palabras)
+2. Firma MinHash de NUM_CASILLAS valores con un solo hash por shingle
+   (one-permutation hashing con densificación por rotación), en Python puro
+3. LSH: la firma se divide en BANDAS; dos documentos de la misma publicación
+   que coinciden en alguna banda son candidatos
+4. Los candidatos cuya similitud estimada (Jaccard) supera UMBRAL_SIMILITUD se
+   agrupan; de cada grupo se conserva el documento con más palabras
+
+Las firmas se guardan (.duplicados_corpus.json, junto al manifiesto) con la huella
+del contenido: en ejecuciones posteriores solo se leen los documentos nuevos o
+modificados.
+
+Uso:
+    python3 duplicados_corpus.py CORPUS [--umbral 0.7]
+
+Proyecto: LexiMus - Universidad de Salamanca
+"""
+
+import hashlib
+import re
+import sys
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from cargador_corpus import DocumentoCorpus, abrir_corpus, es_fuente_corpus
+from manifiesto_corpus import (NOMBRE_MANIFIESTO, ManifiestoCorpus, _escribir_json,
+                               _leer_json)
+
+NOMBRE_DUPLICADOS = '.duplicados_corpus.json'
+VERSION_DUPLICADOS = 1
+
+TAMANO_SHINGLE = 3      # palabras por shingle (3 tolera mejor los errores de OCR que 5)
+NUM_CASILLAS = 128      # longitud de la firma
+BANDAS = 32             # 32 bandas de 4 valores: candidatos desde Jaccard ≈ 0.4
+UMBRAL_SIMILITUD = 0.7  # similitud mínima para considerar duplicado
+MIN_SHINGLES = 50       # documentos más cortos no se comparan (firmas poco fiables)
+
+_VACIO = (1 << 64) - 1
+_PALABRA = re.compile(r'\w+')
+
+
+def shingles(texto: str, tamano: int = TAMANO_SHINGLE) -> Iterator[str]:
+    """Secuencias de `tamano` palabras consecutivas (en minúsculas)"""
+    palabras = _PALABRA.findall(texto.lower())
+    for i in range(len(palabras) - tamano + 1):
+        yield ' '.join(palabras[i:i + tamano])
+
+
+def firma_minhash(texto: str) -> Optional[List[int]]:
+    """
+    Firma MinHash del documento, o None si es demasiado corto
+
+    Cada shingle se resume con un único hash de 64 bits: los bits bajos eligen
+    la casilla y el resto es el valor que compite por el mínimo. Las casillas
+    vacías se rellenan con la siguiente casilla ocupada (a la derecha, circular)
+    más un desplazamiento que depende de la distancia.
+    """
+    minimos = [_VACIO] * NUM_CASILLAS
+    n = 0
+    for shingle in set(shingles(texto)):
+        h = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'little')
+        casilla, valor = h % NUM_CASILLAS, h // NUM_CASILLAS
+        if valor < minimos[casilla]:
+            minimos[casilla] = valor
+        n += 1
+    if n < MIN_SHINGLES:
+        return None
+
+    firma = list(minimos)
+    for i in range(NUM_CASILLAS):
+        if minimos[i] == _VACIO:
+            distancia = 1
+            while minimos[(i + distancia) % NUM_CASILLAS] == _VACIO:
+                distancia += 1
+            firma[i] = minimos[(i + distancia) % NUM_CASILLAS] + distancia * (_VACIO // NUM_CASILLAS)
+    return firma
+
+
+def similitud(firma_a: List[int], firma_b: List[int]) -> float:
+    """Estimación de la similitud de Jaccard entre dos documentos"""
+    return sum(1 for a, b in zip(firma_a, firma_b) if a == b) / NUM_CASILLAS
+
+
+class _Particion:
+    """Conjuntos disjuntos (union-find) para formar los grupos de duplicados"""
+
+    def __init__(self):
+        self.padre: Dict[str, str] = {}
+
+    def raiz(self, x: str) -> str:
+        self.padre.setdefault(x, x)
+        while self.padre[x] != x:
+            self.padre[x] = self.padre[self.padre[x]]
+            x = self.padre[x]
+        return x
+
+    def unir(self, a: str, b: str):
+        ra, rb = self.raiz(a), self.raiz(b)
+        if ra != rb:
+            self.padre[max(ra, rb)] = min(ra, rb)
+
+
+class DetectorDuplicados:
+    """
+    Firmas MinHash persistentes y grupos de casi duplicados de un corpus
+    """
+
+    def __init__(self, corpus, umbral: float = UMBRAL_SIMILITUD,
+                 manifiesto: Optional[ManifiestoCorpus] = None):
+        self.umbral = umbral
+        self.ruta = corpus.ruta_auxiliar(NOMBRE_DUPLICADOS)
+        self._manifiesto_propio = manifiesto is None
+        self.manifiesto = manifiesto or ManifiestoCorpus(corpus.ruta_auxiliar(NOMBRE_MANIFIESTO))
+
+        datos = _leer_json(self.ruta)
+        if datos.get('version') != VERSION_DUPLICADOS or datos.get('parametros') != self._parametros():
+            datos = {}
+        self.firmas: Dict[str, dict] = datos.get('firmas', {})
+        self.calculadas = 0
+
+    @staticmethod
+    def _parametros() -> list:
+        return [TAMANO_SHINGLE, NUM_CASILLAS, MIN_SHINGLES]
+
+    def firma(self, documento: DocumentoCorpus) -> Optional[List[int]]:
+        """Firma del documento; solo se lee si es nuevo o ha cambiado"""
+        entrada = self.manifiesto.entrada_vigente(documento)
+        guardada = self.firmas.get(documento.clave)
+        if entrada and guardada and guardada['huella'] == entrada['huella']:
+            return guardada['firma']
+
+        texto, huella = documento.leer_con_huella()
+        self.manifiesto.registrar(documento, huella, texto)
+        firma = firma_minhash(texto)
+        self.firmas[documento.clave] = {'huella': huella, 'firma': firma}
+        self.calculadas += 1
+        return firma
+
+    def grupos(self, documentos: Iterable[DocumentoCorpus]) -> List[List[str]]:
+        """
+        Grupos de casi duplicados (claves), cada uno encabezado por el documento
+        que se conserva: el de más palabras o, a igualdad, el de clave menor
+        """
+        firmas: Dict[str, List[int]] = {}
+        cubetas = defaultdict(list)
+        filas = NUM_CASILLAS // BANDAS
+        for documento in documentos:
+            firma = self.firma(documento)
+            if firma is None:
+                continue
+            firmas[documento.clave] = firma
+            for banda in range(BANDAS):
+                porcion = tuple(firma[banda * filas:(banda + 1) * filas])
+                cubetas[(documento.publicacion, banda, porcion)].append(documento.clave)
+
+        particion = _Particion()
+        comparados = set()
+        for claves in cubetas.values():
+            for i, a in enumerate(claves):
+                for b in claves[i + 1:]:
+                    if (a, b) in comparados:
+                        continue
+                    comparados.add((a, b))
+                    if similitud(firmas[a], firmas[b]) >= self.umbral:
+                        particion.unir(a, b)
+
+        miembros = defaultdict(list)
+        for clave in particion.padre:
+            miembros[particion.raiz(clave)].append(clave)
+
+        def orden(clave):
+            return (-self.manifiesto.archivos.get(clave, {}).get('palabras', 0), clave)
+
+        return sorted((sorted(grupo, key=orden) for grupo in miembros.values() if len(grupo) > 1),
+                      key=lambda grupo: grupo[0])
+
+    def duplicados(self, documentos: Iterable[DocumentoCorpus]) -> Dict[str, str]:
+        """{clave del duplicado: clave del documento que se conserva}"""
+        return {duplicado: grupo[0]
+                for grupo in self.grupos(documentos) for duplicado in grupo[1:]}
+
+    def guardar(self):
+        try:
+            _escribir_json(self.ruta, {'version': VERSION_DUPLICADOS,
+                                       'parametros': self._parametros(),
+                                       'firmas': self.firmas})
+        except OSError as e:
+            print(f"⚠️  No se pudieron guardar las firmas de duplicados: {e}")
+        if self._manifiesto_propio:
+            self.manifiesto.guardar()
+
+
+def detectar_duplicados(corpus, documentos: Optional[Iterable[DocumentoCorpus]] = None,
+                        umbral: float = UMBRAL_SIMILITUD,
+                        manifiesto: Optional[ManifiestoCorpus] = None) -> Dict[str, str]:
+    """
+    Duplicados entre `documentos` (por defecto, todo el corpus)
+
+    Pasar el mismo recorrido que usará el analizador, para que el documento
+    conservado de cada grupo sea uno que se va a analizar.
+
+    Returns:
+        {clave del duplicado: clave del documento que se conserva}
+    """
+    detector = DetectorDuplicados(corpus, umbral, manifiesto)
+    duplicados = detector.duplicados(corpus.documentos() if documentos is None else documentos)
+    detector.guardar()
+    print(f"  🔁 Duplicados: {len(duplicados)} documentos omitidos "
+          f"({detector.calculadas} firmas calculadas)")
+    return duplicados
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Uso: python3 duplicados_corpus.py CORPUS [--umbral 0.7]")
+        sys.exit(1)
+
+    ruta = sys.argv[1]
+    if not es_fuente_corpus(ruta):
+        print(f"❌ ERROR: El corpus no existe: {ruta}")
+        sys.exit(1)
+    umbral = UMBRAL_SIMILITUD
+    if '--umbral' in sys.argv[2:]:
+        umbral = float(sys.argv[sys.argv.index('--umbral') + 1])
+
+    corpus = abrir_corpus(ruta)
+    detector = DetectorDuplicados(corpus, umbral)
+    grupos = detector.grupos(corpus.documentos())
+    detector.guardar()
+
+    print(f"🔁 {len(grupos)} grupos de casi duplicados (umbral {umbral}):")
+    for grupo in grupos:
+        print(f"  ✓ {grupo[0]}")
+        for duplicado in grupo[1:]:
+            print(f"    ✗ {duplicado}")
+
+
+if __name__ == "__main__":
+    main()
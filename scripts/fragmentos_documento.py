@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Análisis por fragmentos de los documentos muy largos (límite nlp.max_length)
+
+Algunos números completos de ONDAS y de El Sol están transcritos en un único
+archivo. Analizar uno de ellos con nlp(texto) puede superar nlp.max_length y,
+sobre todo, dispara la memoria: el Doc entero y las matrices del parser crecen
+con el documento. Los textos de más de MAX_CARACTERES_FRAGMENTO caracteres se
+dividen en fragmentos que spaCy analiza por separado:
+
+- Cada fragmento tiene una zona propia, que termina en un límite de oración
+  (o, si no lo hay, en un espacio), y las zonas propias cubren el texto sin
+  solaparse
+- Alrededor de la zona propia se añaden SOLAPE_CARACTERES de contexto a cada
+  lado, también cortados en límite de oración: ninguna ventana alrededor de
+  "música" queda cortada en el borde de un fragmento
+- Los analizadores solo cuentan las menciones de la zona propia
+  (tokens_propios), de modo que el contexto compartido no se cuenta dos veces
+
+Cada Doc lleva en user_data su posición en el documento; posicion_documento()
+traduce la posición de un token a la del texto completo. CacheAnalisis.pipe()
+entrega los fragmentos en orden y uno a uno, y agrupar_fragmentos() los reúne por
+documento sin acumularlos: la memoria máxima depende del tamaño del fragmento, no
+del documento.
+
+Uso:
+    python3 fragmentos_documento.py ARCHIVO [--maximo 100000] [--analizar]
+        # fragmentos del archivo y, con --analizar, memoria máxima del análisis
+
+Proyecto: LexiMus - Universidad de Salamanca
+"""
+
+import argparse
+import bisect
+import re
+import sys
+from typing import Any, Iterable, Iterator, List, NamedTuple, Tuple
+
+MAX_CARACTERES_FRAGMENTO = 100_000   # muy por debajo del max_length de spaCy (1.000.000)
+SOLAPE_CARACTERES = 1_000            # contexto a cada lado de la zona propia
+
+CLAVE_FRAGMENTO = 'fragmento'        # clave en doc.user_data
+
+# Comienzo de oración: tras un signo de final seguido de espacio, o tras una línea en blanco
+_ORACION = re.compile(r'[.!?…][»"”)]*\s+|\n[ \t]*\n\s*')
+_ESPACIO = re.compile(r'\s+')
+
+
+class Fragmento(NamedTuple):
+    texto: str
+    inicio: int          # posición del fragmento en el documento
+    propio_inicio: int   # zona propia, en posiciones del fragmento
+    propio_fin: int
+    ultimo: bool
+
+
+def comienzos_oracion(texto: str) -> List[int]:
+    """Posiciones en que empieza una oración (sin contar la posición 0)"""
+    return [m.end() for m in _ORACION.finditer(texto)]
+
+
+def _corte(texto: str, limites: List[int], minimo: int, objetivo: int) -> int:
+    """
+    Posición de corte en [minimo, objetivo]: el último comienzo de oración, si no
+    el último espacio y, en último caso, el propio objetivo
+    """
+    i = bisect.bisect_right(limites, objetivo)
+    if i and limites[i - 1] >= minimo:
+        return limites[i - 1]
+    espacios = [m.end() for m in _ESPACIO.finditer(texto, minimo, objetivo)]
+    return espacios[-1] if espacios else objetivo
+
+
+def fragmentar(texto: str, maximo: int = MAX_CARACTERES_FRAGMENTO,
+               solape: int = SOLAPE_CARACTERES) -> Iterator[Fragmento]:
+    """Fragmentos de como mucho `maximo` caracteres; un texto corto es un solo fragmento"""
+    total = len(texto)
+    if total <= maximo:
+        yield Fragmento(texto, 0, 0, total, True)
+        return
+    propio_maximo = maximo - 4 * solape
+    if propio_maximo <= 0:
+        raise ValueError(f"El solape ({solape}) no cabe en fragmentos de {maximo} caracteres")
+
+    limites = comienzos_oracion(texto)
+    propio_inicio = 0
+    while propio_inicio < total:
+        if total - propio_inicio <= propio_maximo:
+            propio_fin = total
+        else:
+            propio_fin = _corte(texto, limites, propio_inicio + propio_maximo // 2,
+                                propio_inicio + propio_maximo)
+
+        if propio_inicio <= solape:
+            inicio = 0
+        else:
+            inicio = _corte(texto, limites, propio_inicio - 2 * solape, propio_inicio - solape)
+        if total - propio_fin <= solape:
+            fin = total
+        else:
+            fin = _corte(texto, limites, propio_fin + solape, min(total, propio_fin + 2 * solape))
+
+        yield Fragmento(texto[inicio:fin], inicio, propio_inicio - inicio,
+                        propio_fin - inicio, propio_fin == total)
+        propio_inicio = propio_fin
+
+
+def marcar(doc, fragmento: Fragmento):
+    """Guarda en el Doc su posición en el documento (no se serializa en la caché)"""
+    doc.user_data[CLAVE_FRAGMENTO] = (fragmento.inicio, fragmento.propio_inicio,
+                                      fragmento.propio_fin, fragmento.ultimo)
+    return doc
+
+
+def es_propio(token) -> bool:
+    """True si el token pertenece a la zona propia de su fragmento (o el Doc no es un fragmento)"""
+    posicion = token.doc.user_data.get(CLAVE_FRAGMENTO)
+    return posicion is None or posicion[1] <= token.idx < posicion[2]
+
+
+def tokens_propios(doc):
+    """Span de los tokens de la zona propia (todo el Doc si no es un fragmento)"""
+    posicion = doc.user_data.get(CLAVE_FRAGMENTO)
+    if posicion is None:
+        return doc[:]
+    inicio = bisect.bisect_left(doc, posicion[1], key=lambda token: token.idx)
+    fin = bisect.bisect_left(doc, posicion[2], lo=inicio, key=lambda token: token.idx)
+    return doc[inicio:fin]
+
+
+def es_ultimo_fragmento(doc) -> bool:
+    """True en el último fragmento de un documento (o si el Doc no es un fragmento)"""
+    posicion = doc.user_data.get(CLAVE_FRAGMENTO)
+    return posicion is None or posicion[3]
+
+
+def posicion_documento(token) -> int:
+    """Posición del token en el texto analizado completo"""
+    posicion = token.doc.user_data.get(CLAVE_FRAGMENTO)
+    return token.idx + (posicion[0] if posicion else 0)
+
+
+def agrupar_fragmentos(pares: Iterable[Tuple[Any, Any]]) -> Iterator[Tuple[Any, Iterator]]:
+    """
+    (doc, contexto) de CacheAnalisis.pipe() → (contexto, docs de sus fragmentos)
+
+    Los docs de cada documento se entregan en flujo: hay que recorrerlos antes de
+    pasar al siguiente documento. Cada documento termina en el Doc marcado como su
+    último fragmento (un Doc sin marcar es un documento entero), no en un cambio de
+    contexto: dos documentos seguidos con contextos iguales no se mezclan.
+    """
+    pares = iter(pares)
+    for doc, contexto in pares:
+        docs = _fragmentos_documento(doc, pares)
+        yield contexto, docs
+        # Fragmentos que quien consume no ha recorrido
+        for _ in docs:
+            pass
+
+
+def _fragmentos_documento(doc, pares: Iterator[Tuple[Any, Any]]) -> Iterator:
+    """El Doc dado y los siguientes de `pares` hasta el último fragmento de su documento"""
+    yield doc
+    while not es_ultimo_fragmento(doc):
+        siguiente = next(pares, None)
+        if siguiente is None:
+            return
+        doc = siguiente[0]
+        yield doc
+
+
+# ============================================================================
+# COMPROBACIÓN
+# ============================================================================
+
+def memoria_maxima_mb() -> float:
+    """Memoria residente máxima del proceso (Linux: ru_maxrss en KB)"""
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fragmentos de un documento largo")
+    parser.add_argument('archivo', help="Archivo de texto")
+    parser.add_argument('--maximo', type=int, default=MAX_CARACTERES_FRAGMENTO,
+                        help="Caracteres máximos por fragmento")
+    parser.add_argument('--analizar', action='store_true',
+                        help="Analizar los fragmentos con spaCy e informar de la memoria máxima")
+    argumentos = parser.parse_args()
+
+    try:
+        with open(argumentos.archivo, 'r', encoding='utf-8', errors='replace') as f:
+            texto = f.read()
+    except OSError as e:
+        print(f"❌ ERROR: {e}")
+        sys.exit(1)
+
+    fragmentos = list(fragmentar(texto, argumentos.maximo))
+    propios = sum(f.propio_fin - f.propio_inicio for f in fragmentos)
+    print(f"✓ {len(texto):,} caracteres en {len(fragmentos)} fragmentos "
+          f"(el mayor, {max(len(f.texto) for f in fragmentos):,}; zonas propias: {propios:,})")
+    if not argumentos.analizar:
+        return
+
+    from perfiles_spacy import cargar_modelo
+
+    nlp = cargar_modelo('dependencias')
+    base = memoria_maxima_mb()
+    palabras = 0
+    for doc in nlp.pipe(f.texto for f in fragmentos):
+        palabras += len(doc)
+    print(f"✓ {palabras:,} tokens analizados; memoria máxima {memoria_maxima_mb():,.0f} MB "
+          f"({base:,.0f} MB con el modelo cargado)")
+
+
+if __name__ == "__main__":
+    main()
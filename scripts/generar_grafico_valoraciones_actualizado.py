@@ -9,14 +9,11 @@ Autor: María Palacios Nieto - Universidad de Salamanca
 Actualizado: 10 Noviembre 2024
 """
 
-import matplotlib.pyplot as plt
-import numpy as np
+from recursos import numpy, pyplot
 
-# Configuración general
-plt.style.use('seaborn-v0_8-paper')
-plt.rcParams['font.family'] = 'DejaVu Sans'
-plt.rcParams['font.size'] = 11
-plt.rcParams['figure.dpi'] = 300
+# Configuración general (matplotlib se importa al dibujar)
+ESTILO = 'seaborn-v0_8-paper'
+PARAMETROS = {'font.family': 'DejaVu Sans', 'font.size': 11, 'figure.dpi': 300}
 
 def grafico_ratio_valoraciones_actualizado():
     """
@@ -26,6 +23,8 @@ def grafico_ratio_valoraciones_actualizado():
     2. Método Ventana ±5 palabras (original)
     3. Método Multinivel Mejorado (NUEVO - incluye términos relacionados)
     """
+    plt = pyplot(ESTILO, PARAMETROS)
+    np = numpy()
 
     fig, ax = plt.subplots(figsize=(14, 7))
 
@@ -139,6 +138,7 @@ def tabla_comparativa_metodos():
     """
     Tabla comparativa de los tres métodos
     """
+    plt = pyplot(ESTILO, PARAMETROS)
 
     fig, ax = plt.subplots(figsize=(16, 8))
     ax.axis('off')
@@ -6,15 +6,11 @@ Artículo: Construir la música legítima
 Autor: María Palacios Nieto - Universidad de Salamanca
 """
 
-import matplotlib.pyplot as plt
-import numpy as np
-import matplotlib.patches as mpatches
+from recursos import numpy, pyplot
 
-# Configuración general para todos los gráficos
-plt.style.use('seaborn-v0_8-paper')
-plt.rcParams['font.family'] = 'DejaVu Sans'
-plt.rcParams['font.size'] = 10
-plt.rcParams['figure.dpi'] = 300
+# Configuración general para todos los gráficos (matplotlib se importa al dibujar)
+ESTILO = 'seaborn-v0_8-paper'
+PARAMETROS = {'font.family': 'DejaVu Sans', 'font.size': 10, 'figure.dpi': 300}
 
 # ============================================================================
 # GRÁFICO 1: Ratio valoraciones positivas/negativas
@@ -22,6 +18,8 @@ plt.rcParams['figure.dpi'] = 300
 
 def grafico_ratio_valoraciones():
     """Gráfico de barras comparando valoraciones positivas vs. negativas"""
+    plt = pyplot(ESTILO, PARAMETROS)
+    np = numpy()
 
     fig, ax = plt.subplots(figsize=(10, 6))
 
@@ -80,6 +78,8 @@ def grafico_ratio_valoraciones():
 
 def grafico_presencia_generos():
     """Gráfico de barras horizontales: presencia de géneros populares"""
+    plt = pyplot(ESTILO, PARAMETROS)
+    np = numpy()
 
     fig, ax = plt.subplots(figsize=(10, 6))
 
@@ -128,6 +128,8 @@ def grafico_presencia_generos():
 
 def grafico_inversion_proporcional():
     """Gráfico de barras agrupadas: presencia real vs. presencia discursiva"""
+    plt = pyplot(ESTILO, PARAMETROS)
+    np = numpy()
 
     fig, ax = plt.subplots(figsize=(12, 7))
 
@@ -200,6 +202,8 @@ def grafico_inversion_proporcional():
 
 def grafico_musica_ligera_publicacion():
     """Gráfico circular: distribución de 'música ligera' por publicación"""
+    plt = pyplot(ESTILO, PARAMETROS)
+    np = numpy()
 
     fig, ax = plt.subplots(figsize=(10, 8))
 
@@ -241,6 +245,7 @@ def grafico_musica_ligera_publicacion():
 
 def grafico_coocurrencias():
     """Gráfico comparativo: menciones totales vs. co-ocurrencias con 'música'"""
+    plt = pyplot(ESTILO, PARAMETROS)
 
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
 
@@ -6,17 +6,14 @@ Artículo: Construir la música legítima
 Autor: María Palacios Nieto - Universidad de Salamanca
 """
 
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
-from matplotlib.patches import Rectangle
-import numpy as np
+from recursos import pyplot
 
-# Configuración
-plt.rcParams['font.family'] = 'DejaVu Sans'
-plt.rcParams['font.size'] = 11
+# Configuración (matplotlib se importa al dibujar)
+PARAMETROS = {'font.family': 'DejaVu Sans', 'font.size': 11}
 
 def crear_tabla_valoraciones():
     """Crea tabla de valoraciones como imagen JPG de alta calidad"""
+    plt = pyplot(parametros=PARAMETROS)
 
     fig, ax = plt.subplots(figsize=(14, 6))
     ax.axis('off')
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Índice de negaciones de un Doc: "¿hay una negación en los k tokens anteriores?" en O(1)
+
+El analizador de valoraciones comprobaba la negación de cada adjetivo evaluativo
+recorriendo hacia atrás `distancia` tokens y pasando cada lema a minúsculas
+(detectar_negacion_cercana). IndiceNegacion se construye una vez por Doc:
+- Sumas acumuladas de los tokens cuyo lema está en el léxico de negaciones: la
+  ventana [i - k, i] tiene alguna si suma[i + 1] - suma[i - k] > 0, para
+  cualquier k (cada nivel tiene el suyo)
+- Con dependencias=True, los núcleos de los que depende una negación por un
+  arco advmod o neg ("no" → "buena" en "la obra no fue buena"): la negación
+  alcanza a su núcleo aunque esté fuera de la ventana
+
+En el recorrido por tokens, el índice se construye al primer uso (los Doc sin
+adjetivos evaluativos no lo necesitan); en el recorrido por columnas, a partir
+de la máscara de negaciones (columnas_doc.py).
+
+Comprobación, sobre una muestra del corpus, de que la ventana del índice
+coincide con el recorrido hacia atrás y de cuántas negaciones añaden los arcos:
+
+    python3 indice_negacion.py CORPUS [--documentos 200]
+
+Proyecto: LexiMus - Universidad de Salamanca
+"""
+
+import argparse
+import itertools
+import sys
+from typing import Iterable, Set
+
+DEPENDENCIAS_NEGACION = ('advmod', 'neg')   # arcos por los que una negación alcanza a su núcleo
+
+
+class IndiceNegacion:
+    """Negaciones de un Doc por posición (sumas acumuladas) y por arco de dependencia"""
+
+    def __init__(self, doc, negaciones: Set[str], dependencias: bool = True):
+        self.doc = doc
+        self.negaciones = negaciones
+        self.dependencias = dependencias
+        self._sumas = None
+        self._nucleos = None
+
+    @classmethod
+    def de_columnas(cls, columnas, mascara, dependencias: bool = True) -> 'IndiceNegacion':
+        """Índice desde la máscara de negaciones de un ColumnasDoc"""
+        from recursos import numpy
+
+        np = numpy()
+        indice = cls(columnas.doc, set(), dependencias)
+        indice._sumas = np.concatenate(([0], np.cumsum(mascara))).tolist()
+        indice._nucleos = set()
+        if dependencias:
+            arcos = mascara & columnas.dependencia(*DEPENDENCIAS_NEGACION)
+            indice._nucleos = {int(columnas.cabeza[j]) for j in columnas.indices(arcos)
+                               if columnas.cabeza[j] != j}
+        return indice
+
+    def _construir(self):
+        sumas = [0]
+        nucleos = set()
+        for token in self.doc:
+            negacion = token.lemma_.lower() in self.negaciones
+            sumas.append(sumas[-1] + negacion)
+            if (negacion and self.dependencias and token.dep_ in DEPENDENCIAS_NEGACION
+                    and token.head.i != token.i):
+                nucleos.add(token.head.i)
+        self._sumas = sumas
+        self._nucleos = nucleos
+
+    def en_ventana(self, i: int, distancia: int) -> bool:
+        """True si hay una negación entre los `distancia` tokens anteriores a i o en i"""
+        if self._sumas is None:
+            self._construir()
+        return self._sumas[i + 1] - self._sumas[max(0, i - distancia)] > 0
+
+    def negado(self, i: int, distancia: int, nucleos: Iterable[int] = ()) -> bool:
+        """
+        Negación en la ventana de i o, con dependencias, dependiente de i o de
+        alguno de `nucleos` (el verbo de una predicación, por ejemplo)
+        """
+        if self.en_ventana(i, distancia):
+            return True
+        return self.dependencias and (i in self._nucleos or
+                                      any(n in self._nucleos for n in nucleos))
+
+
+# ============================================================================
+# COMPROBACIÓN FRENTE AL RECORRIDO HACIA ATRÁS
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Índice de negaciones frente al recorrido hacia atrás")
+    parser.add_argument('corpus', help="Corpus: carpeta, paquete .corpus o archivo comprimido")
+    parser.add_argument('--documentos', type=int, default=200,
+                        help="Documentos del corpus que se comparan")
+    argumentos = parser.parse_args()
+
+    from cargador_corpus import abrir_corpus, es_fuente_corpus
+    from normalizacion_corpus import texto_normalizado
+
+    if not es_fuente_corpus(argumentos.corpus):
+        print(f"❌ ERROR: El corpus no existe: {argumentos.corpus}")
+        sys.exit(1)
+
+    from analizador_valoraciones_critica_mejorado import (NEGACIONES,
+                                                          AnalizadorValoracionesMejorado)
+
+    analizador = AnalizadorValoracionesMejorado()
+    documentos = itertools.islice(abrir_corpus(argumentos.corpus).documentos(), argumentos.documentos)
+    adjetivos = diferencias = por_arcos = 0
+    for documento in documentos:
+        for doc in analizador.analisis.fragmentos(texto_normalizado(documento).texto):
+            indice = IndiceNegacion(doc, NEGACIONES)
+            for token in doc:
+                if token.pos_ != "ADJ":
+                    continue
+                adjetivos += 1
+                for distancia in analizador.distancias_negacion.values():
+                    recorrido = analizador.detectar_negacion_cercana(token, doc, distancia)
+                    diferencias += recorrido != indice.en_ventana(token.i, distancia)
+                por_arcos += (indice.negado(token.i, analizador.distancias_negacion[1])
+                              and not indice.en_ventana(token.i, analizador.distancias_negacion[1]))
+
+    print(f"✓ {adjetivos:,} adjetivos comparados en todas las distancias por nivel: "
+          f"{diferencias} diferencias con el recorrido hacia atrás")
+    print(f"  {por_arcos:,} adjetivos más, negados solo por un arco {'/'.join(DEPENDENCIAS_NEGACION)}")
+    if diferencias:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Manifiesto del corpus y re-análisis incremental
+
+El manifiesto (.manifiesto_corpus.json en la raíz del corpus, o junto al paquete
+si el corpus está empaquetado) registra por archivo:
+ruta relativa, publicación, tamaño, fecha de modificación, huella del contenido,
+número de palabras y los metadatos de metadatos_corpus.py (año, fecha, cabecera,
+número de la revista).
+
+Los analizadores guardan además el resultado parcial de cada documento
+(.resultados_incrementales/<Analizador>.json). En cada ejecución:
+- Si el archivo no ha cambiado (tamaño y fecha, o en su defecto la huella),
+  se reutiliza su resultado parcial sin leerlo ni analizarlo
+- Si es nuevo o ha cambiado, se analiza y se sustituye su resultado parcial
+- Los archivos eliminados desaparecen del manifiesto y de los agregados
+
+Los agregados finales son siempre la suma de los resultados parciales, de modo que
+añadir unos cientos de páginas de ONDAS solo cuesta el análisis de esas páginas.
+
+Proyecto: LexiMus - Universidad de Salamanca
+"""
+
+import json
+import os
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from cargador_corpus import DocumentoCorpus, guardar_codificaciones, huella_contenido
+from metadatos_corpus import extraer_metadatos
+
+NOMBRE_MANIFIESTO = '.manifiesto_corpus.json'
+CARPETA_RESULTADOS = '.resultados_incrementales'
+VERSION_MANIFIESTO = 2
+
+
+def _escribir_json(ruta: Path, datos: dict):
+    """Escritura atómica de un JSON (no deja archivos a medias si se interrumpe)"""
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    tmp = ruta.with_name(ruta.name + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, ensure_ascii=False)
+    os.replace(tmp, ruta)
+
+
+def _leer_json(ruta: Path) -> dict:
+    if not ruta.exists():
+        return {}
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        print(f"⚠️  {ruta} ilegible, se regenerará")
+        return {}
+
+
+# ============================================================================
+# MANIFIESTO
+# ============================================================================
+
+class ManifiestoCorpus:
+    """
+    Registro persistente de los archivos del corpus y de su contenido
+    """
+
+    def __init__(self, ruta_manifiesto):
+        self.ruta = Path(ruta_manifiesto)
+
+        datos = _leer_json(self.ruta)
+        if datos.get('version') != VERSION_MANIFIESTO:
+            datos = {}
+        self.archivos: Dict[str, dict] = datos.get('archivos', {})
+        self._vistos = set()
+        self._publicaciones_vistas = set()
+
+    def entrada_vigente(self, documento: DocumentoCorpus) -> Optional[dict]:
+        """Entrada registrada si el documento conserva tamaño y fecha (o huella)"""
+        entrada = self.archivos.get(documento.clave)
+        if not entrada:
+            return None
+        if documento.huella is not None:
+            return entrada if entrada['huella'] == documento.huella else None
+        if (entrada['tamano'] == documento.tamano
+                and entrada['mtime_ns'] == documento.mtime_ns):
+            return entrada
+        return None
+
+    def registrar(self, documento: DocumentoCorpus, huella: str, texto: str) -> dict:
+        """Registra (o actualiza) un documento a partir de su contenido ya leído"""
+        entrada = {
+            'ruta': documento.clave,
+            'publicacion': documento.publicacion,
+            'tamano': documento.tamano,
+            'mtime_ns': documento.mtime_ns,
+            'huella': huella,
+            'palabras': len(texto.split())
+        }
+        entrada.update(extraer_metadatos(documento.nombre, texto, documento.publicacion))
+        self.archivos[documento.clave] = entrada
+        return entrada
+
+    def metadatos(self, documento: DocumentoCorpus, texto: Optional[str] = None) -> dict:
+        """
+        Entrada del manifiesto de un documento (año, fecha, cabecera, palabras...)
+
+        Si el documento no ha cambiado se devuelve lo guardado sin examinar el texto;
+        si no, se lee (o se usa `texto` si ya se ha leído) y se registra.
+        """
+        entrada = self.entrada_vigente(documento)
+        if entrada is None:
+            if texto is None:
+                texto, huella = documento.leer_con_huella()
+            else:
+                huella = documento.huella or huella_contenido(texto.encode('utf-8'))
+            entrada = self.registrar(documento, huella, texto)
+        return entrada
+
+    def marcar_visto(self, clave: str, publicacion: str):
+        self._vistos.add(clave)
+        self._publicaciones_vistas.add(publicacion)
+
+    def podar(self) -> int:
+        """
+        Elimina del manifiesto los archivos que ya no existen en el corpus
+
+        Solo se consideran las publicaciones recorridas en esta ejecución, para que
+        procesar un subcorpus no borre las entradas de los demás.
+        """
+        eliminados = [c for c, entrada in self.archivos.items()
+                      if c not in self._vistos
+                      and entrada['publicacion'] in self._publicaciones_vistas]
+        for clave in eliminados:
+            del self.archivos[clave]
+        return len(eliminados)
+
+    def guardar(self):
+        try:
+            _escribir_json(self.ruta, {'version': VERSION_MANIFIESTO, 'archivos': self.archivos})
+        except OSError as e:
+            print(f"⚠️  No se pudo guardar el manifiesto {self.ruta}: {e}")
+
+
+# ============================================================================
+# RESULTADOS PARCIALES POR DOCUMENTO
+# ============================================================================
+
+def fusionar_valor(destino, valor):
+    """
+    Suma un resultado parcial sobre un acumulador del analizador
+
+    Counter → update, int/float → suma, list → extend,
+    dict/defaultdict → fusión recursiva por clave.
+    Devuelve el nuevo valor (necesario para los tipos inmutables).
+    """
+    if isinstance(destino, Counter):
+        destino.update(valor)
+        return destino
+    if isinstance(destino, dict):
+        for clave, sub_valor in valor.items():
+            if clave in destino or hasattr(destino, 'default_factory'):
+                destino[clave] = fusionar_valor(destino[clave], sub_valor)
+            else:
+                destino[clave] = sub_valor
+        return destino
+    if isinstance(destino, list):
+        destino.extend(valor)
+        return destino
+    return destino + valor
+
+
+def fusionar_parcial(analizador, parcial: dict):
+    """Suma el resultado parcial de un documento a los acumuladores del analizador"""
+    for campo, valor in parcial.items():
+        setattr(analizador, campo, fusionar_valor(getattr(analizador, campo), valor))
+
+
+def capturar_parcial(analizador, procesar: Callable[[], object], fusionar: bool = True) -> dict:
+    """
+    Ejecuta `procesar` sobre acumuladores vacíos y devuelve lo que ha producido
+
+    El analizador debe definir CAMPOS_ACUMULADOS y _reiniciar_acumuladores().
+    Los acumuladores originales se restauran y, si `fusionar`, se les suma el parcial.
+    """
+    campos = analizador.CAMPOS_ACUMULADOS
+    guardados = {campo: getattr(analizador, campo) for campo in campos}
+    analizador._reiniciar_acumuladores()
+    try:
+        procesar()
+        parcial = {campo: getattr(analizador, campo) for campo in campos}
+    finally:
+        for campo, valor in guardados.items():
+            setattr(analizador, campo, valor)
+    # Normalizar a tipos JSON para que el parcial recién calculado y el leído
+    # del disco sean idénticos
+    parcial = json.loads(json.dumps(parcial, ensure_ascii=False))
+    if fusionar:
+        fusionar_parcial(analizador, parcial)
+    return parcial
+
+
+class CorpusIncremental:
+    """
+    Procesa archivos del corpus reutilizando resultados de ejecuciones anteriores
+
+    Uso típico dentro de procesar_corpus():
+        corpus = abrir_corpus(directorio)
+        incremental = CorpusIncremental(corpus, self, self.firma_configuracion())
+        for documento in corpus.documentos(publicacion):
+            incremental.procesar(documento,
+                                 lambda texto: self.procesar_documento(texto, ...))
+        incremental.guardar()
+
+    Para analizar por lotes (nlp.pipe), pendientes() entrega solo los textos que
+    hay que analizar y completar() registra el resultado de cada uno (los documentos
+    muy largos llegan en varios fragmentos, fragmentos_documento.py):
+        analizados = analisis.pipe(incremental.pendientes(documentos))
+        for documento, docs in agrupar_fragmentos(analizados):
+            incremental.completar(documento, lambda: [self.procesar_doc(doc, ...) for doc in docs])
+    """
+
+    def __init__(self, corpus, analizador, firma: str, activo: bool = True):
+        self.analizador = analizador
+        self.activo = activo
+        self.manifiesto = ManifiestoCorpus(corpus.ruta_auxiliar(NOMBRE_MANIFIESTO))
+        self.ruta_resultados = (corpus.ruta_auxiliar(CARPETA_RESULTADOS) /
+                                f"{type(analizador).__name__}.json")
+        self.firma = firma
+
+        datos = _leer_json(self.ruta_resultados) if activo else {}
+        if datos.get('firma') != firma:
+            datos = {}
+        self.resultados: Dict[str, dict] = datos.get('documentos', {})
+
+        # Casi duplicados que no se suman a los agregados (duplicados_corpus.py)
+        self.duplicados: Dict[str, str] = {}
+        # Líneas repetidas que se eliminan antes de analizar (repeticiones_corpus.py)
+        self.repeticiones = None
+        # Filtro de documentos y párrafos ilegibles (calidad_ocr.py)
+        self.calidad = None
+        # Párrafos alrededor de los lemas objetivo del analizador (prefiltro_objetivo.py)
+        self.prefiltro = None
+
+        # Estadísticas de la ejecución
+        self.vistos = 0
+        self.reutilizados = 0
+        self.analizados = 0
+        self.omitidos = 0
+        # Descartes del filtro de calidad de todos los documentos vistos, también los
+        # reutilizados (se guardan con su resultado); los de los pendientes, hasta completar()
+        self.descartes_calidad = Counter()
+        self._descartes_pendientes: Dict[str, dict] = {}
+
+    def requiere_lectura(self, documento: DocumentoCorpus) -> bool:
+        """False si el documento se va a reutilizar u omitir sin leerlo (para la lectura anticipada)"""
+        if documento.clave in self.duplicados:
+            return False
+        if not self.activo:
+            return True
+        entrada = self.manifiesto.entrada_vigente(documento)
+        return not self._reutilizable(documento, entrada)
+
+    def _firma_limpieza(self, documento: DocumentoCorpus) -> Optional[str]:
+        partes = []
+        if self.repeticiones is not None:
+            partes.append(self.repeticiones.firma_documento(documento.clave) or '')
+        if self.calidad is not None:
+            partes.append(self.calidad.firma)
+        if self.prefiltro is not None:
+            partes.append(self.prefiltro.firma)
+        return '|'.join(partes) or None
+
+    def _reutilizable(self, documento: DocumentoCorpus, entrada: Optional[dict]) -> bool:
+        """El resultado guardado vale si no cambian ni el contenido ni las líneas eliminadas"""
+        previo = self.resultados.get(documento.clave)
+        return bool(self.activo and entrada and previo
+                    and previo['huella'] == entrada['huella']
+                    and previo.get('limpieza') == self._firma_limpieza(documento))
+
+    def _texto_pendiente(self, documento: DocumentoCorpus) -> Optional[str]:
+        """
+        Texto limpio que hay que analizar, o None si el documento se omite
+        (casi duplicado, ilegible) o se reutiliza su resultado anterior
+        """
+        clave = documento.clave
+        self.manifiesto.marcar_visto(clave, documento.publicacion)
+        self.vistos += 1
+        if clave in self.duplicados:
+            self.omitidos += 1
+            return None
+
+        entrada = self.manifiesto.entrada_vigente(documento)
+        texto = None
+        if entrada is None:
+            texto, huella = documento.leer_con_huella()
+            entrada = self.manifiesto.registrar(documento, huella, texto)
+
+        if self._reutilizable(documento, entrada):
+            fusionar_parcial(self.analizador, self.resultados[clave]['parcial'])
+            self.descartes_calidad.update(self.resultados[clave].get('calidad', {}))
+            self.reutilizados += 1
+            return None
+
+        if texto is None:
+            texto = documento.leer()
+        if self.repeticiones is not None:
+            texto = self.repeticiones.limpiar(texto, documento.publicacion)
+        if self.calidad is not None:
+            antes = self.calidad.contadores()
+            texto = self.calidad.filtrar(texto)
+            descartes = {k: v - antes[k] for k, v in self.calidad.contadores().items() if v != antes[k]}
+            self.descartes_calidad.update(descartes)
+            if texto is None:
+                # Documento ilegible: no se analiza ni aporta nada a los agregados
+                self.resultados[clave] = {'huella': entrada['huella'], 'parcial': {},
+                                          'limpieza': self._firma_limpieza(documento),
+                                          'calidad': descartes}
+                return None
+            if descartes:
+                self._descartes_pendientes[clave] = descartes
+        if self.prefiltro is not None:
+            texto = self.prefiltro.seleccionar(texto)
+        return texto
+
+    def pendientes(self, documentos: Iterable[DocumentoCorpus]) -> Iterator[Tuple[str, DocumentoCorpus]]:
+        """
+        Pares (texto, documento) de los documentos que hay que analizar
+
+        Los reutilizables se fusionan y los duplicados e ilegibles se omiten al
+        recorrerlos; los errores de lectura se informan y no detienen el recorrido.
+        Cada texto entregado debe cerrarse con completar().
+        """
+        for documento in documentos:
+            try:
+                texto = self._texto_pendiente(documento)
+            except Exception as e:
+                print(f"  ✗ Error en {documento.nombre}: {e}")
+                continue
+            if texto is not None:
+                yield texto, documento
+
+    def completar(self, documento: DocumentoCorpus, procesar: Callable[[], object]):
+        """Ejecuta el análisis de un documento pendiente y guarda su resultado parcial"""
+        parcial = capturar_parcial(self.analizador, procesar)
+        self.resultados[documento.clave] = {
+            'huella': self.manifiesto.archivos[documento.clave]['huella'],
+            'parcial': parcial,
+            'limpieza': self._firma_limpieza(documento)
+        }
+        descartes = self._descartes_pendientes.pop(documento.clave, None)
+        if descartes:
+            self.resultados[documento.clave]['calidad'] = descartes
+        self.analizados += 1
+
+    def procesar(self, documento: DocumentoCorpus, procesar: Callable[[str], object]) -> bool:
+        """
+        Procesa un documento o reutiliza su resultado parcial
+
+        Los casi duplicados (self.duplicados) no se analizan ni se suman.
+
+        Returns:
+            True si se ha reutilizado el resultado anterior u omitido el documento
+            (sin analizar)
+        """
+        texto = self._texto_pendiente(documento)
+        if texto is None:
+            return True
+        self.completar(documento, lambda: procesar(texto))
+        return False
+
+    def guardar(self):
+        """Persiste manifiesto y resultados, descartando archivos eliminados"""
+        eliminados = self.manifiesto.podar()
+        for clave in list(self.resultados):
+            if clave not in self.manifiesto.archivos:
+                del self.resultados[clave]
+
+        self.manifiesto.guardar()
+        guardar_codificaciones()
+        try:
+            _escribir_json(self.ruta_resultados, {'firma': self.firma, 'documentos': self.resultados})
+        except OSError as e:
+            print(f"⚠️  No se pudieron guardar los resultados incrementales: {e}")
+
+        print(f"  ↻ Incremental: {self.analizados} analizados, {self.reutilizados} reutilizados, "
+              f"{self.omitidos} duplicados omitidos, {eliminados} eliminados del manifiesto")
+        if self.repeticiones is not None:
+            print(f"  ✂ {self.repeticiones.lineas_eliminadas} líneas repetidas eliminadas antes del análisis")
+        if self.calidad is not None:
+            print(f"  🗑 Calidad OCR: {self.calidad.resumen()}")
+        if self.prefiltro is not None:
+            print(f"  🎯 Prefiltro: {self.prefiltro.resumen()}")
+
+
+def firma_configuracion(*partes) -> str:
+    """Firma de la configuración de un analizador (ventana, léxicos...)"""
+    texto = json.dumps([sorted(p) if isinstance(p, (set, frozenset)) else p for p in partes],
+                       ensure_ascii=False, sort_keys=True, default=str)
+    return huella_contenido(texto.encode('utf-8'))
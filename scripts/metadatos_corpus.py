@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Extracción rápida de metadatos (fecha, año, cabecera) de los documentos del corpus
+
+Estrategia:
+1. Nombre del archivo, según las convenciones de cada publicación:
+   - ONDAS:   1925_10_25_ONDAS.txt, 1927-01-30_ONDAS.txt
+   - El Sol:  1931-03-13_output.txt, 26.07.1931_output.txt
+   - España:  transcripcion_musical_espana_193_completa.txt (número de la revista)
+2. Si el nombre no trae fecha, búsqueda acotada en el encabezado del texto
+   (primeros LIMITE_ENCABEZADO caracteres), nunca en el texto completo
+
+El resultado se guarda en el manifiesto del corpus (manifiesto_corpus.py), de modo
+que en ejecuciones posteriores no se vuelve a examinar ningún texto.
+
+Proyecto: LexiMus - Universidad de Salamanca
+"""
+
+import re
+from typing import Optional
+
+LIMITE_ENCABEZADO = 500
+
+# Fechas en el nombre del archivo
+PATRON_FECHA_ISO = re.compile(r'(?<!\d)(?P<anio>(?:19|20)\d{2})[_\-.](?P<mes>\d{1,2})[_\-.](?P<dia>\d{1,2})(?!\d)')
+PATRON_FECHA_DMA = re.compile(r'(?<!\d)(?P<dia>\d{1,2})[_\-./](?P<mes>\d{1,2})[_\-./](?P<anio>(?:19|20)\d{2})(?!\d)')
+PATRON_ANIO = re.compile(r'(?<!\d)(19\d{2}|20\d{2})(?!\d)')
+PATRON_NUMERO_ESPANA = re.compile(r'espa(?:n|ñ)a_(?P<numero>\d{1,4})', re.IGNORECASE)
+
+# Cabecera a partir del nombre del archivo
+CABECERAS_NOMBRE = (
+    (re.compile(r'ondas', re.IGNORECASE), 'ONDAS'),
+    (re.compile(r'_output$', re.IGNORECASE), 'EL SOL'),
+    (re.compile(r'el[\s_-]?sol', re.IGNORECASE), 'EL SOL'),
+    (re.compile(r'espa(?:n|ñ)a', re.IGNORECASE), 'ESPAÑA'),
+)
+
+
+def _fecha_valida(anio: int, mes: int, dia: int) -> bool:
+    return 1 <= mes <= 12 and 1 <= dia <= 31
+
+
+def fecha_en_texto(texto: str) -> Optional[dict]:
+    """Primera fecha completa (AAAA-MM-DD o DD.MM.AAAA) de un fragmento"""
+    for patron in (PATRON_FECHA_ISO, PATRON_FECHA_DMA):
+        for m in patron.finditer(texto):
+            anio, mes, dia = int(m.group('anio')), int(m.group('mes')), int(m.group('dia'))
+            if _fecha_valida(anio, mes, dia):
+                return {'anio': anio, 'fecha': f"{anio:04d}-{mes:02d}-{dia:02d}"}
+    return None
+
+
+def cabecera_por_nombre(nombre: str) -> Optional[str]:
+    """Publicación deducida del nombre del archivo (sin extensión)"""
+    for patron, cabecera in CABECERAS_NOMBRE:
+        if patron.search(nombre):
+            return cabecera
+    return None
+
+
+def extraer_metadatos(nombre: str, texto: Optional[str] = None, publicacion: str = "") -> dict:
+    """
+    Metadatos de un documento: primero el nombre del archivo, después el encabezado
+
+    Args:
+        nombre: nombre del archivo ("1925_10_25_ONDAS.txt")
+        texto: contenido; solo se examinan sus primeros LIMITE_ENCABEZADO caracteres
+            y únicamente si el nombre no trae fecha
+        publicacion: publicación de origen (carpeta) si no se deduce del nombre
+
+    Returns:
+        dict con anio, fecha (ISO o None), numero (España), cabecera y
+        origen_fecha ('nombre', 'encabezado' o None)
+    """
+    base = nombre.rsplit('.', 1)[0] if '.' in nombre else nombre
+    metadatos = {
+        'anio': None,
+        'fecha': None,
+        'numero': None,
+        'cabecera': cabecera_por_nombre(base) or publicacion or None,
+        'origen_fecha': None
+    }
+
+    m = PATRON_NUMERO_ESPANA.search(base)
+    if m:
+        metadatos['numero'] = int(m.group('numero'))
+
+    fecha = fecha_en_texto(base)
+    if fecha:
+        metadatos.update(fecha, origen_fecha='nombre')
+        return metadatos
+
+    # El número de España no es un año: se elimina antes de buscar años en el nombre
+    anios = PATRON_ANIO.findall(PATRON_NUMERO_ESPANA.sub('', base))
+    if anios:
+        metadatos.update(anio=int(anios[0]), origen_fecha='nombre')
+        return metadatos
+
+    if texto:
+        encabezado = texto[:LIMITE_ENCABEZADO]
+        fecha = fecha_en_texto(encabezado)
+        if fecha:
+            metadatos.update(fecha, origen_fecha='encabezado')
+            return metadatos
+        anios = PATRON_ANIO.findall(encabezado)
+        if anios:
+            metadatos.update(anio=int(anios[0]), origen_fecha='encabezado')
+
+    return metadatos
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Capa de texto normalizado del corpus, calculada una vez por documento
+
+Las transcripciones OCR traen tildes descompuestas ("u" + U+0301), palabras
+partidas a final de línea ("mú-\\nsica") y espacios irregulares, que hacen fallar
+tanto a spaCy como a las expresiones regulares. La normalización:
+- une las palabras partidas por guion a final de línea y elimina guiones blandos
+- compone los caracteres (Unicode NFC)
+- reduce los espacios y tabuladores repetidos a un espacio y las líneas en blanco
+  a un único separador de párrafo ("\\n\\n"), conservando los saltos de línea
+
+El resultado se guarda en una caché indexada por la huella del contenido original
+(carpeta_cache('normalizado')), junto con las ediciones realizadas, que permiten
+traducir cualquier posición del texto normalizado a la del texto original.
+
+Proyecto: LexiMus - Universidad de Salamanca
+"""
+
+import json
+import os
+import re
+import unicodedata
+from bisect import bisect_right
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from cargador_corpus import DocumentoCorpus, carpeta_cache
+
+VERSION_NORMALIZACION = 1
+
+_BLANCO = r'[ \t\u00a0\f\v]'
+PATRON_EDICIONES = re.compile(
+    # Palabra partida a final de línea: "mú-\nsica" → "música"
+    r'(?P<guion>(?<=[\w\u0300-\u036f])[-\u00ad]' + _BLANCO + r'*\r?\n' + _BLANCO + r'*(?=[a-záéíóúüñ]))'
+    r'|(?P<suave>\u00ad)'
+    r'|(?P<parrafo>' + _BLANCO + r'*\r?\n(?:' + _BLANCO + r'*\r?\n)+' + _BLANCO + r'*)'
+    r'|(?P<linea>' + _BLANCO + r'*\r?\n' + _BLANCO + r'*)'
+    r'|(?P<espacio>' + _BLANCO + r'{2,}|[\t\u00a0\f\v])'
+    r'|(?P<combinado>.[\u0300-\u036f]+)'
+)
+_SUSTITUCIONES = {'guion': '', 'suave': '', 'parrafo': '\n\n', 'linea': '\n', 'espacio': ' '}
+
+
+class TextoNormalizado:
+    """
+    Texto normalizado con el mapa de posiciones al texto original
+
+    Las ediciones son tuplas (inicio_original, fin_original, inicio_normalizado,
+    longitud_normalizada): fuera de ellas ambos textos avanzan a la par.
+    """
+
+    def __init__(self, texto: str, ediciones: List[Tuple[int, int, int, int]],
+                 huella: Optional[str] = None):
+        self.texto = texto
+        self.ediciones = ediciones
+        self.huella = huella
+        self._inicios = [e[2] for e in ediciones]
+
+    def posicion_original(self, posicion: int) -> int:
+        """Posición en el texto original del carácter `posicion` del normalizado"""
+        k = bisect_right(self._inicios, posicion) - 1
+        if k < 0:
+            return posicion
+        inicio_orig, fin_orig, inicio_norm, longitud = self.ediciones[k]
+        if posicion < inicio_norm + longitud:
+            return inicio_orig
+        return fin_orig + (posicion - inicio_norm - longitud)
+
+    def tramo_original(self, inicio: int, fin: int) -> Tuple[int, int]:
+        """Tramo [inicio, fin) del texto original que corresponde al normalizado"""
+        if fin <= inicio:
+            posicion = self.posicion_original(inicio)
+            return posicion, posicion
+        return self.posicion_original(inicio), self.posicion_original(fin - 1) + self._ancho(fin - 1)
+
+    def _ancho(self, posicion: int) -> int:
+        """Caracteres originales que ocupa el carácter normalizado `posicion`"""
+        k = bisect_right(self._inicios, posicion) - 1
+        if k >= 0:
+            inicio_orig, fin_orig, inicio_norm, longitud = self.ediciones[k]
+            if posicion < inicio_norm + longitud:
+                # Sustitución de un tramo: su último carácter cubre el resto
+                return fin_orig - inicio_orig if posicion == inicio_norm + longitud - 1 else 1
+        return 1
+
+    def __str__(self):
+        return self.texto
+
+    def __len__(self):
+        return len(self.texto)
+
+
+def normalizar(texto: str) -> TextoNormalizado:
+    """Normaliza un texto OCR conservando el mapa de posiciones"""
+    partes = []
+    ediciones = []
+    anterior = 0
+    longitud = 0
+    for m in PATRON_EDICIONES.finditer(texto):
+        tipo = m.lastgroup
+        if tipo == 'combinado':
+            sustitucion = unicodedata.normalize('NFC', m.group())
+        else:
+            sustitucion = _SUSTITUCIONES[tipo]
+        if sustitucion == m.group():
+            # Sin cambios (un "\n" simple, una tilde ya compuesta): no es una edición
+            continue
+
+        partes.append(texto[anterior:m.start()])
+        longitud += m.start() - anterior
+        ediciones.append((m.start(), m.end(), longitud, len(sustitucion)))
+        partes.append(sustitucion)
+        longitud += len(sustitucion)
+        anterior = m.end()
+    partes.append(texto[anterior:])
+
+    normalizado = ''.join(partes)
+    if not unicodedata.is_normalized('NFC', normalizado):
+        # Composiciones fuera de las tildes comunes (poco frecuente): sin mapa fino
+        compuesto = unicodedata.normalize('NFC', normalizado)
+        ediciones = [(0, len(texto), 0, len(compuesto))]
+        normalizado = compuesto
+    return TextoNormalizado(normalizado, ediciones)
+
+
+# ============================================================================
+# CACHÉ POR HUELLA DEL CONTENIDO
+# ============================================================================
+
+class CacheNormalizacion:
+    """
+    Textos normalizados guardados por huella del contenido original
+
+    Un archivo JSON por documento (<carpeta>/<huella[:2]>/<huella>.json).
+    """
+
+    def __init__(self, carpeta=None):
+        self.carpeta = Path(carpeta) if carpeta else carpeta_cache('normalizado')
+        self.aciertos = 0
+        self.fallos = 0
+
+    def _ruta(self, huella: str) -> Path:
+        return self.carpeta / huella[:2] / f"{huella}.json"
+
+    def cargar(self, huella: str) -> Optional[TextoNormalizado]:
+        try:
+            with open(self._ruta(huella), 'r', encoding='utf-8') as f:
+                datos = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if datos.get('version') != VERSION_NORMALIZACION:
+            return None
+        return TextoNormalizado(datos['texto'], [tuple(e) for e in datos['ediciones']], huella)
+
+    def guardar(self, normalizado: TextoNormalizado):
+        ruta = self._ruta(normalizado.huella)
+        try:
+            ruta.parent.mkdir(parents=True, exist_ok=True)
+            tmp = ruta.with_name(ruta.name + '.tmp')
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'version': VERSION_NORMALIZACION, 'texto': normalizado.texto,
+                           'ediciones': normalizado.ediciones}, f, ensure_ascii=False)
+            os.replace(tmp, ruta)
+        except OSError as e:
+            print(f"⚠️  No se pudo guardar el texto normalizado en {ruta}: {e}")
+
+    def normalizado(self, documento: DocumentoCorpus, huella: Optional[str] = None) -> TextoNormalizado:
+        """
+        Texto normalizado de un documento
+
+        Si se conoce la huella (p. ej. por el manifiesto) y está en caché, el
+        documento no se lee; si no, se lee, se normaliza y se guarda.
+        """
+        huella = huella or documento.huella
+        if huella:
+            normalizado = self.cargar(huella)
+            if normalizado is not None:
+                self.aciertos += 1
+                return normalizado
+
+        texto, huella = documento.leer_con_huella()
+        normalizado = self.cargar(huella)
+        if normalizado is not None:
+            self.aciertos += 1
+            return normalizado
+
+        self.fallos += 1
+        normalizado = normalizar(texto)
+        normalizado.huella = huella
+        self.guardar(normalizado)
+        return normalizado
+
+
+# Instancia compartida por los scripts
+cache_normalizacion = CacheNormalizacion()
+
+
+def texto_normalizado(documento: DocumentoCorpus, huella: Optional[str] = None) -> TextoNormalizado:
+    """Texto normalizado de un documento, calculado una sola vez por contenido"""
+    return cache_normalizacion.normalizado(documento, huella)
+
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Paquete del corpus en un solo archivo con índice de desplazamientos
+
+Miles de .txt pequeños obligan a un rglob/open/read por documento, lo que es lento
+en carpetas de red. El paquete guarda todo el corpus en un único archivo:
+
+    [MAGIA (8 bytes)]
+    [texto UTF-8 del documento 1][texto del documento 2]...
+    [índice JSON: clave, publicación, profundidad, desplazamiento, longitud, metadatos]
+    [pie: desplazamiento del índice, longitud del índice, MAGIA]
+
+Los documentos se leen como porciones (memoryview) de un único mmap, sin copias.
+El texto se guarda ya decodificado en UTF-8, por lo que no hay detección de
+codificación al leer. La huella registrada es la del archivo original, de modo que
+el manifiesto y los resultados incrementales sirven igual para carpeta y paquete.
+
+El paquete crece solo por el final: al volver a empaquetar, los documentos nuevos o
+modificados se añaden tras el pie existente, seguidos de un índice y un pie nuevos.
+Nada de lo escrito se modifica: si la escritura se interrumpe, el último pie válido
+sigue en el archivo, el lector lo encuentra y la siguiente pasada descarta la cola
+incompleta. Las versiones antiguas y los índices anteriores quedan como espacio
+muerto hasta que se reconstruye con --nuevo (en un archivo temporal que sustituye
+al paquete al terminar).
+
+Uso:
+    python3 paquete_corpus.py empaquetar CARPETA_CORPUS salida.corpus [--nuevo]
+    python3 paquete_corpus.py info salida.corpus
+
+Proyecto: LexiMus - Universidad de Salamanca
+"""
+
+import fnmatch
+import json
+import mmap
+import os
+import struct
+import sys
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from cargador_corpus import CorpusDirectorio, DocumentoCorpus, guardar_codificaciones
+
+MAGIA = b'LXCORP01'
+PIE = struct.Struct('<QQ8s')  # desplazamiento_indice, longitud_indice, MAGIA
+VERSION_INDICE = 1
+
+
+def es_paquete(ruta) -> bool:
+    """Comprueba la firma inicial del archivo"""
+    try:
+        with open(ruta, 'rb') as f:
+            return f.read(len(MAGIA)) == MAGIA
+    except OSError:
+        return False
+
+
+def _pie_valido(mm, fin: int) -> Optional[Tuple[int, int]]:
+    """(desplazamiento, longitud) del índice si hay un pie coherente que termina en `fin`"""
+    if fin < len(MAGIA) + PIE.size:
+        return None
+    desplazamiento, longitud, magia = PIE.unpack_from(mm, fin - PIE.size)
+    if magia != MAGIA or desplazamiento < len(MAGIA) or desplazamiento + longitud + PIE.size != fin:
+        return None
+    return desplazamiento, longitud
+
+
+def _leer_indice(mm) -> Tuple[int, int, List[dict]]:
+    """
+    Devuelve (fin_de_datos, fin_del_paquete, entradas) a partir del último pie válido
+
+    Tras una escritura interrumpida, lo que sigue al último pie válido se ignora.
+    """
+    if len(mm) < len(MAGIA) + PIE.size:
+        raise ValueError("paquete demasiado corto")
+    fin = len(mm)
+    while fin > 0:
+        pie = _pie_valido(mm, fin)
+        if pie is not None:
+            desplazamiento, longitud = pie
+            try:
+                indice = json.loads(str(memoryview(mm)[desplazamiento:desplazamiento + longitud], 'utf-8'))
+            except ValueError:
+                indice = None
+            if indice is not None:
+                if indice.get('version') != VERSION_INDICE:
+                    raise ValueError(f"versión de índice no soportada: {indice.get('version')}")
+                return desplazamiento, fin, indice['documentos']
+        # Pie anterior: la cola es de una escritura interrumpida
+        posicion = mm.rfind(MAGIA, len(MAGIA), fin - 1)
+        fin = posicion + len(MAGIA) if posicion >= 0 else 0
+    raise ValueError("el paquete no tiene ningún pie válido; vuelva a empaquetar con --nuevo")
+
+
+# ============================================================================
+# LECTURA
+# ============================================================================
+
+class DocumentoPaquete(DocumentoCorpus):
+    """Documento leído como porción del mmap del paquete"""
+
+    def __init__(self, paquete: 'PaqueteCorpus', entrada: dict):
+        super().__init__(entrada['clave'], entrada['publicacion'])
+        self._paquete = paquete
+        self._entrada = entrada
+        self.tamano = entrada['tamano']
+        self.mtime_ns = entrada['mtime_ns']
+        self.huella = entrada['huella']
+
+    def bytes(self) -> memoryview:
+        """Contenido UTF-8 del documento sin copiarlo"""
+        inicio = self._entrada['desplazamiento']
+        return self._paquete.vista[inicio:inicio + self._entrada['longitud']]
+
+    def _leer(self) -> str:
+        return str(self.bytes(), 'utf-8')
+
+    def _leer_con_huella(self) -> Tuple[str, str]:
+        return self._leer(), self.huella
+
+    def __str__(self):
+        return f"{self._paquete.ruta}::{self.clave}"
+
+
+def _profundidad(entrada: dict) -> int:
+    """
+    Subcarpetas entre la carpeta de la publicación y el documento (0: directamente en ella)
+
+    Los paquetes anteriores no la guardan en el índice: se deduce de la clave.
+    """
+    if 'profundidad' in entrada:
+        return entrada['profundidad']
+    return max(0, entrada['clave'].count('/') - 1)
+
+
+class PaqueteCorpus:
+    """
+    Corpus empaquetado; misma interfaz que CorpusDirectorio
+    """
+
+    def __init__(self, ruta):
+        self.ruta = Path(ruta)
+        self._archivo = open(self.ruta, 'rb')
+        self._mm = mmap.mmap(self._archivo.fileno(), 0, access=mmap.ACCESS_READ)
+        self.vista = memoryview(self._mm)
+        self.fin_datos, _, self.entradas = _leer_indice(self._mm)
+
+    @property
+    def nombre(self) -> str:
+        return self.ruta.stem
+
+    def publicaciones(self) -> List[str]:
+        return sorted({e['publicacion'] for e in self.entradas})
+
+    def contiene(self, publicacion: str) -> bool:
+        return any(e['publicacion'] == publicacion for e in self.entradas)
+
+    @staticmethod
+    def _seleccionada(entrada: dict, publicacion: Optional[str], patron: str,
+                      recursivo: bool) -> bool:
+        """Mismo criterio que glob/rglob en la carpeta de la publicación (o en la raíz)"""
+        clave = entrada['clave']
+        if not fnmatch.fnmatch(clave.rsplit('/', 1)[-1], patron):
+            return False
+        if publicacion is None:
+            return recursivo or '/' not in clave
+        if entrada['publicacion'] != publicacion:
+            return False
+        return recursivo or _profundidad(entrada) == 0
+
+    def contar(self, publicacion: Optional[str] = None, patron: str = "*.txt",
+               recursivo: bool = True) -> int:
+        return sum(1 for e in self.entradas
+                   if self._seleccionada(e, publicacion, patron, recursivo))
+
+    def documentos(self, publicacion: Optional[str] = None, patron: str = "*.txt",
+                   recursivo: bool = True) -> Iterator[DocumentoCorpus]:
+        """Documentos en orden de índice, con los mismos `patron` y `recursivo` que la carpeta"""
+        for entrada in self.entradas:
+            if self._seleccionada(entrada, publicacion, patron, recursivo):
+                yield DocumentoPaquete(self, entrada)
+
+    def ruta_auxiliar(self, nombre: str) -> Path:
+        return self.ruta.with_name(self.ruta.name + nombre)
+
+    def cerrar(self):
+        self.vista.release()
+        self._mm.close()
+        self._archivo.close()
+
+
+# ============================================================================
+# ESCRITURA
+# ============================================================================
+
+def empaquetar(directorio, salida, nuevo: bool = False) -> Dict[str, int]:
+    """
+    Añade al paquete los documentos nuevos o modificados de una carpeta del corpus
+
+    Returns:
+        Estadísticas: añadidos, sin_cambios, eliminados, bytes_muertos
+    """
+    corpus = CorpusDirectorio(directorio)
+    salida = Path(salida)
+
+    stats = {'añadidos': 0, 'sin_cambios': 0, 'eliminados': 0, 'bytes_muertos': 0}
+    previas: Dict[str, dict] = {}
+    if salida.exists() and not nuevo:
+        if not es_paquete(salida):
+            raise ValueError(f"{salida} existe y no es un paquete de corpus")
+        with open(salida, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            fin_datos, fin_paquete, entradas = _leer_indice(mm)
+        previas = {e['clave']: e for e in entradas}
+        # El índice y el pie actuales se conservan (espacio muerto tras la pasada)
+        stats['bytes_muertos'] += fin_paquete - fin_datos
+        destino, modo = salida, 'r+b'
+    else:
+        # Reconstrucción completa en un temporal: el paquete anterior sigue válido hasta el final
+        fin_paquete = 0
+        destino, modo = salida.with_name(salida.name + '.tmp'), 'wb'
+
+    entradas_nuevas: List[dict] = []
+
+    with open(destino, modo) as f:
+        if modo == 'wb':
+            f.write(MAGIA)
+        else:
+            # Solo se descarta lo que siga al último pie válido (escritura interrumpida)
+            f.seek(fin_paquete)
+            f.truncate()
+
+        for doc in sorted(corpus.documentos(), key=lambda d: d.clave):
+            previa = previas.pop(doc.clave, None)
+            if (previa and previa['tamano'] == doc.tamano
+                    and previa['mtime_ns'] == doc.mtime_ns):
+                previa.setdefault('profundidad', _profundidad(previa))
+                entradas_nuevas.append(previa)
+                stats['sin_cambios'] += 1
+                continue
+
+            texto, huella = doc.leer_con_huella()
+            if previa and previa['huella'] == huella:
+                previa = dict(previa, tamano=doc.tamano, mtime_ns=doc.mtime_ns,
+                              profundidad=_profundidad(previa))
+                entradas_nuevas.append(previa)
+                stats['sin_cambios'] += 1
+                continue
+            if previa:
+                stats['bytes_muertos'] += previa['longitud']
+
+            datos = texto.encode('utf-8')
+            entradas_nuevas.append({
+                'clave': doc.clave,
+                'publicacion': doc.publicacion,
+                'profundidad': _profundidad({'clave': doc.clave}),
+                'desplazamiento': f.tell(),
+                'longitud': len(datos),
+                'tamano': doc.tamano,
+                'mtime_ns': doc.mtime_ns,
+                'huella': huella
+            })
+            f.write(datos)
+            stats['añadidos'] += 1
+
+        for previa in previas.values():
+            stats['eliminados'] += 1
+            stats['bytes_muertos'] += previa['longitud']
+
+        indice = json.dumps({'version': VERSION_INDICE, 'documentos': entradas_nuevas},
+                            ensure_ascii=False).encode('utf-8')
+        desplazamiento = f.tell()
+        f.write(indice)
+        # Datos e índice en disco antes del pie que los hace visibles
+        f.flush()
+        os.fsync(f.fileno())
+        f.write(PIE.pack(desplazamiento, len(indice), MAGIA))
+        f.flush()
+        os.fsync(f.fileno())
+
+    if destino != salida:
+        os.replace(destino, salida)
+    guardar_codificaciones()
+    return stats
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ('empaquetar', 'info'):
+        print("Uso:")
+        print("  python3 paquete_corpus.py empaquetar CARPETA_CORPUS salida.corpus [--nuevo]")
+        print("  python3 paquete_corpus.py info salida.corpus")
+        sys.exit(1)
+
+    if sys.argv[1] == 'empaquetar':
+        if len(sys.argv) < 4:
+            print("❌ Falta la ruta del paquete de salida")
+            sys.exit(1)
+        directorio, salida = sys.argv[2], sys.argv[3]
+        if not os.path.isdir(directorio):
+            print(f"❌ ERROR: El directorio no existe: {directorio}")
+            sys.exit(1)
+        stats = empaquetar(directorio, salida, nuevo='--nuevo' in sys.argv[4:])
+        print(f"✅ Paquete actualizado: {salida}")
+        print(f"   Añadidos: {stats['añadidos']}  |  Sin cambios: {stats['sin_cambios']}  |  "
+              f"Eliminados: {stats['eliminados']}")
+        if stats['bytes_muertos']:
+            print(f"   Espacio muerto acumulado en esta pasada: {stats['bytes_muertos']:,} bytes "
+                  f"(reconstruir con --nuevo para recuperarlo)")
+    else:
+        paquete = PaqueteCorpus(sys.argv[2])
+        print(f"📦 {paquete.ruta}: {len(paquete.entradas)} documentos, "
+              f"{paquete.fin_datos:,} bytes de texto")
+        for pub in paquete.publicaciones():
+            n = sum(1 for e in paquete.entradas if e['publicacion'] == pub)
+            print(f"   {pub}: {n} documentos")
+        paquete.cerrar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Perfiles de pipeline spaCy por analizador
+
+Todos los scripts cargaban es_core_news_md completo, con el reconocimiento de
+entidades (ner) incluido, aunque ninguno usa doc.ents; y los recuentos por
+ventana solo necesitan categoría y lema, no el análisis de dependencias. Cada
+analizador declara el perfil que necesita y el modelo se carga solo con esos
+componentes:
+
+- "dependencias": etiquetado, lematización y análisis de dependencias (sin ner)
+- "ventana": etiquetado y lematización; sin parser ni ner. Las oraciones las
+  marca el sentencizer basado en reglas
+- "completo": el pipeline del modelo tal cual (referencia para comparar)
+
+Como los componentes entran en la clave de cache_analisis.py, cada perfil tiene
+su propia caché de análisis.
+
+Uso:
+    python3 perfiles_spacy.py CORPUS [--documentos 50] [--perfiles ventana dependencias]
+        # palabras por segundo de cada perfil sobre los primeros documentos
+
+Proyecto: LexiMus - Universidad de Salamanca
+"""
+
+import argparse
+import itertools
+import sys
+import time
+from typing import Dict, Iterable
+
+from cargador_corpus import abrir_corpus, es_fuente_corpus
+from normalizacion_corpus import texto_normalizado
+
+MODELO = "es_core_news_md"
+
+PERFILES: Dict[str, dict] = {
+    'dependencias': {'excluir': ('ner',), 'sentencizer': False},
+    'ventana': {'excluir': ('parser', 'ner'), 'sentencizer': True},
+    'completo': {'excluir': (), 'sentencizer': False},
+}
+
+_modelos: Dict[str, object] = {}
+
+
+def cargar_modelo(perfil: str = 'dependencias', modelo: str = MODELO):
+    """Modelo spaCy con los componentes del perfil (uno por proceso y perfil)"""
+    import spacy
+
+    if perfil not in PERFILES:
+        raise ValueError(f"Perfil spaCy desconocido: {perfil} (disponibles: {', '.join(PERFILES)})")
+    clave = f"{modelo}:{perfil}"
+    if clave in _modelos:
+        return _modelos[clave]
+
+    configuracion = PERFILES[perfil]
+    print(f"Cargando modelo spaCy ({modelo}, perfil {perfil})...", flush=True)
+    try:
+        nlp = spacy.load(modelo, exclude=list(configuracion['excluir']))
+    except OSError:
+        print("ERROR: Modelo no encontrado. Instala con:")
+        print(f"  python -m spacy download {modelo}")
+        raise
+    if configuracion['sentencizer'] and not nlp.has_pipe('sentencizer'):
+        nlp.add_pipe('sentencizer', first=True)
+    nlp.meta['perfil'] = perfil
+    _modelos[clave] = nlp
+    return nlp
+
+
+def medir_rendimiento(nlp, textos: Iterable[str], lote: int = 32) -> Dict[str, float]:
+    """Documentos, palabras y palabras por segundo de nlp.pipe sobre `textos`"""
+    documentos = palabras = 0
+    inicio = time.perf_counter()
+    for doc in nlp.pipe(textos, batch_size=lote):
+        documentos += 1
+        palabras += len(doc)
+    segundos = time.perf_counter() - inicio
+    return {'documentos': documentos, 'palabras': palabras, 'segundos': segundos,
+            'palabras_por_segundo': palabras / segundos if segundos else 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rendimiento de cada perfil de pipeline spaCy")
+    parser.add_argument('corpus', help="Corpus: carpeta, paquete .corpus o archivo comprimido")
+    parser.add_argument('--documentos', type=int, default=50,
+                        help="Documentos del corpus que se analizan con cada perfil")
+    parser.add_argument('--perfiles', nargs='+', default=list(PERFILES), choices=list(PERFILES))
+    argumentos = parser.parse_args()
+
+    if not es_fuente_corpus(argumentos.corpus):
+        print(f"❌ ERROR: El corpus no existe: {argumentos.corpus}")
+        sys.exit(1)
+
+    documentos = itertools.islice(abrir_corpus(argumentos.corpus).documentos(), argumentos.documentos)
+    textos = [texto_normalizado(documento).texto for documento in documentos]
+
+    print(f"\n{'Perfil':<14} {'Componentes':<50} {'Palabras/s':>11}")
+    for perfil in argumentos.perfiles:
+        nlp = cargar_modelo(perfil)
+        medida = medir_rendimiento(nlp, textos)
+        print(f"{perfil:<14} {','.join(nlp.pipe_names):<50} {medida['palabras_por_segundo']:11,.0f}")
+    print(f"\n({len(textos)} documentos, análisis sin caché)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Procesos de análisis que comparten el modelo spaCy cargado una sola vez (fork)
+
+Con nlp.pipe(n_process=N) o con N scripts en paralelo, cada proceso carga su
+propio es_core_news_md: la memoria se multiplica por N y el arranque se retrasa.
+PoolAnalisis carga en el proceso principal el modelo y los léxicos de los
+analizadores (VALORACIONES_POSITIVAS, EXCLUSIONES, TERMINOS_MUSICALES... ya
+están en memoria al importar el analizador), congela el recolector de basura
+(gc.freeze, para que no toque esas páginas) y después crea los procesos con fork:
+todos comparten el modelo en copia en escritura.
+
+Cada proceso analiza documentos completos (análisis y extracción) y devuelve su
+resultado parcial, que el proceso principal suma como el del re-análisis
+incremental (manifiesto_corpus.py). El StringStore de cada proceso crece con
+cada texto nuevo; tras RECICLAR_DOCUMENTOS documentos el proceso se sustituye
+por otro recién creado desde el principal.
+
+Con procesos=1 (o si el análisis va a un servidor, servidor_analisis.py) todo
+ocurre en el proceso principal, con CacheAnalisis.pipe() por lotes.
+
+Si el analizador tiene caché de extracción (analizador.extraccion,
+cache_extraccion.py), las oraciones ya conocidas se quitan del texto antes del
+análisis en ambos casos.
+
+Proyecto: LexiMus - Universidad de Salamanca
+"""
+
+import gc
+import multiprocessing
+import os
+import signal
+from collections import deque
+from typing import Any, Callable, Iterable, Iterator, List, Tuple
+
+from cache_analisis import LOTE_DOCUMENTOS, PROCESOS
+from fragmentos_documento import agrupar_fragmentos
+from manifiesto_corpus import capturar_parcial, fusionar_parcial
+
+RECICLAR_DOCUMENTOS = 500   # documentos que analiza cada proceso antes de sustituirlo
+TAREAS_POR_PROCESO = 2      # documentos enviados por adelantado a cada proceso
+
+# Analizador del proceso principal, heredado por los procesos (fork)
+_analizador = None
+
+
+def _iniciar_proceso():
+    """Los acumuladores heredados no hacen falta: cada tarea devuelve solo su parcial"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)   # Ctrl+C lo atiende el proceso principal
+    _analizador._reiniciar_acumuladores()
+
+
+def _contadores(analizador) -> List[Tuple[Any, str]]:
+    """(objeto, atributo) de las estadísticas de las cachés de análisis y de extracción"""
+    contadores = [(analizador.analisis, atributo)
+                  for atributo in ('aciertos', 'fallos', 'palabras', 'segundos')]
+    if analizador.extraccion is not None:
+        contadores += [(analizador.extraccion, atributo)
+                       for atributo in analizador.extraccion.CONTADORES]
+    return contadores
+
+
+def _analizar_documento(texto: str, argumentos: tuple) -> Tuple[dict, tuple]:
+    """Parcial de un documento y lo que ha sumado a las estadísticas de las cachés"""
+    contadores = _contadores(_analizador)
+    antes = [getattr(objeto, atributo) for objeto, atributo in contadores]
+    if _analizador.extraccion is None:
+        procesar = lambda: _analizador.procesar_documento(texto, *argumentos)
+    else:
+        procesar = lambda: _analizador.extraccion.procesar_texto(texto, argumentos)
+    parcial = capturar_parcial(_analizador, procesar)
+    # El parcial ya está en el proceso principal: aquí no se acumula
+    _analizador._reiniciar_acumuladores()
+    despues = [getattr(objeto, atributo) for objeto, atributo in contadores]
+    return parcial, tuple(d - a for a, d in zip(antes, despues))
+
+
+class PoolAnalisis:
+    """
+    Reparte los documentos pendientes entre procesos que comparten el modelo
+
+    Uso dentro de procesar_corpus():
+        pool = PoolAnalisis(self, procesos)
+        for documento, procesar in pool.recorrer(pendientes, lambda d: (d.nombre, publicacion)):
+            incremental.completar(documento, procesar)
+        pool.cerrar()
+
+    `argumentos(documento)` da los argumentos de procesar_documento()/procesar_doc()
+    además del texto o el Doc.
+    """
+
+    def __init__(self, analizador, procesos: int = PROCESOS, lote: int = LOTE_DOCUMENTOS,
+                 reciclar: int = RECICLAR_DOCUMENTOS):
+        global _analizador
+
+        self.analizador = analizador
+        self.lote = lote
+        self.procesos = procesos if procesos > 0 else (os.cpu_count() or 1)
+        self._pool = None
+        if self.procesos <= 1:
+            return
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            print("⚠️  Este sistema no permite fork: el análisis se hace en un solo proceso")
+            return
+
+        from servidor_analisis import ClienteAnalisis
+
+        analisis = analizador.analisis   # carga el modelo en el proceso principal
+        if isinstance(analisis.nlp, ClienteAnalisis):
+            print("↔ El servidor de análisis analiza los textos: sin procesos adicionales")
+            return
+        # Componentes con carga diferida (tablas del lematizador...) se inicializan antes del fork
+        analisis.nlp("música")
+
+        _analizador = analizador
+        gc.collect()
+        gc.freeze()
+        self._pool = multiprocessing.get_context('fork').Pool(
+            self.procesos, initializer=_iniciar_proceso, maxtasksperchild=reciclar
+        )
+        print(f"⚙ {self.procesos} procesos de análisis (modelo compartido; "
+              f"se renuevan cada {reciclar} documentos)", flush=True)
+
+    @property
+    def activo(self) -> bool:
+        return self._pool is not None
+
+    def recorrer(self, pendientes: Iterable[Tuple[str, Any]],
+                 argumentos: Callable[[Any], tuple]) -> Iterator[Tuple[Any, Callable[[], object]]]:
+        """
+        (documento, procesar) por cada (texto, documento) pendiente, en el orden de entrada
+
+        procesar() suma el resultado del documento a los acumuladores del
+        analizador (para CorpusIncremental.completar) y lanza la excepción del
+        análisis si lo ha habido.
+        """
+        if self._pool is None:
+            analizados = self.analizador.analisis.pipe(self._separar(pendientes, argumentos),
+                                                       batch_size=self.lote)
+            for (documento, argumentos_doc, separacion), docs in agrupar_fragmentos(analizados):
+                yield documento, self._procesar_docs(docs, argumentos_doc, separacion)
+            return
+
+        # Los documentos se leen en este proceso y se envían con antelación
+        # limitada: ni se acumulan textos en memoria ni se lee desde otro hilo
+        enviados = deque()
+        for texto, documento in pendientes:
+            tarea = self._pool.apply_async(_analizar_documento, (texto, argumentos(documento)))
+            enviados.append((documento, tarea))
+            if len(enviados) >= self.procesos * TAREAS_POR_PROCESO:
+                documento, tarea = enviados.popleft()
+                yield documento, self._recibir(tarea)
+        while enviados:
+            documento, tarea = enviados.popleft()
+            yield documento, self._recibir(tarea)
+
+    def _separar(self, pendientes: Iterable[Tuple[str, Any]],
+                 argumentos: Callable[[Any], tuple]) -> Iterator[Tuple[str, tuple]]:
+        """(texto, (documento, argumentos, separación)), sin las oraciones ya extraídas"""
+        extraccion = self.analizador.extraccion
+        for texto, documento in pendientes:
+            argumentos_doc = argumentos(documento)
+            if extraccion is None:
+                yield texto, (documento, argumentos_doc, None)
+            else:
+                separacion = extraccion.separar(texto, argumentos_doc)
+                yield separacion.texto, (documento, argumentos_doc, separacion)
+
+    def _procesar_docs(self, docs: Iterator, argumentos: tuple, separacion) -> Callable[[], object]:
+        if separacion is None:
+            return lambda: [self.analizador.procesar_doc(doc, *argumentos) for doc in docs]
+        return lambda: self.analizador.extraccion.procesar(separacion, docs, argumentos)
+
+    def _recibir(self, tarea) -> Callable[[], object]:
+        def procesar():
+            parcial, estadisticas = tarea.get()
+            fusionar_parcial(self.analizador, parcial)
+            for (objeto, atributo), valor in zip(_contadores(self.analizador), estadisticas):
+                setattr(objeto, atributo, getattr(objeto, atributo) + valor)
+        return procesar
+
+    def cerrar(self):
+        if self._pool is None:
+            return
+        self._pool.close()
+        self._pool.join()
+        self._pool = None
+        gc.unfreeze()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prefiltro de párrafos: solo se analiza el texto cercano a "música" y a los términos musicales
+
+La mayor parte de cada página de El Sol no trata de música, pero los analizadores
+solo miran los tokens a ±5-15 posiciones de un lema objetivo ("música" o uno de
+TERMINOS_MUSICALES). Antes de spaCy, una búsqueda de las formas superficiales
+(sin distinguir mayúsculas ni tildes) marca los párrafos con alguna mención; a
+spaCy solo llegan esos párrafos y sus vecinos, ampliados hasta cubrir
+MARGEN_CARACTERES a cada lado para que las ventanas de contexto no queden
+recortadas.
+
+Las formas son todas las que el lematizador puede llevar a un lema objetivo:
+género y número (compositor → compositora, compositoras, compositores) y, si está
+instalado spacy-lookups-data, las que generan sus reglas de sufijos y excepciones
+del español invertidas. Una forma de más solo amplía la selección; una de menos
+cambiaría los resultados.
+
+Los párrafos son los bloques separados por una línea en blanco del texto
+normalizado (normalizacion_corpus.py). La comprobación compara, sobre una muestra,
+el análisis de cada mención en el documento completo y en el prefiltrado:
+
+    python3 prefiltro_objetivo.py CORPUS [--documentos 30] [--terminos]
+
+Proyecto: LexiMus - Universidad de Salamanca
+"""
+
+import argparse
+import itertools
+import re
+import sys
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterable, List, Set, Tuple
+
+from cargador_corpus import abrir_corpus, es_fuente_corpus, huella_contenido
+
+VECINOS = 1                # párrafos que acompañan, como mínimo, a cada párrafo con menciones
+MARGEN_CARACTERES = 200    # contexto mínimo a cada lado de un párrafo con menciones
+VENTANA_COMPROBACION = 15  # tokens a cada lado de una mención que se comparan
+
+_PARRAFO = re.compile(r'\n[ \t]*\n')
+
+
+def _sin_tildes(texto: str) -> str:
+    """Minúsculas sin diacríticos: "MÚSICA" y "musica" se buscan igual"""
+    descompuesto = unicodedata.normalize('NFD', texto.lower())
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def _flexiones(base: str) -> Set[str]:
+    """Género y número de un lema sin tildes (autor → autora, autoras, autores)"""
+    formas = {base, base + 's', base + 'es'}
+    if base.endswith('z'):
+        formas.add(base[:-1] + 'ces')
+    if base.endswith('o'):
+        # maestro → maestra, maestras
+        formas.update((base[:-1] + 'a', base[:-1] + 'as'))
+    elif base.endswith(('or', 'on', 'in', 'an', 'es')):
+        # compositor → compositora, campeón → campeona, francés → francesa
+        formas.update((base + 'a', base + 'as'))
+    return formas
+
+
+@lru_cache(maxsize=None)
+def _tablas_lematizador() -> Tuple[List[Tuple[str, str]], Dict[str, Set[str]]]:
+    """
+    Reglas de sufijos (forma, lema) y excepciones (lema → formas) del lematizador español
+
+    Vienen de spacy-lookups-data; sin el paquete (o sin spaCy) quedan vacías y solo
+    se usan las flexiones de _flexiones().
+    """
+    try:
+        from spacy.lookups import load_lookups
+        tablas = load_lookups('es', ['lemma_rules', 'lemma_exc', 'lemma_lookup'], strict=False)
+    except (ImportError, ValueError, OSError):
+        return [], {}
+
+    reglas = set()
+    if tablas.has_table('lemma_rules'):
+        for reglas_categoria in tablas.get_table('lemma_rules').values():
+            reglas.update((_sin_tildes(forma), _sin_tildes(lema)) for forma, lema in reglas_categoria)
+    excepciones: Dict[str, Set[str]] = {}
+
+    def excepcion(forma: str, lema: str):
+        excepciones.setdefault(_sin_tildes(lema), set()).add(_sin_tildes(forma))
+
+    if tablas.has_table('lemma_exc'):
+        for excepciones_categoria in tablas.get_table('lemma_exc').values():
+            for forma, lemas_forma in excepciones_categoria.items():
+                for lema in lemas_forma:
+                    excepcion(forma, lema)
+    if tablas.has_table('lemma_lookup'):
+        for forma, lema in tablas.get_table('lemma_lookup').items():
+            excepcion(forma, lema)
+    return sorted(reglas), excepciones
+
+
+def formas_superficie(lemas: Iterable[str]) -> Set[str]:
+    """Formas de cada lema que el lematizador puede reconocer, sin tildes"""
+    reglas, excepciones = _tablas_lematizador()
+    formas = set()
+    for lema in lemas:
+        base = _sin_tildes(lema)
+        formas.update(_flexiones(base))
+        formas.update(excepciones.get(base, ()))
+        # Reglas de sufijos invertidas: la forma que la regla convierte en este lema
+        for sufijo_forma, sufijo_lema in reglas:
+            if base.endswith(sufijo_lema) and len(base) > len(sufijo_lema):
+                formas.add(base[:len(base) - len(sufijo_lema)] + sufijo_forma)
+    return formas
+
+
+class PrefiltroObjetivo:
+    """
+    Selecciona los párrafos con menciones de los lemas objetivo y su contexto
+
+    Estadísticas de la ejecución: documentos, caracteres_originales,
+    caracteres_seleccionados.
+    """
+
+    def __init__(self, lemas: Iterable[str], vecinos: int = VECINOS,
+                 margen: int = MARGEN_CARACTERES):
+        self.lemas = frozenset(lemas)
+        self.vecinos = vecinos
+        self.margen = margen
+        formas = sorted(formas_superficie(self.lemas), key=len, reverse=True)
+        self.patron = re.compile(r'\b(?:' + '|'.join(map(re.escape, formas)) + r')\b')
+        # Cambia si cambian las formas buscadas o el contexto conservado (invalida resultados guardados)
+        self.firma = huella_contenido(repr((sorted(formas), vecinos, margen)).encode('utf-8'))
+
+        self.documentos = 0
+        self.caracteres_originales = 0
+        self.caracteres_seleccionados = 0
+
+    def _ampliar(self, parrafos: List[str], indice: int, paso: int) -> List[int]:
+        """Párrafos vecinos en una dirección hasta VECINOS párrafos y el margen de caracteres"""
+        vecinos = []
+        caracteres = 0
+        j = indice + paso
+        while 0 <= j < len(parrafos) and (len(vecinos) < self.vecinos or caracteres < self.margen):
+            vecinos.append(j)
+            caracteres += len(parrafos[j])
+            j += paso
+        return vecinos
+
+    def seleccionar(self, texto: str) -> str:
+        """Párrafos con menciones y su contexto, en el orden original"""
+        parrafos = _PARRAFO.split(texto)
+        conservar = set()
+        for i, parrafo in enumerate(parrafos):
+            if self.patron.search(_sin_tildes(parrafo)):
+                conservar.add(i)
+                conservar.update(self._ampliar(parrafos, i, -1))
+                conservar.update(self._ampliar(parrafos, i, 1))
+
+        if len(conservar) == len(parrafos):
+            seleccion = texto
+        else:
+            seleccion = '\n\n'.join(parrafos[i] for i in sorted(conservar))
+        self.documentos += 1
+        self.caracteres_originales += len(texto)
+        self.caracteres_seleccionados += len(seleccion)
+        return seleccion
+
+    def resumen(self) -> str:
+        porcentaje = (100 * self.caracteres_seleccionados / self.caracteres_originales
+                      if self.caracteres_originales else 0.0)
+        return (f"{self.caracteres_seleccionados:,} de {self.caracteres_originales:,} caracteres "
+                f"enviados a spaCy ({porcentaje:.1f}%) en {self.documentos} documentos")
+
+
+# ============================================================================
+# COMPROBACIÓN FRENTE AL ANÁLISIS COMPLETO
+# ============================================================================
+
+def huellas_menciones(doc, lemas: Set[str], ventana: int = VENTANA_COMPROBACION) -> Counter:
+    """
+    Análisis de cada mención y de los tokens a ±ventana, en posiciones relativas
+
+    Dos análisis dan los mismos resultados en los analizadores si coinciden estas
+    huellas: texto, lema, categoría, dependencia y núcleo de cada token.
+    """
+    huellas = Counter()
+    for token in doc:
+        if token.lemma_.lower() not in lemas:
+            continue
+        tramo = doc[max(0, token.i - ventana):min(len(doc), token.i + ventana + 1)]
+        huellas[tuple((t.i - token.i, t.text, t.lemma_, t.pos_, t.dep_, t.head.i - token.i)
+                      for t in tramo)] += 1
+    return huellas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Comprueba el prefiltro frente al análisis completo")
+    parser.add_argument('corpus', help="Corpus: carpeta, paquete .corpus o archivo comprimido")
+    parser.add_argument('--documentos', type=int, default=30,
+                        help="Documentos de la muestra")
+    parser.add_argument('--terminos', action='store_true',
+                        help="Incluir TERMINOS_MUSICALES (analizador de valoraciones)")
+    argumentos = parser.parse_args()
+
+    if not es_fuente_corpus(argumentos.corpus):
+        print(f"❌ ERROR: El corpus no existe: {argumentos.corpus}")
+        sys.exit(1)
+
+    from normalizacion_corpus import texto_normalizado
+    from perfiles_spacy import cargar_modelo
+
+    lemas = {'música'}
+    if argumentos.terminos:
+        from analizador_valoraciones_critica_mejorado import TERMINOS_MUSICALES
+        lemas |= TERMINOS_MUSICALES
+    prefiltro = PrefiltroObjetivo(lemas)
+    nlp = cargar_modelo('dependencias')
+
+    iguales = 0
+    diferencias = []
+    documentos = itertools.islice(abrir_corpus(argumentos.corpus).documentos(), argumentos.documentos)
+    for documento in documentos:
+        texto = texto_normalizado(documento).texto
+        completo = huellas_menciones(nlp(texto), lemas)
+        filtrado = huellas_menciones(nlp(prefiltro.seleccionar(texto)), lemas)
+        if completo == filtrado:
+            iguales += 1
+        else:
+            diferencias.append((documento.clave, sum((completo - filtrado).values()),
+                                sum((filtrado - completo).values())))
+
+    print(f"🎯 Prefiltro: {prefiltro.resumen()}")
+    print(f"  ✓ {iguales} documentos con el mismo análisis de todas las menciones")
+    for clave, faltan, sobran in diferencias:
+        print(f"  ✗ {clave}: {faltan} menciones del análisis completo sin equivalente "
+              f"({sobran} del prefiltrado)")
+
+
+if __name__ == "__main__":
+    main()
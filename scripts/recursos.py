@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Recursos pesados cargados en el primer uso, compartidos por todos los scripts
+
+Cargar es_core_news_md o importar pandas, plotly o matplotlib cuesta varios
+segundos. Si se hace al importar un script, también lo pagan un error en los
+argumentos, un --help o importar una función auxiliar desde otro script. Los
+scripts piden aquí esos recursos en el momento de usarlos, y cada uno se carga una
+sola vez por proceso:
+
+- analisis_spacy(perfil): CacheAnalisis sobre el modelo del perfil (perfiles_spacy.py),
+  o sobre el servidor local del perfil si está en marcha (servidor_analisis.py)
+- pandas(), numpy(), plotly(submodulo), pyplot(estilo, parametros)
+
+Comprobación de regresiones (importar cada script no debe cargar nada pesado ni
+tardar más de LIMITE_IMPORTACION segundos):
+
+    python3 recursos.py --comprobar-importacion
+
+Proyecto: LexiMus - Universidad de Salamanca
+"""
+
+import ast
+import importlib
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, Optional
+
+# Paquetes que ningún script debe importar al cargarse
+MODULOS_PESADOS = ('spacy', 'thinc', 'pandas', 'numpy', 'plotly', 'matplotlib')
+
+# Scripts cuyas funciones se importan desde otros o se ejecutan con argumentos
+SCRIPTS_LIGEROS = (
+    'analiza_musica', 'analizador_valoraciones_critica_mejorado',
+    'analizador_ventana_colocacional', 'analizador_ventana_rapido',
+    'cache_analisis', 'cache_extraccion', 'calidad_ocr', 'cargador_corpus', 'columnas_doc',
+    'contextos_corpus', 'detector_genero_musical',
+    'duplicados_corpus', 'fragmentos_documento', 'generar_grafico_valoraciones_actualizado',
+    'indice_negacion',
+    'generar_graficos', 'generar_tabla_valoraciones', 'manifiesto_corpus', 'metadatos_corpus',
+    'normalizacion_corpus', 'paquete_corpus', 'perfiles_spacy', 'pool_analisis',
+    'prefiltro_objetivo',
+    'repeticiones_corpus', 'servidor_analisis', 'tabla_lemas',
+)
+LIMITE_IMPORTACION = 0.5   # segundos
+
+INSTALACION = {
+    'spacy': "pip install spacy && python -m spacy download es_core_news_md",
+    'pandas': "pip install pandas",
+    'numpy': "pip install numpy",
+    'plotly': "pip install plotly",
+    'matplotlib': "pip install matplotlib",
+}
+
+_analisis: Dict[str, object] = {}
+
+
+def modulo(nombre: str):
+    """Importa un módulo pesado; si falta, indica cómo instalarlo"""
+    try:
+        return importlib.import_module(nombre)
+    except ImportError:
+        paquete = nombre.split('.')[0]
+        print(f"⚠️ Error: falta {paquete}. Instálalo con:")
+        print(f"   {INSTALACION.get(paquete, 'pip install ' + paquete)}")
+        raise
+
+
+def pandas():
+    return modulo('pandas')
+
+
+def numpy():
+    return modulo('numpy')
+
+
+def plotly(submodulo: str = 'graph_objects'):
+    """plotly.graph_objects, plotly.io, plotly.subplots..."""
+    return modulo(f'plotly.{submodulo}')
+
+
+def pyplot(estilo: Optional[str] = None, parametros: Optional[dict] = None):
+    """matplotlib.pyplot con el estilo y los rcParams de los gráficos del artículo"""
+    plt = modulo('matplotlib.pyplot')
+    if estilo:
+        plt.style.use(estilo)
+    if parametros:
+        plt.rcParams.update(parametros)
+    return plt
+
+
+def analisis_spacy(perfil: str = 'dependencias'):
+    """
+    Análisis spaCy con caché en disco (CacheAnalisis), uno por perfil y proceso
+
+    Si hay un servidor de análisis del perfil en marcha, el modelo no se carga:
+    los textos que no están en caché se analizan en el servidor.
+    """
+    if perfil not in _analisis:
+        modulo('spacy')
+        from cache_analisis import CacheAnalisis
+        from perfiles_spacy import cargar_modelo
+        from servidor_analisis import conectar
+        nlp = conectar(perfil) or cargar_modelo(perfil)
+        _analisis[perfil] = CacheAnalisis(nlp)
+    return _analisis[perfil]
+
+
+# ============================================================================
+# COMPROBACIÓN DEL TIEMPO DE IMPORTACIÓN
+# ============================================================================
+
+_MEDICION = """
+import sys, time
+inicio = time.perf_counter()
+import {script}
+segundos = time.perf_counter() - inicio
+pesados = [m for m in {pesados!r} if m in sys.modules]
+print(repr((segundos, pesados)))
+"""
+
+
+def medir_importacion(script: str):
+    """(segundos, módulos pesados cargados, error) al importar un script en un proceso nuevo"""
+    carpeta = Path(__file__).resolve().parent
+    proceso = subprocess.run(
+        [sys.executable, '-c', _MEDICION.format(script=script, pesados=MODULOS_PESADOS)],
+        cwd=carpeta, capture_output=True, text=True
+    )
+    if proceso.returncode != 0:
+        error = proceso.stderr.strip().splitlines()
+        return None, [], error[-1] if error else f"código {proceso.returncode}"
+    segundos, pesados = ast.literal_eval(proceso.stdout.strip().splitlines()[-1])
+    return segundos, pesados, None
+
+
+def comprobar_importacion(scripts=SCRIPTS_LIGEROS, limite: float = LIMITE_IMPORTACION) -> bool:
+    """Informa del tiempo de importación de cada script; False si alguno no cumple"""
+    correcto = True
+    for script in scripts:
+        segundos, pesados, error = medir_importacion(script)
+        if error:
+            print(f"  ✗ {script}: {error}")
+            correcto = False
+        elif pesados or segundos > limite:
+            print(f"  ✗ {script}: {segundos:.2f} s" + (f", carga {', '.join(pesados)}" if pesados else ""))
+            correcto = False
+        else:
+            print(f"  ✓ {script}: {segundos:.2f} s")
+    return correcto
+
+
+def main():
+    if sys.argv[1:] != ['--comprobar-importacion']:
+        print("Uso: python3 recursos.py --comprobar-importacion")
+        sys.exit(1)
+    print(f"⏱ Importación de los scripts (límite {LIMITE_IMPORTACION} s, sin {', '.join(MODULOS_PESADOS)}):")
+    sys.exit(0 if comprobar_importacion() else 1)
+
+
+if __name__ == "__main__":
+    main()
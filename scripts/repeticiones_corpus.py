@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Eliminación de líneas repetidas (parrillas de radio, anuncios, cabeceras)
+
+Los números de ONDAS repiten página tras página las mismas parrillas de emisión,
+listas de emisoras y anuncios, y las páginas de El Sol llevan su cabecera.
+Todo ello pasaba por nlp() en cada analizador y producía falsas menciones de
+"música" ("música variada" aparece 184 veces en ONDAS).
+
+Una línea se considera repetida cuando aparece, tras normalizarla (minúsculas,
+sin puntuación, cifras igualadas), en al menos MIN_DOCUMENTOS documentos de la
+misma publicación. Las líneas repetidas se sustituyen por una línea vacía antes
+del análisis, de modo que los párrafos se conservan.
+
+Las líneas de cada documento se guardan resumidas (.repeticiones_corpus.json,
+junto al manifiesto) con la huella del contenido: en ejecuciones posteriores
+solo se leen los documentos nuevos o modificados.
+
+Uso:
+    python3 repeticiones_corpus.py CORPUS      # muestra las líneas repetidas
+
+Proyecto: LexiMus - Universidad de Salamanca
+"""
+
+import hashlib
+import re
+import sys
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, Optional, Set
+
+from cargador_corpus import DocumentoCorpus, abrir_corpus, es_fuente_corpus, huella_contenido
+from manifiesto_corpus import (NOMBRE_MANIFIESTO, ManifiestoCorpus, _escribir_json,
+                               _leer_json)
+
+NOMBRE_REPETICIONES = '.repeticiones_corpus.json'
+VERSION_REPETICIONES = 1
+
+MIN_DOCUMENTOS = 5   # documentos de la misma publicación en que debe aparecer la línea
+MIN_CARACTERES = 8   # líneas más cortas (iniciales, números de página) no se consideran
+
+_NO_PALABRA = re.compile(r'[\W_]+')
+_CIFRA = re.compile(r'\d')
+
+
+def clave_linea(linea: str) -> str:
+    """Forma normalizada de una línea para compararla entre documentos"""
+    linea = unicodedata.normalize('NFC', linea).lower()
+    linea = _CIFRA.sub('0', linea)
+    return _NO_PALABRA.sub(' ', linea).strip()
+
+
+def _resumen(clave: str) -> str:
+    return hashlib.blake2b(clave.encode('utf-8'), digest_size=6).hexdigest()
+
+
+def resumenes_lineas(texto: str) -> Set[str]:
+    """Resúmenes de las líneas del texto con longitud suficiente"""
+    resumenes = set()
+    for linea in texto.splitlines():
+        clave = clave_linea(linea)
+        if len(clave) >= MIN_CARACTERES:
+            resumenes.add(_resumen(clave))
+    return resumenes
+
+
+class DetectorRepeticiones:
+    """
+    Líneas repetidas por publicación y limpieza de los textos
+    """
+
+    def __init__(self, corpus, manifiesto: Optional[ManifiestoCorpus] = None,
+                 min_documentos: int = MIN_DOCUMENTOS):
+        self.min_documentos = min_documentos
+        self.ruta = corpus.ruta_auxiliar(NOMBRE_REPETICIONES)
+        self._manifiesto_propio = manifiesto is None
+        self.manifiesto = manifiesto or ManifiestoCorpus(corpus.ruta_auxiliar(NOMBRE_MANIFIESTO))
+
+        datos = _leer_json(self.ruta)
+        if datos.get('version') != VERSION_REPETICIONES or datos.get('min_caracteres') != MIN_CARACTERES:
+            datos = {}
+        self.lineas_documento: Dict[str, dict] = datos.get('documentos', {})
+        self.repetidas: Dict[str, Set[str]] = {}
+        self._publicacion: Dict[str, str] = {}
+        self.calculados = 0
+        self.lineas_eliminadas = 0
+
+    def _lineas(self, documento: DocumentoCorpus) -> Set[str]:
+        """Resúmenes de las líneas de un documento; solo se lee si ha cambiado"""
+        entrada = self.manifiesto.entrada_vigente(documento)
+        guardado = self.lineas_documento.get(documento.clave)
+        if entrada and guardado and guardado['huella'] == entrada['huella']:
+            return set(guardado['lineas'])
+
+        texto, huella = documento.leer_con_huella()
+        self.manifiesto.registrar(documento, huella, texto)
+        lineas = resumenes_lineas(texto)
+        self.lineas_documento[documento.clave] = {'huella': huella, 'lineas': sorted(lineas)}
+        self.calculados += 1
+        return lineas
+
+    def preparar(self, documentos: Iterable[DocumentoCorpus]):
+        """Cuenta en cuántos documentos de cada publicación aparece cada línea"""
+        frecuencias = defaultdict(Counter)
+        for documento in documentos:
+            frecuencias[documento.publicacion].update(self._lineas(documento))
+            self._publicacion[documento.clave] = documento.publicacion
+        self.repetidas = {
+            publicacion: {r for r, n in contador.items() if n >= self.min_documentos}
+            for publicacion, contador in frecuencias.items()
+        }
+
+    def firma_documento(self, clave: str) -> Optional[str]:
+        """
+        Huella de las líneas que se eliminarán del documento
+
+        Cambia solo si cambia lo que se elimina de ese documento, de modo que los
+        resultados incrementales de los demás siguen siendo válidos.
+        """
+        publicacion = self._publicacion.get(clave)
+        if publicacion is None:
+            return None
+        propias = set(self.lineas_documento[clave]['lineas'])
+        eliminadas = sorted(propias & self.repetidas.get(publicacion, set()))
+        return huella_contenido('\n'.join(eliminadas).encode('utf-8'))
+
+    def limpiar(self, texto: str, publicacion: str) -> str:
+        """Sustituye las líneas repetidas de la publicación por líneas vacías"""
+        repetidas = self.repetidas.get(publicacion)
+        if not repetidas:
+            return texto
+        partes = []
+        for linea in texto.splitlines(keepends=True):
+            clave = clave_linea(linea)
+            if len(clave) >= MIN_CARACTERES and _resumen(clave) in repetidas:
+                self.lineas_eliminadas += 1
+                partes.append('\n' if linea.endswith(('\n', '\r')) else '')
+            else:
+                partes.append(linea)
+        return ''.join(partes)
+
+    def guardar(self):
+        try:
+            _escribir_json(self.ruta, {'version': VERSION_REPETICIONES,
+                                       'min_caracteres': MIN_CARACTERES,
+                                       'documentos': self.lineas_documento})
+        except OSError as e:
+            print(f"⚠️  No se pudieron guardar las líneas repetidas: {e}")
+        if self._manifiesto_propio:
+            self.manifiesto.guardar()
+
+
+def detectar_repeticiones(corpus, documentos: Optional[Iterable[DocumentoCorpus]] = None,
+                          manifiesto: Optional[ManifiestoCorpus] = None) -> DetectorRepeticiones:
+    """
+    Detector preparado sobre `documentos` (por defecto, todo el corpus)
+
+    Pasar el mismo recorrido que usará el analizador.
+    """
+    detector = DetectorRepeticiones(corpus, manifiesto)
+    detector.preparar(corpus.documentos() if documentos is None else documentos)
+    detector.guardar()
+    print("  ✂ Líneas repetidas: " + ", ".join(
+        f"{pub} {len(r)}" for pub, r in sorted(detector.repetidas.items())) +
+        f" ({detector.calculados} documentos leídos)")
+    return detector
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Uso: python3 repeticiones_corpus.py CORPUS")
+        sys.exit(1)
+
+    ruta = sys.argv[1]
+    if not es_fuente_corpus(ruta):
+        print(f"❌ ERROR: El corpus no existe: {ruta}")
+        sys.exit(1)
+
+    corpus = abrir_corpus(ruta)
+    detector = detectar_repeticiones(corpus)
+
+    # Texto de las líneas repetidas (primera aparición de cada una)
+    pendientes = {pub: set(r) for pub, r in detector.repetidas.items()}
+    for documento in corpus.documentos():
+        restantes = pendientes.get(documento.publicacion)
+        if not restantes:
+            continue
+        for linea in documento.leer().splitlines():
+            clave = clave_linea(linea)
+            if len(clave) >= MIN_CARACTERES and _resumen(clave) in restantes:
+                restantes.discard(_resumen(clave))
+                print(f"  [{documento.publicacion}] {linea.strip()}")
+
+
+if __name__ == "__main__":
+    main()
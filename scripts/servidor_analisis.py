@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Servidor local de análisis spaCy (socket Unix) para no recargar el modelo en cada ejecución
+
+Al ajustar léxicos y ventanas, los analizadores se ejecutan decenas de veces al
+día y cada ejecución vuelve a cargar es_core_news_md. El servidor mantiene el
+modelo cargado, recibe lotes de textos y devuelve los Doc serializados (DocBin).
+
+Los scripts no cambian: recursos.analisis_spacy() usa el servidor del perfil si
+está en marcha (ClienteAnalisis, con la misma interfaz que nlp) y, si no, carga
+el modelo en el propio proceso.
+
+Uso:
+    python3 servidor_analisis.py iniciar [--perfil dependencias]   # en otra terminal
+    python3 servidor_analisis.py estado  [--perfil dependencias]
+    python3 servidor_analisis.py detener [--perfil dependencias]
+
+Protocolo: mensajes con longitud (4 bytes, big-endian) por delante. Cada petición
+es un JSON ({"orden": "info"}, {"orden": "analizar", "textos": [...]},
+{"orden": "detener"}); la respuesta es un JSON y, para "analizar", los Doc en un
+DocBin.
+
+Proyecto: LexiMus - Universidad de Salamanca
+"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import struct
+import sys
+import threading
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional
+
+from cargador_corpus import carpeta_cache
+from perfiles_spacy import PERFILES
+
+LOTE_SERVIDOR = 64   # textos por petición del cliente
+
+
+def ruta_socket(perfil: str) -> Path:
+    return carpeta_cache('servidor') / f"{perfil}.sock"
+
+
+def _enviar(conexion: socket.socket, datos: bytes):
+    conexion.sendall(struct.pack('>I', len(datos)) + datos)
+
+
+def _recibir_exacto(conexion: socket.socket, n: int) -> bytes:
+    partes = []
+    while n:
+        parte = conexion.recv(min(n, 1 << 20))
+        if not parte:
+            raise ConnectionError("El servidor de análisis ha cerrado la conexión")
+        partes.append(parte)
+        n -= len(parte)
+    return b''.join(partes)
+
+
+def _recibir(conexion: socket.socket) -> bytes:
+    longitud, = struct.unpack('>I', _recibir_exacto(conexion, 4))
+    return _recibir_exacto(conexion, longitud)
+
+
+# ============================================================================
+# SERVIDOR
+# ============================================================================
+
+class _Peticiones(socketserver.BaseRequestHandler):
+    """Atiende las peticiones de una conexión hasta que el cliente la cierra"""
+
+    def handle(self):
+        nlp = self.server.nlp
+        bloqueo = self.server.bloqueo
+        while True:
+            try:
+                peticion = json.loads(_recibir(self.request))
+            except (ConnectionError, struct.error):
+                return
+            orden = peticion.get('orden')
+            if orden == 'info':
+                _enviar(self.request, json.dumps({
+                    'meta': nlp.meta, 'pipe_names': nlp.pipe_names,
+                    'config': nlp.config.to_str(), 'max_length': nlp.max_length
+                }).encode('utf-8'))
+            elif orden == 'analizar':
+                from spacy.tokens import DocBin
+                try:
+                    with bloqueo:
+                        docs = list(nlp.pipe(peticion['textos']))
+                except Exception as e:
+                    _enviar(self.request, json.dumps({'error': str(e)}).encode('utf-8'))
+                    continue
+                _enviar(self.request, json.dumps({'documentos': len(docs)}).encode('utf-8'))
+                _enviar(self.request, DocBin(docs=docs).to_bytes())
+                self.server.documentos += len(docs)
+            elif orden == 'detener':
+                _enviar(self.request, b'{}')
+                threading.Thread(target=self.server.shutdown).start()
+                return
+            else:
+                _enviar(self.request, json.dumps({'error': f"Orden desconocida: {orden}"}).encode('utf-8'))
+
+
+class ServidorAnalisis(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Un proceso, un modelo: cada cliente tiene su conexión, pero los lotes se
+    analizan de uno en uno
+    """
+    daemon_threads = True
+
+    def __init__(self, ruta: Path, nlp):
+        self.nlp = nlp
+        self.bloqueo = threading.Lock()
+        self.documentos = 0
+        super().__init__(str(ruta), _Peticiones)
+
+
+def iniciar(perfil: str):
+    from perfiles_spacy import cargar_modelo
+
+    ruta = ruta_socket(perfil)
+    if conectar(perfil, avisar=False) is not None:
+        print(f"⚠️  Ya hay un servidor del perfil {perfil} en {ruta}")
+        sys.exit(1)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    if ruta.exists():
+        ruta.unlink()   # socket de un servidor que terminó sin limpiar
+
+    nlp = cargar_modelo(perfil)
+    servidor = ServidorAnalisis(ruta, nlp)
+    print(f"✓ Servidor de análisis ({perfil}) escuchando en {ruta}", flush=True)
+    try:
+        servidor.serve_forever(poll_interval=0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        if ruta.exists():
+            ruta.unlink()
+        print(f"✓ Servidor detenido ({servidor.documentos} documentos analizados)")
+
+
+# ============================================================================
+# CLIENTE
+# ============================================================================
+
+class _Configuracion:
+    """Configuración del pipeline remoto (solo lo que usa cache_analisis.clave_modelo)"""
+
+    def __init__(self, texto: str):
+        self.texto = texto
+
+    def to_str(self) -> str:
+        return self.texto
+
+
+class ClienteAnalisis:
+    """
+    Cliente del servidor con la interfaz de nlp: doc = cliente(texto), cliente.pipe(textos)
+
+    Los Doc se reconstruyen sobre el vocabulario del idioma (spacy.blank), sin
+    cargar el modelo.
+    """
+
+    def __init__(self, ruta: Path, conexion: socket.socket, info: dict):
+        import spacy
+
+        self.ruta = ruta
+        self._conexion = conexion
+        self.meta = info['meta']
+        self.pipe_names = info['pipe_names']
+        self.config = _Configuracion(info['config'])
+        self.max_length = info['max_length']
+        self.vocab = spacy.blank(self.meta.get('lang', 'es')).vocab
+
+    def _analizar(self, textos: List[str]) -> list:
+        from spacy.tokens import DocBin
+
+        _enviar(self._conexion, json.dumps({'orden': 'analizar', 'textos': textos}).encode('utf-8'))
+        respuesta = json.loads(_recibir(self._conexion))
+        if 'error' in respuesta:
+            raise RuntimeError(f"Servidor de análisis: {respuesta['error']}")
+        return list(DocBin().from_bytes(_recibir(self._conexion)).get_docs(self.vocab))
+
+    def __call__(self, texto: str):
+        return self._analizar([texto])[0]
+
+    def pipe(self, textos: Iterable[str], batch_size: int = LOTE_SERVIDOR,
+             n_process: int = 1) -> Iterator:
+        """Como nlp.pipe; n_process se ignora (el servidor analiza en su proceso)"""
+        lote = []
+        for texto in textos:
+            lote.append(texto)
+            if len(lote) >= max(batch_size, 1):
+                yield from self._analizar(lote)
+                lote = []
+        if lote:
+            yield from self._analizar(lote)
+
+    def close(self):
+        self._conexion.close()
+
+
+def conectar(perfil: str, avisar: bool = True) -> Optional[ClienteAnalisis]:
+    """Cliente del servidor del perfil, o None si no está en marcha"""
+    ruta = ruta_socket(perfil)
+    if os.environ.get('LEXIMUS_SERVIDOR') == '0' or not ruta.exists():
+        return None
+    conexion = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conexion.connect(str(ruta))
+        _enviar(conexion, b'{"orden": "info"}')
+        info = json.loads(_recibir(conexion))
+    except (OSError, ConnectionError, ValueError):
+        conexion.close()
+        return None
+    if avisar:
+        print(f"↔ Análisis en el servidor local ({perfil}, {ruta})", flush=True)
+    return ClienteAnalisis(ruta, conexion, info)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local de análisis spaCy")
+    parser.add_argument('orden', choices=['iniciar', 'estado', 'detener'])
+    parser.add_argument('--perfil', choices=list(PERFILES), default='dependencias')
+    argumentos = parser.parse_args()
+
+    if argumentos.orden == 'iniciar':
+        iniciar(argumentos.perfil)
+        return
+
+    cliente = conectar(argumentos.perfil, avisar=False)
+    if cliente is None:
+        print(f"✗ No hay servidor del perfil {argumentos.perfil} ({ruta_socket(argumentos.perfil)})")
+        sys.exit(1)
+    if argumentos.orden == 'estado':
+        print(f"✓ Servidor en marcha: {cliente.meta.get('lang')}_{cliente.meta.get('name')} "
+              f"{cliente.meta.get('version')} ({', '.join(cliente.pipe_names)})")
+    else:
+        _enviar(cliente._conexion, b'{"orden": "detener"}')
+        _recibir(cliente._conexion)
+        print("✓ Servidor detenido")
+    cliente.close()
+
+
+if __name__ == "__main__":
+    main()
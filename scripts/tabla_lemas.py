@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Decisiones por lema (adjetivo válido, polaridad) calculadas una vez para todo el corpus
+
+es_adjetivo_valido() pasaba cada adjetivo de cada ventana por token.lemma_.lower(),
+la lista de exclusiones y una expresión regular, y clasificar_polaridad() repetía
+sus búsquedas en los léxicos con cada adjetivo. El resultado solo depende del
+lema: TablaLemas lo calcula la primera vez que aparece cada lema y lo conserva
+para los documentos siguientes, indexado por el hash del lema en el StringStore
+(token.lemma, un entero: sin crear la cadena) o por el lema en minúsculas.
+
+    validos = TablaLemas(es_lema_valido, EXCLUSIONES)
+    validos.comprobar()          # al empezar cada Doc
+    if validos.token(token): ...
+
+Los léxicos de los que depende la función se pasan a la tabla: si el contenido
+de alguno cambia durante la ejecución (se añade una exclusión o se cambia un
+adjetivo por otro), comprobar() la vacía. La tabla guarda una copia congelada de
+cada léxico y comprobar() la compara con el léxico actual (el mismo contenido
+que entra en firma_configuracion): una consulta por entrada y por Doc, sin
+construir conjuntos nuevos.
+
+Proyecto: LexiMus - Universidad de Salamanca
+"""
+
+from typing import Any, Callable, Collection
+
+
+class TablaLemas:
+    """Valor de `funcion(lema)` por lema, compartido entre documentos"""
+
+    def __init__(self, funcion: Callable[[str], Any], *lexicos: Collection[str]):
+        self.funcion = funcion
+        self.lexicos = lexicos
+        self._copias = self._copiar_lexicos()
+        self._por_hash = {}
+        self._por_lema = {}
+
+    def _copiar_lexicos(self) -> tuple:
+        return tuple(frozenset(lexico) for lexico in self.lexicos)
+
+    def comprobar(self):
+        """Vacía la tabla si el contenido de algún léxico ha cambiado desde la última comprobación"""
+        if any((lexico if isinstance(lexico, (set, frozenset)) else frozenset(lexico)) != copia
+               for lexico, copia in zip(self.lexicos, self._copias)):
+            self._copias = self._copiar_lexicos()
+            self._por_hash.clear()
+            self._por_lema.clear()
+
+    def lema(self, lema: str) -> Any:
+        """Valor para un lema en minúsculas"""
+        try:
+            return self._por_lema[lema]
+        except KeyError:
+            valor = self._por_lema[lema] = self.funcion(lema)
+            return valor
+
+    def token(self, token) -> Any:
+        """Valor para el lema (en minúsculas) del token, indexado por su hash"""
+        try:
+            return self._por_hash[token.lemma]
+        except KeyError:
+            valor = self._por_hash[token.lemma] = self.lema(token.lemma_.lower())
+            return valor